@@ -0,0 +1,175 @@
+"""
+历史记录翻页基准测试 - OFFSET 分页与 (detection_time, id) 游标分页对比
+
+在当前存储后端中建立 detection_history_bench 表并写入合成数据（默认100万行），
+对不同深度的页分别执行 OFFSET 查询和游标查询，输出耗时与查询计划。
+
+用法:
+    python benchmarks/history_pagination.py [--rows 1000000] [--page-size 20] [--keep]
+    RAICOM_DB_BACKEND=sqlite python benchmarks/history_pagination.py   # 无需MySQL
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.db_manager import DatabaseConfig
+from database.backends import create_backend
+
+TABLE = 'detection_history_bench'
+SOURCE_TYPES = ('upload', 'camera', 'manual_save')
+COLUMNS = "id, image_path, detection_results, detection_time, confidence_scores, processing_time, source_type"
+
+
+def create_table(cursor, backend, config):
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    if backend.name == 'sqlite':
+        from database.sqlite_backend import SCHEMA
+        statements = [s for s in SCHEMA if 'ON detection_history' in s or 'TABLE IF NOT EXISTS detection_history' in s]
+        statements = [s for s in statements if 'TRIGGER' not in s]
+    else:
+        statements = [config.create_table_sql]
+    for statement in statements:
+        # SQLite 的索引名在库内全局唯一，测试表的索引加前缀
+        cursor.execute(statement.replace('IF NOT EXISTS ', '').replace('detection_history', TABLE)
+                       .replace('INDEX idx_', 'INDEX bench_idx_'))
+
+
+def fill_table(conn, cursor, rows, batch_size=10000):
+    """写入合成数据：时间均匀分布在最近一年，约 1/50 的记录与前一条时间相同"""
+    start = datetime.now() - timedelta(days=365)
+    step = 365 * 24 * 3600 / rows
+    sql = f"""
+        INSERT INTO {TABLE} (image_path, detection_results, detection_time, confidence_scores,
+                             processing_time, source_type)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    results = json.dumps([{'class': 'Plastic Bottle', 'confidence': 0.9, 'bbox': [10, 20, 110, 220]}])
+    written = 0
+    detection_time = start
+    while written < rows:
+        batch = []
+        for i in range(written, min(rows, written + batch_size)):
+            if random.random() > 0.02:
+                detection_time = start + timedelta(seconds=i * step)
+            batch.append((f"bench_{i}.jpg", results, detection_time.replace(microsecond=0),
+                          '[0.9]', random.uniform(0.02, 0.2), random.choice(SOURCE_TYPES)))
+        conn.start_transaction()
+        cursor.executemany(sql, batch)
+        conn.commit()
+        written += len(batch)
+        print(f"\r写入 {written}/{rows}", end='', flush=True)
+    print()
+
+
+def offset_query(source_type, limit, offset):
+    sql = f"SELECT {COLUMNS} FROM {TABLE}"
+    params = []
+    if source_type:
+        sql += " WHERE source_type = %s"
+        params.append(source_type)
+    sql += " ORDER BY detection_time DESC, id DESC LIMIT %s OFFSET %s"
+    return sql, params + [limit, offset]
+
+
+def keyset_query(source_type, limit, page_cursor):
+    conditions, params = [], []
+    if source_type:
+        conditions.append("source_type = %s")
+        params.append(source_type)
+    if page_cursor:
+        conditions.append("detection_time <= %s AND (detection_time < %s OR id < %s)")
+        params.extend([page_cursor[0], page_cursor[0], page_cursor[1]])
+    sql = f"SELECT {COLUMNS} FROM {TABLE}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY detection_time DESC, id DESC LIMIT %s"
+    return sql, params + [limit]
+
+
+def cursor_at(cursor, source_type, position):
+    """取第 position 条记录（0起）之前一条的游标，即从该位置开始的页的起始游标"""
+    if position == 0:
+        return None
+    sql, params = offset_query(source_type, 1, position - 1)
+    cursor.execute(sql.replace(COLUMNS, "detection_time, id"), params)
+    return cursor.fetchone()
+
+
+def timed(cursor, sql, params, repeat):
+    best = float('inf')
+    rows = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, rows
+
+
+def explain_rows(cursor, backend, sql, params):
+    """返回 (预估扫描行数, 使用的索引/查询计划)"""
+    if backend.name == 'sqlite':
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return '-', '; '.join(row[-1] for row in cursor.fetchall())
+    cursor.execute("EXPLAIN " + sql, params)
+    columns = [d[0] for d in cursor.description]
+    row = dict(zip(columns, cursor.fetchone()))
+    return row.get('rows'), row.get('key')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="历史记录翻页基准测试")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--reuse', action='store_true', help="复用已有的测试表，不重新写入数据")
+    parser.add_argument('--keep', action='store_true', help="测试结束后保留测试表")
+    args = parser.parse_args()
+
+    config = DatabaseConfig()
+    backend = create_backend(config)
+    backend.create_database()
+    conn = backend.connect()
+    cursor = conn.cursor()
+    print(f"存储后端: {backend.name}")
+    try:
+        if not args.reuse:
+            create_table(cursor, backend, config)
+            fill_table(conn, cursor, args.rows)
+            if backend.name == 'sqlite':
+                cursor.execute(f"ANALYZE {TABLE}")
+            else:
+                cursor.execute(f"ANALYZE TABLE {TABLE}")
+                cursor.fetchall()
+
+        depths = sorted({0, 10, 1000, 10000, args.rows // args.page_size // 2})
+        print(f"{'过滤':<10}{'页号':>8}{'OFFSET(ms)':>12}{'扫描行':>10}{'游标(ms)':>12}{'扫描行':>10}  索引")
+        for source_type in (None, 'camera'):
+            for page in depths:
+                position = page * args.page_size
+                page_cursor = cursor_at(cursor, source_type, position)
+                if position and page_cursor is None:
+                    continue
+                sql, params = offset_query(source_type, args.page_size, position)
+                offset_ms, offset_rows = timed(cursor, sql, params, args.repeat)
+                offset_scan, _ = explain_rows(cursor, backend, sql, params)
+                sql, params = keyset_query(source_type, args.page_size, page_cursor)
+                keyset_ms, keyset_rows = timed(cursor, sql, params, args.repeat)
+                keyset_scan, key = explain_rows(cursor, backend, sql, params)
+                assert [r[0] for r in offset_rows] == [r[0] for r in keyset_rows], "两种分页结果不一致"
+                print(f"{source_type or '全部':<10}{page:>8}{offset_ms:>12.2f}{offset_scan:>10}"
+                      f"{keyset_ms:>12.2f}{keyset_scan:>10}  {key}")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+随机抽题基准测试 - ORDER BY RAND() 与内存题库 random.sample 对比
+
+在当前存储后端中建立 quiz_questions_bench 表并写入合成题目，
+分别用原来的 ORDER BY RAND() LIMIT n 查询和 QuizSampler 抽题，输出每次抽题耗时。
+
+用法:
+    python benchmarks/quiz_sampling.py [--rows 1000 10000 100000] [--limit 10]
+    RAICOM_DB_BACKEND=sqlite python benchmarks/quiz_sampling.py   # 无需MySQL
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.db_manager import DatabaseConfig
+from database.backends import create_backend
+from database.quiz_sampler import QuizSampler
+
+TABLE = 'quiz_questions_bench'
+COLUMNS = "id, question, option_a, option_b, option_c, option_d, answer, explanation"
+
+
+def fill_table(conn, cursor, backend, config, rows, batch_size=5000):
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    if backend.name == 'sqlite':
+        from database.sqlite_backend import SCHEMA
+        create_sql = next(s for s in SCHEMA if 'TABLE IF NOT EXISTS quiz_questions' in s)
+    else:
+        create_sql = config.create_quiz_table_sql
+    cursor.execute(create_sql.replace('CREATE TABLE IF NOT EXISTS quiz_questions', f'CREATE TABLE {TABLE}'))
+    sql = f"""
+        INSERT INTO {TABLE} (question, option_a, option_b, option_c, option_d, answer, explanation)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """
+    conn.start_transaction()
+    for start in range(0, rows, batch_size):
+        batch = [(f"第{i}题：塑料瓶属于哪类垃圾？", "可回收物", "有害垃圾", "厨余垃圾", "其他垃圾",
+                  "可回收物", "正确答案是可回收物") for i in range(start, min(rows, start + batch_size))]
+        cursor.executemany(sql, batch)
+    conn.commit()
+
+
+def bench(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="随机抽题基准测试")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    config = DatabaseConfig()
+    backend = create_backend(config)
+    backend.create_database()
+    conn = backend.connect()
+    cursor = conn.cursor()
+    print(f"存储后端: {backend.name}")
+
+    def order_by_rand():
+        cursor.execute(f"SELECT {COLUMNS} FROM {TABLE} ORDER BY {backend.random_function} LIMIT %s",
+                       (args.limit,))
+        cursor.fetchall()
+
+    def load_questions():
+        cursor.execute(f"SELECT {COLUMNS} FROM {TABLE}")
+        return [{'id': r[0], 'question': r[1], 'options': list(r[2:6]), 'answer': r[6], 'explanation': r[7]}
+                for r in cursor.fetchall()]
+
+    try:
+        print(f"{'题目数':>8}{'RAND p50(ms)':>14}{'RAND p95(ms)':>14}{'sample p50(ms)':>16}"
+              f"{'sample p95(ms)':>16}{'加载(ms)':>10}")
+        for rows in args.rows:
+            fill_table(conn, cursor, backend, config, rows)
+            # 版本号固定，只测抽题本身；首次加载耗时单独统计
+            sampler = QuizSampler(load_questions, lambda: 1, check_interval=3600,
+                                  max_limit=max(args.limit, 100))
+            load_start = time.perf_counter()
+            sampler.sample(args.limit)
+            load_ms = (time.perf_counter() - load_start) * 1000
+            rand_p50, rand_p95 = bench(order_by_rand, args.repeat)
+            sample_p50, sample_p95 = bench(lambda: sampler.sample(args.limit), args.repeat)
+            print(f"{rows:>8}{rand_p50:>14.3f}{rand_p95:>14.3f}{sample_p50:>16.4f}"
+                  f"{sample_p95:>16.4f}{load_ms:>10.1f}")
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+存储后端 - 屏蔽 MySQL 与嵌入式 SQLite 在连接、建表迁移和少量SQL语法上的差异
+
+DatabaseManager 的查询统一使用 %s 占位符；各后端只负责：
+- 建立连接（供连接池使用）与初始化数据库
+- 结构迁移
+- 不可移植的语句片段：冲突更新（upsert）、行锁
+- 区分可重试的临时错误（断线、死锁、锁等待超时）与数据错误
+"""
+from contextlib import contextmanager
+from typing import List, Sequence, Set
+
+import mysql.connector
+from mysql.connector import Error
+
+
+class StorageBackend:
+    """存储后端基类"""
+
+    name = ''
+    # SELECT ... 之后追加的行锁子句
+    for_update = ''
+    # 随机排序函数（仅基准测试使用）
+    random_function = 'RAND()'
+    # 可重试的错误码：连接失败/断开、锁等待超时、死锁
+    TRANSIENT_ERRNOS = {2003, 2006, 2013, 2055, 1205, 1213}
+
+    def __init__(self, config):
+        self.config = config
+
+    def connect(self):
+        """建立一个新连接"""
+        raise NotImplementedError
+
+    def create_database(self):
+        """确保数据库存在"""
+        raise NotImplementedError
+
+    def migrations(self) -> list:
+        """(版本号, 说明, 迁移函数) 列表"""
+        raise NotImplementedError
+
+    @contextmanager
+    def migration_lock(self, cursor):
+        """多进程同时启动时串行执行迁移
+
+        默认不加锁：run_migrations 在每个版本的事务内重新确认是否已执行，适用于写事务互斥的后端（SQLite）。
+        """
+        yield
+
+    def upsert_sql(self, table: str, columns: Sequence[str], key_columns: Sequence[str],
+                   add_columns: Sequence[str] = (), replace_columns: Sequence[str] = ()) -> str:
+        """插入一行，主键冲突时 add_columns 累加、replace_columns 覆盖"""
+        raise NotImplementedError
+
+    def table_columns(self, cursor, table: str) -> Set[str]:
+        """表现有的列名"""
+        cursor.execute("""
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """, (table,))
+        return {row[0] for row in cursor.fetchall()}
+
+    def streaming_cursor(self, conn):
+        """逐批从服务端读取结果、不在客户端缓存整个结果集的游标"""
+        return conn.cursor()
+
+    def is_transient_error(self, error: Exception) -> bool:
+        """是否为重试可能成功的临时错误；数据与约束错误重试也不会成功"""
+        return isinstance(error, Error) and error.errno in self.TRANSIENT_ERRNOS
+
+    def insert_rows(self, cursor, sql: str, rows: List[tuple]) -> List[int]:
+        """在当前事务中逐行插入，返回各行的自增ID
+        
+        不用多行 INSERT：innodb_autoinc_lock_mode=2（MySQL 8 默认）下多个连接并发插入时，
+        一条多行 INSERT 分到的自增ID不保证连续，无法由第一行的ID推算其余各行。
+        """
+        ids = []
+        for row in rows:
+            cursor.execute(sql, row)
+            ids.append(cursor.lastrowid)
+        return ids
+
+
+class MySQLBackend(StorageBackend):
+    """MySQL 后端"""
+
+    name = 'mysql'
+    for_update = ' FOR UPDATE'
+
+    # 多个进程（桌面端、Web后端）同时启动时用命名锁串行执行迁移
+    MIGRATION_LOCK = 'raicom_schema_migration'
+    MIGRATION_LOCK_TIMEOUT = 60
+
+    def connect(self):
+        return mysql.connector.connect(**self.config.config)
+
+    def create_database(self):
+        temp_config = self.config.config.copy()
+        temp_config.pop('database', None)
+        conn = mysql.connector.connect(**temp_config)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.config.create_database_sql)
+            cursor.close()
+        finally:
+            conn.close()
+
+    def migrations(self):
+        from .migrations import MIGRATIONS
+        return MIGRATIONS
+
+    @contextmanager
+    def migration_lock(self, cursor):
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (self.MIGRATION_LOCK, self.MIGRATION_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise Error(msg="等待数据库迁移锁超时")
+        try:
+            yield
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (self.MIGRATION_LOCK,))
+            cursor.fetchall()
+
+    def upsert_sql(self, table, columns, key_columns, add_columns=(), replace_columns=()):
+        updates = [f"{c} = {c} + VALUES({c})" for c in add_columns]
+        updates += [f"{c} = VALUES({c})" for c in replace_columns]
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE {', '.join(updates)}")
+
+    def streaming_cursor(self, conn):
+        # 非缓冲游标：结果集留在服务端按需读取；读完之前该连接不能执行其他语句
+        return conn.cursor(buffered=False)
+
+
+def create_backend(config) -> StorageBackend:
+    """按配置创建存储后端：'mysql' 或 'sqlite'"""
+    if config.backend == 'mysql':
+        return MySQLBackend(config)
+    if config.backend == 'sqlite':
+        from .sqlite_backend import SQLiteBackend
+        return SQLiteBackend(config)
+    raise ValueError(f"不支持的存储后端: {config.backend}")
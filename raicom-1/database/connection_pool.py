@@ -0,0 +1,184 @@
+"""
+数据库连接池 - 复用已建立的连接，避免每次查询重复TCP握手与认证
+"""
+import time
+import threading
+from collections import deque
+import mysql.connector
+from mysql.connector import Error
+
+
+class PoolTimeoutError(Error):
+    """等待空闲连接超时"""
+    pass
+
+
+class PooledConnection:
+    """池化连接代理：close() 时把连接归还连接池而不是断开，其余属性透传给真实连接"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._release(conn)
+
+    def discard(self):
+        """断开连接而不归还（如流式读取中途放弃，连接上还有未读完的结果）"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._discard(conn)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise Error("连接已归还连接池")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """有上限的数据库连接池
+
+    - 空闲连接按后进先出复用，优先使用最近用过的热连接
+    - 取出空闲超过 health_check_interval 的连接时先做一次ping健康检查，失效则丢弃重建
+    - 连接数达到上限时最多等待 wait_timeout 秒，超时抛出 PoolTimeoutError
+    """
+
+    def __init__(self, config, max_size=10, wait_timeout=5.0, health_check_interval=30.0,
+                 max_idle_time=600.0, connect_func=None):
+        self.config = dict(config)
+        # 建立新连接的函数，默认按 config 连接MySQL
+        self.connect_func = connect_func or (lambda: mysql.connector.connect(**self.config))
+        self.max_size = max(1, int(max_size))
+        self.wait_timeout = wait_timeout
+        self.health_check_interval = health_check_interval
+        self.max_idle_time = max_idle_time
+        self._idle = deque()  # (conn, 归还时间)
+        self._size = 0        # 已创建且未销毁的连接数
+        self._cond = threading.Condition()
+        self._metrics = {
+            'checkouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'health_check_failures': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'timeouts': 0,
+        }
+
+    def get_connection(self, timeout=None):
+        """取出一个可用连接，返回 PooledConnection"""
+        timeout = self.wait_timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        while True:
+            conn, idle_since = self._checkout(deadline)
+            if conn is None:
+                conn = self._create()
+            elif not self._is_healthy(conn, idle_since):
+                self._discard(conn)
+                continue
+            with self._cond:
+                self._metrics['checkouts'] += 1
+            return PooledConnection(self, conn)
+
+    def _checkout(self, deadline):
+        """取空闲连接或占用一个新建名额；返回 (conn, 空闲起始时间)，conn为None表示需要新建"""
+        with self._cond:
+            waited = False
+            wait_start = time.time()
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, idle_since = None, None
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._metrics['timeouts'] += 1
+                    raise PoolTimeoutError(msg=f"等待数据库连接超时（连接池上限 {self.max_size}）")
+                waited = True
+                self._cond.wait(remaining)
+            if waited:
+                self._metrics['waits'] += 1
+                self._metrics['wait_time_total'] += time.time() - wait_start
+            return conn, idle_since
+
+    def _create(self):
+        try:
+            conn = self.connect_func()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._metrics['created'] += 1
+        return conn
+
+    def _is_healthy(self, conn, idle_since):
+        """空闲过久的连接先ping一次再交给调用方"""
+        idle_time = time.time() - idle_since
+        if idle_time > self.max_idle_time:
+            return False
+        if idle_time < self.health_check_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self._metrics['health_check_failures'] += 1
+            return False
+
+    def _release(self, conn):
+        """归还连接，未提交的事务会被回滚"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.time()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._metrics['discarded'] += 1
+            self._cond.notify()
+
+    def stats(self):
+        """连接池指标"""
+        with self._cond:
+            stats = dict(self._metrics)
+            stats.update({
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+            })
+        stats['avg_wait_ms'] = round(stats['wait_time_total'] / stats['waits'] * 1000, 2) if stats['waits'] else 0
+        stats['wait_time_total'] = round(stats['wait_time_total'], 4)
+        return stats
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
@@ -1,18 +1,41 @@
 """
-MySQL数据库配置和连接模块
+数据库配置和连接模块（MySQL / 嵌入式SQLite）
 """
-import mysql.connector
 from mysql.connector import Error
 import os
 import json
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import base64
-from typing import List, Dict, Optional
+import time
+import threading
+import atexit
+from collections import Counter
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Tuple
+from .connection_pool import ConnectionPool
+from .write_behind import WriteBehindQueue
+from .image_store import ImageStore, make_thumbnail
+from .quiz_sampler import QuizSampler
+from .migrations import LEGACY_IMAGE_COLUMNS, run_migrations
+from .backends import create_backend
+from .detection_objects import extract_objects
+from .retention import RetentionArchive, RetentionScheduler
+from .query_stats import QueryProfiler, ProfiledConnection
 
 class DatabaseConfig:
     """数据库配置类"""
     
     def __init__(self):
+        # 存储后端：'mysql' 或 'sqlite'（单机部署无需MySQL服务），可用环境变量 RAICOM_DB_BACKEND 覆盖
+        self.backend = os.environ.get('RAICOM_DB_BACKEND', 'mysql')
+        
+        # SQLite数据库配置
+        self.sqlite_config = {
+            'path': os.environ.get('RAICOM_SQLITE_PATH', os.path.join(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raicom_history.db')),
+            'timeout': 5.0  # 等待写锁的最长时间（秒）
+        }
+        
         # MySQL数据库配置
         self.config = {
             'host': 'localhost',
@@ -24,15 +47,37 @@ class DatabaseConfig:
             'autocommit': True
         }
         
+        # 连接池配置
+        self.pool_config = {
+            'max_size': 10,                # 最大连接数
+            'wait_timeout': 5.0,           # 连接耗尽时的最长等待时间（秒）
+            'health_check_interval': 30.0, # 空闲超过该时间的连接取出前先ping
+            'max_idle_time': 600.0         # 空闲超过该时间的连接直接丢弃重建
+        }
+        
+        # 数据库不可用时，请求路径重试初始化的最短间隔（秒）
+        self.bootstrap_retry_interval = 10.0
+        
+        # 检测记录后写队列配置
+        self.writer_config = {
+            'batch_size': 50,        # 单批最多条数
+            'flush_interval': 0.5,   # 凑批最长等待时间（秒）
+            'queue_size': 1000,      # 队列上限，满时提交方最多阻塞 put_timeout 秒
+            'put_timeout': 2.0,
+            'max_retries': 3,
+            'retry_backoff': 0.5
+        }
+        
         # 创建数据库和表的SQL语句
         self.create_database_sql = "CREATE DATABASE IF NOT EXISTS raicom_history CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
         self.create_table_sql = """
         CREATE TABLE IF NOT EXISTS detection_history (
             id INT AUTO_INCREMENT PRIMARY KEY,
             image_path VARCHAR(500) NOT NULL,
-            image_data LONGBLOB,
+            image_hash CHAR(64),
             result_image_path VARCHAR(500),
-            result_image_data LONGBLOB,
+            result_image_hash CHAR(64),
+            thumbnail_hash CHAR(64),
             detection_results JSON NOT NULL,
             detection_time DATETIME NOT NULL,
             confidence_scores JSON,
@@ -40,11 +85,80 @@ class DatabaseConfig:
             source_type ENUM('upload', 'camera', 'manual_save') NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            INDEX idx_detection_time (detection_time),
-            INDEX idx_source_type (source_type)
+            INDEX idx_time_id (detection_time, id),
+            INDEX idx_source_time_id (source_type, detection_time, id)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         """
         
+        # 旧版本 detection_history 表需要补齐的列（列名, 列定义）
+        self.detection_history_upgrades = [
+            ('image_hash', "image_hash CHAR(64) AFTER image_data"),
+            ('result_image_hash', "result_image_hash CHAR(64) AFTER result_image_data"),
+            ('thumbnail_hash', "thumbnail_hash CHAR(64) AFTER result_image_hash"),
+        ]
+        
+        # 旧版本 detection_history 表需要补齐的索引（索引名, 索引定义）及可删除的冗余索引
+        # 翻页按 (detection_time, id) 游标查询，(source_type, detection_time, id) 覆盖按来源过滤的翻页
+        self.detection_history_index_upgrades = [
+            ('idx_time_id', "INDEX idx_time_id (detection_time, id)"),
+            ('idx_source_time_id', "INDEX idx_source_time_id (source_type, detection_time, id)"),
+        ]
+        self.detection_history_obsolete_indexes = ['idx_detection_time', 'idx_source_type']
+        
+        # 缩略图最长边（像素）
+        self.thumbnail_size = 240
+        
+        # 图片存储表SQL（按内容哈希去重，引用计数）
+        self.create_image_blobs_table_sql = """
+        CREATE TABLE IF NOT EXISTS image_blobs (
+            hash CHAR(64) PRIMARY KEY COMMENT '图片内容SHA-256',
+            data LONGBLOB COMMENT '图片数据，磁盘存储时为空',
+            size INT NOT NULL,
+            ref_count INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+        
+        # 计数表SQL：各表行数随写入在同一事务内增减，统计查询按主键读取，不再 COUNT(*)
+        self.create_counters_table_sql = """
+        CREATE TABLE IF NOT EXISTS table_counters (
+            name VARCHAR(64) PRIMARY KEY COMMENT '计数项，如 detection:all、detection:camera、quiz',
+            value BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+        
+        # 图片存储配置：'table' 存入 image_blobs 表，'disk' 存入按哈希分片的目录
+        self.image_store_config = {
+            'backend': 'table',
+            'root': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'image_store')
+        }
+        
+        # 查询计时：按方法汇总延迟直方图，超过阈值的语句写入慢查询日志
+        self.query_profiler_config = {
+            'enabled': True,
+            'slow_threshold_ms': float(os.environ.get('RAICOM_SLOW_QUERY_MS', 200)),
+            'slow_log_path': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                          'logs', 'slow_queries.log'),
+            'recent_slow': 50  # 内存中保留的最近慢查询条数
+        }
+        
+        # 桌面端历史图片读缓存（按总字节数限容的LRU）
+        self.image_cache_config = {
+            'max_bytes': 64 * 1024 * 1024,      # 缓存总容量
+            'max_item_bytes': 16 * 1024 * 1024  # 单张图片超过该大小不缓存
+        }
+        
+        # 历史记录保留策略：按主键范围分批删除，批间暂停，避免长时间持锁与大事务
+        self.retention_config = {
+            'days': 30,                    # 保留天数
+            'batch_size': 200,             # 每批删除条数
+            'pause': 0.2,                  # 批间暂停（秒）
+            'archive': False,              # 删除前是否归档记录与图片
+            'archive_dir': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'archive'),
+            'interval_hours': 0            # 自动清理间隔（小时），0 表示不自动清理
+        }
+        
         # 反馈表SQL
         self.create_feedback_table_sql = """
         CREATE TABLE IF NOT EXISTS detection_feedback (
@@ -65,6 +179,56 @@ class DatabaseConfig:
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         """
         
+        # 反馈汇总表SQL：保存/删除反馈时在同一事务内增减，统计接口只读汇总表
+        # 按预测分类和满意度（0表示未评分）汇总
+        self.create_feedback_category_rollup_sql = """
+        CREATE TABLE IF NOT EXISTS feedback_category_rollup (
+            predicted_category VARCHAR(50) NOT NULL,
+            satisfaction TINYINT NOT NULL DEFAULT 0 COMMENT '满意度 1-5，0=未评分',
+            total INT NOT NULL DEFAULT 0,
+            correct_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (predicted_category, satisfaction)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+        # 按天汇总
+        self.create_feedback_daily_rollup_sql = """
+        CREATE TABLE IF NOT EXISTS feedback_daily_rollup (
+            feedback_date DATE PRIMARY KEY,
+            total INT NOT NULL DEFAULT 0,
+            correct_count INT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+        # 统计接口展示的趋势天数
+        self.feedback_trend_days = 7
+        
+        # 检测目标表SQL：每个检测框一行，用于按类别/分类统计，不再逐行解析 detection_results JSON
+        self.create_detection_objects_table_sql = """
+        CREATE TABLE IF NOT EXISTS detection_objects (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            record_id INT NOT NULL,
+            class_name VARCHAR(100) NOT NULL,
+            category VARCHAR(50),
+            confidence FLOAT,
+            bbox_x FLOAT,
+            bbox_y FLOAT,
+            bbox_w FLOAT,
+            bbox_h FLOAT,
+            detection_time DATETIME NOT NULL,
+            INDEX idx_class_time_record (class_name, detection_time, record_id, confidence),
+            INDEX idx_category_time_record (category, detection_time, record_id, confidence),
+            INDEX idx_time_record (detection_time, record_id, confidence),
+            INDEX idx_record (record_id),
+            FOREIGN KEY (record_id) REFERENCES detection_history(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+        # 检索用的覆盖索引（按时间倒序翻页，置信度条件在索引内判断），替换旧的 (类别, 时间) 索引
+        self.detection_objects_index_upgrades = [
+            ('idx_class_time_record', "INDEX idx_class_time_record (class_name, detection_time, record_id, confidence)"),
+            ('idx_category_time_record', "INDEX idx_category_time_record (category, detection_time, record_id, confidence)"),
+            ('idx_time_record', "INDEX idx_time_record (detection_time, record_id, confidence)"),
+        ]
+        self.detection_objects_obsolete_indexes = ['idx_class_time', 'idx_category_time']
+        
         # 题库表SQL
         self.create_quiz_table_sql = """
         CREATE TABLE IF NOT EXISTS quiz_questions (
@@ -85,163 +249,484 @@ class DatabaseManager:
     
     def __init__(self):
         self.config = DatabaseConfig()
-        self.connection = None
-        self.cursor = None
+        self.backend = create_backend(self.config)
+        self.schema_ready = False
+        self._bootstrap_lock = threading.Lock()
+        self._last_bootstrap_attempt = 0.0
+        self.pool = None
+        self.writer = None
+        self.image_store = ImageStore(db_backend=self.backend, **self.config.image_store_config)
+        self.quiz_sampler = QuizSampler(self._load_quiz_questions, self._get_quiz_version)
+        self._pool_lock = threading.Lock()
+        self.retention_scheduler = None
+        self.profiler = QueryProfiler(owner_files=(__file__,), **self.config.query_profiler_config)
         
+    def bootstrap(self) -> bool:
+        """创建数据库并执行未完成的结构迁移；成功后本进程不再重复执行"""
+        with self._bootstrap_lock:
+            if self.schema_ready:
+                return True
+            self._last_bootstrap_attempt = time.time()
+            try:
+                self.backend.create_database()
+                conn = self.backend.connect()
+                try:
+                    run_migrations(self, conn)
+                finally:
+                    conn.close()
+                
+                self.schema_ready = True
+                print(f"数据库初始化完成（{self.backend.name}）")
+                return True
+                
+            except Error as e:
+                print(f"数据库初始化失败: {e}")
+                return False
+    
     def connect(self) -> bool:
-        """连接到数据库（初始化用）"""
+        """兼容旧接口，等同于 bootstrap()"""
+        return self.bootstrap()
+    
+    def ensure_ready(self) -> bool:
+        """请求路径使用的轻量检查：结构已就绪且连接池能取到可用连接
+        
+        结构未就绪时按 bootstrap_retry_interval 间隔重试初始化，数据库不可用时不会每个请求都去连接。
+        """
+        if not self.schema_ready:
+            if time.time() - self._last_bootstrap_attempt < self.config.bootstrap_retry_interval:
+                return False
+            if not self.bootstrap():
+                return False
+        conn = self._get_connection()
+        if not conn:
+            return False
+        conn.close()
+        return True
+    
+    # ========== 计数 ==========
+    
+    QUIZ_COUNTER = 'quiz'
+    QUIZ_VERSION_COUNTER = 'quiz:version'  # 题库每次写入加一，抽题缓存据此刷新
+    
+    @staticmethod
+    def _detection_counter(source_type: str = None) -> str:
+        return f"detection:{source_type or 'all'}"
+    
+    def _detection_deltas(self, source_types, sign: int = 1) -> Counter:
+        """按来源类型统计检测记录计数的增减量"""
+        deltas = Counter()
+        for source_type in source_types:
+            deltas[self._detection_counter()] += sign
+            deltas[self._detection_counter(source_type)] += sign
+        return deltas
+    
+    def _bump_counters(self, cursor, deltas: Dict[str, int]):
+        """在当前事务中增减计数（按名称排序加锁，避免并发事务死锁）"""
+        for name in sorted(deltas):
+            if deltas[name]:
+                cursor.execute(self.backend.upsert_sql('table_counters', ('name', 'value'), ('name',),
+                                                       add_columns=('value',)),
+                               (name, deltas[name]))
+    
+    def _rebuild_counters(self, cursor):
+        """按实际行数重建全部计数"""
+        cursor.execute("SELECT source_type, COUNT(*) FROM detection_history GROUP BY source_type")
+        values = {self._detection_counter(): 0}
+        for source_type, count in cursor.fetchall():
+            values[self._detection_counter(source_type)] = count
+            values[self._detection_counter()] += count
+        cursor.execute("SELECT COUNT(*) FROM quiz_questions")
+        values[self.QUIZ_COUNTER] = cursor.fetchone()[0]
+        cursor.execute("DELETE FROM table_counters WHERE name LIKE 'detection:%'")
+        cursor.executemany(self.backend.upsert_sql('table_counters', ('name', 'value'), ('name',),
+                                                   replace_columns=('value',)),
+                           list(values.items()))
+    
+    def rebuild_counters(self) -> bool:
+        """重新统计全部计数（计数与实际行数不一致时手动修复）"""
+        conn = None
+        cursor = None
         try:
-            # 首先连接到MySQL服务器（不指定数据库）
-            temp_config = self.config.config.copy()
-            temp_config.pop('database', None)
-            
-            conn = mysql.connector.connect(**temp_config)
-            cursor = conn.cursor()
-            
-            # 创建数据库
-            cursor.execute(self.config.create_database_sql)
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            # 连接到指定数据库并创建表
-            conn = mysql.connector.connect(**self.config.config)
+            conn = self._get_connection()
+            if not conn:
+                return False
             cursor = conn.cursor()
-            
-            # 创建表
-            cursor.execute(self.config.create_table_sql)
-            cursor.execute(self.config.create_feedback_table_sql)
-            cursor.execute(self.config.create_quiz_table_sql)
+            conn.start_transaction()
+            self._rebuild_counters(cursor)
             conn.commit()
-            cursor.close()
-            conn.close()
-            
-            # 初始化题库数据
-            self._init_quiz_data()
-            
-            print("数据库连接成功")
             return True
-            
         except Error as e:
-            print(f"数据库连接失败: {e}")
+            print(f"重建计数失败: {e}")
             return False
+        finally:
+            if cursor:
+                try: cursor.close()
+                except: pass
+            if conn:
+                try: conn.close()
+                except: pass
+    
+    def _get_counter(self, name: str) -> int:
+        """按主键读取计数"""
+        conn = None
+        cursor = None
+        try:
+            conn = self._get_connection()
+            if not conn:
+                return 0
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM table_counters WHERE name = %s", (name,))
+            result = cursor.fetchone()
+            return int(result[0]) if result else 0
+        except Error as e:
+            print(f"读取计数失败: {e}")
+            return 0
+        finally:
+            if cursor:
+                try: cursor.close()
+                except: pass
+            if conn:
+                try: conn.close()
+                except: pass
+    
+    def _get_pool(self) -> ConnectionPool:
+        """获取连接池（首次使用时创建）"""
+        if self.pool is None:
+            with self._pool_lock:
+                if self.pool is None:
+                    self.pool = ConnectionPool(self.config.config, connect_func=self._connect,
+                                               **self.config.pool_config)
+        return self.pool
+    
+    def _connect(self):
+        """建立连接池的新连接，开启查询计时时包装为计时连接"""
+        conn = self.backend.connect()
+        if self.profiler.enabled:
+            return ProfiledConnection(conn, self.profiler)
+        return conn
+    
+    def get_query_stats(self) -> Dict:
+        """查询计时指标：各方法的次数、延迟直方图、行数/字节数与最近的慢查询"""
+        return self.profiler.snapshot()
     
     def _get_connection(self):
-        """获取一个新的数据库连接（每次请求独立连接）"""
+        """从连接池取出一个连接，调用方 close() 时归还连接池"""
         try:
-            conn = mysql.connector.connect(**self.config.config)
-            return conn
+            return self._get_pool().get_connection()
         except Error as e:
             print(f"获取数据库连接失败: {e}")
             return None
     
+    def get_pool_stats(self) -> Dict:
+        """获取连接池指标"""
+        if self.pool is None:
+            return {}
+        return self.pool.stats()
+    
     def disconnect(self):
-        """断开数据库连接"""
-        pass  # 不再需要，每次请求后自动关闭
+        """关闭连接池中的空闲连接"""
+        if self.pool is not None:
+            self.pool.close_all()
     
     def save_detection_record(self, image_path: str, detection_results: List[Dict], 
                             confidence_scores: List[float], processing_time: float,
                             source_type: str = 'upload', image_data: bytes = None,
                             result_image_path: str = None, result_image_data: bytes = None) -> bool:
-        """保存检测记录"""
+        """同步保存检测记录"""
         try:
-            if not self._ensure_connection():
-                return False
-            
-            # 准备数据
-            detection_time = datetime.now()
-            
-            # 将检测结果转换为JSON字符串
-            results_json = json.dumps(detection_results, ensure_ascii=False)
-            confidence_json = json.dumps(confidence_scores, ensure_ascii=False)
-            
-            # 如果没有提供图片数据，尝试从文件路径读取
-            if image_data is None and os.path.exists(image_path):
-                with open(image_path, 'rb') as f:
-                    image_data = f.read()
-            
-            # 插入记录
-            insert_sql = """
-            INSERT INTO detection_history 
-            (image_path, image_data, result_image_path, result_image_data, detection_results, detection_time, 
-             confidence_scores, processing_time, source_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            values = (
-                image_path,
-                image_data,
-                result_image_path,
-                result_image_data,
-                results_json,
-                detection_time,
-                confidence_json,
-                processing_time,
-                source_type
-            )
-            
-            self.cursor.execute(insert_sql, values)
-            self.connection.commit()
-            
+            row = self._build_detection_row(image_path, detection_results, confidence_scores,
+                                            processing_time, source_type, image_data,
+                                            result_image_path, result_image_data)
+            self._insert_detection_rows([row])
             print(f"检测记录已保存: {image_path}")
             return True
             
-        except Error as e:
+        except (Error, OSError) as e:
             print(f"保存检测记录失败: {e}")
             return False
     
+    def save_detection_record_async(self, image_path: str, detection_results: List[Dict], 
+                                    confidence_scores: List[float], processing_time: float,
+                                    source_type: str = 'upload', image_data: bytes = None,
+                                    result_image_path: str = None, result_image_data: bytes = None) -> Future:
+        """异步保存检测记录：入队后立即返回Future，结果为新记录ID"""
+        try:
+            row = self._build_detection_row(image_path, detection_results, confidence_scores,
+                                            processing_time, source_type, image_data,
+                                            result_image_path, result_image_data)
+        except OSError as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+        return self._get_writer().submit(row)
+    
+    def _build_detection_row(self, image_path, detection_results, confidence_scores, processing_time,
+                             source_type, image_data, result_image_path, result_image_data) -> tuple:
+        """组装一行 detection_history 插入数据（在调用方线程执行）
+        
+        缩略图（JPEG解码、缩放、编码）在这里生成并作为最后一列，不放在写入事务里做，
+        避免拉长批量写入事务和图片记录行锁的持有时间。
+        """
+        # 如果没有提供图片数据，尝试从文件路径读取
+        if image_data is None and os.path.exists(image_path):
+            with open(image_path, 'rb') as f:
+                image_data = f.read()
+        
+        return (
+            image_path,
+            image_data,
+            result_image_path,
+            result_image_data,
+            json.dumps(detection_results, ensure_ascii=False),
+            datetime.now(),
+            json.dumps(confidence_scores, ensure_ascii=False),
+            processing_time,
+            source_type,
+            # 缩略图优先取结果图
+            make_thumbnail(result_image_data or image_data, self.config.thumbnail_size)
+        )
+    
+    def _insert_detection_rows(self, rows: List[tuple]) -> List[int]:
+        """在一个事务内批量插入检测记录，返回新记录ID列表；失败时抛出异常"""
+        conn = self._get_connection()
+        if not conn:
+            raise Error(msg="无法获取数据库连接", errno=2003)
+        cursor = None
+        written = []  # 本事务写入的图片文件，回滚时清理
+        try:
+            cursor = conn.cursor()
+            conn.start_transaction()
+            # 图片存入内容寻址存储，记录中只保存哈希；缩略图已由 _build_detection_row 生成
+            stored_rows = []
+            for row in rows:
+                image_hash = self.image_store.put(cursor, row[1], written)
+                result_image_hash = self.image_store.put(cursor, row[3], written)
+                thumbnail_hash = self.image_store.put(cursor, row[9], written)
+                stored_rows.append((row[0], image_hash, row[2], result_image_hash, thumbnail_hash) + tuple(row[4:9]))
+            insert_sql = """
+            INSERT INTO detection_history 
+            (image_path, image_hash, result_image_path, result_image_hash, thumbnail_hash, detection_results, 
+             detection_time, confidence_scores, processing_time, source_type)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """
+            ids = self.backend.insert_rows(cursor, insert_sql, stored_rows)
+            # 检测目标随记录一起批量写入
+            objects = []
+            for record_id, row in zip(ids, rows):
+                objects.extend(extract_objects(record_id, row[5], json.loads(row[4]), json.loads(row[6] or '[]')))
+            self._insert_objects(cursor, objects)
+            self._bump_counters(cursor, self._detection_deltas(row[8] for row in rows))
+            conn.commit()
+            return ids
+        except Exception:
+            try: conn.rollback()
+            except: pass
+            self.image_store.remove_files(conn, written)
+            raise
+        finally:
+            if cursor:
+                try: cursor.close()
+                except: pass
+            try: conn.close()
+            except: pass
+    
+    def _get_writer(self) -> WriteBehindQueue:
+        """获取检测记录后写队列（首次使用时创建）"""
+        if self.writer is None:
+            with self._pool_lock:
+                if self.writer is None:
+                    self.writer = WriteBehindQueue(self._insert_detection_rows,
+                                                   is_transient=self.backend.is_transient_error,
+                                                   name='detection-writer',
+                                                   **self.config.writer_config)
+                    atexit.register(self.writer.close)
+        return self.writer
+    
+    def get_writer_stats(self) -> Dict:
+        """获取后写队列指标"""
+        if self.writer is None:
+            return {}
+        return self.writer.stats()
+    
     def _ensure_connection(self) -> bool:
         """确保数据库可用（仅用于兼容）"""
         return True
     
-    def get_detection_history(self, limit: int = 50, offset: int = 0, 
-                            source_type: str = None) -> List[Dict]:
-        """获取检测历史记录"""
+    # 历史列表查询的列，与 _row_to_record 对应
+    HISTORY_COLUMNS = """id, image_path, detection_results, detection_time, 
+                   confidence_scores, processing_time, source_type,
+                   thumbnail_hash IS NOT NULL"""
+    
+    @staticmethod
+    def _row_to_record(row) -> Dict:
+        return {
+            'id': row[0],
+            'image_path': row[1],
+            'detection_results': json.loads(row[2]) if row[2] else [],
+            'detection_time': row[3],
+            'confidence_scores': json.loads(row[4]) if row[4] else [],
+            'processing_time': row[5],
+            'source_type': row[6],
+            'has_thumbnail': bool(row[7])
+        }
+    
+    @staticmethod
+    def encode_page_cursor(page_cursor: Optional[Tuple[datetime, int]]) -> Optional[str]:
+        """翻页游标 (detection_time, id) 编码为字符串，供接口返回"""
+        if not page_cursor:
+            return None
+        detection_time, record_id = page_cursor
+        return f"{detection_time.isoformat()}_{record_id}"
+    
+    @staticmethod
+    def decode_page_cursor(value: Optional[str]) -> Optional[Tuple[datetime, int]]:
+        """解析 encode_page_cursor 生成的字符串，格式错误抛出 ValueError"""
+        if not value:
+            return None
+        time_part, _, id_part = value.rpartition('_')
+        return datetime.fromisoformat(time_part), int(id_part)
+    
+    @staticmethod
+    def _record_filter_sql(source_type: str = None, start_time: datetime = None, end_time: datetime = None,
+                           class_name: str = None, category: str = None,
+                           min_confidence: float = None, max_confidence: float = None):
+        """逐条记录判断的检索条件（detection_history 别名 h），返回 (条件列表, 参数)
+        
+        与 _search_sql 的条件相同，但目标条件以 EXISTS 子查询匹配 detection_objects，
+        用于按ID范围读取（导出、增量刷新），每条记录只返回一次。
+        """
+        conditions, params = [], []
+        object_conditions = []
+        for target, condition, value in ((conditions, "h.source_type = %s", source_type),
+                                         (conditions, "h.detection_time >= %s", start_time),
+                                         (conditions, "h.detection_time < %s", end_time),
+                                         (object_conditions, "o.class_name = %s", class_name),
+                                         (object_conditions, "o.category = %s", category),
+                                         (object_conditions, "o.confidence >= %s", min_confidence),
+                                         (object_conditions, "o.confidence <= %s", max_confidence)):
+            if value is not None and value != '':
+                target.append(condition)
+                params.append(value)
+        if object_conditions:
+            conditions.append("EXISTS (SELECT 1 FROM detection_objects o WHERE o.record_id = h.id AND "
+                              + " AND ".join(object_conditions) + ")")
+        return conditions, params
+    
+    def iter_detection_export(self, source_type: str = None, start_time: datetime = None,
+                              end_time: datetime = None, include_images: bool = False,
+                              fetch_size: int = 200, class_name: str = None, category: str = None,
+                              min_confidence: float = None, max_confidence: float = None):
+        """按ID顺序流式读取检测记录（用于导出），逐条产出记录字典
+        
+        检索条件与 search_detection_history 相同（见 SEARCH_FILTERS 与 _record_filter_sql）。
+        使用服务端游标分批读取，内存占用与记录总数无关。include_images=True 时同一查询
+        关联 image_blobs 取出原图与结果图（image_data / result_image_data）。
+        迭代中途放弃时丢弃该连接，避免把带未读结果的连接归还连接池。
+        """
+        conditions, params = self._record_filter_sql(source_type, start_time, end_time, class_name, category,
+                                                     min_confidence, max_confidence)
+        columns = """h.id, h.image_path, h.detection_results, h.detection_time, h.confidence_scores,
+                     h.processing_time, h.source_type, h.result_image_path"""
+        joins = ""
+        if include_images:
+            columns += ", h.image_hash, ib.data, h.result_image_hash, rb.data"
+            joins = """ LEFT JOIN image_blobs ib ON ib.hash = h.image_hash
+                        LEFT JOIN image_blobs rb ON rb.hash = h.result_image_hash"""
+        sql = f"SELECT {columns} FROM detection_history h{joins}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY h.id"
+        
+        conn = self._get_connection()
+        if not conn:
+            return
+        cursor = None
+        finished = False
+        try:
+            cursor = self.backend.streaming_cursor(conn)
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    record = {
+                        'id': row[0],
+                        'image_path': row[1],
+                        'detection_results': json.loads(row[2]) if row[2] else [],
+                        'detection_time': row[3],
+                        'confidence_scores': json.loads(row[4]) if row[4] else [],
+                        'processing_time': row[5],
+                        'source_type': row[6],
+                        'result_image_path': row[7]
+                    }
+                    if include_images:
+                        image_data, result_image_data = row[9], row[11]
+                        if self.image_store.backend == 'disk':
+                            # 磁盘存储后端的图片不在表内，按哈希读文件
+                            image_data = image_data or self.image_store.get(None, row[8])
+                            result_image_data = result_image_data or self.image_store.get(None, row[10])
+                        record['image_data'] = image_data
+                        record['result_image_data'] = result_image_data
+                    yield record
+            finished = True
+        finally:
+            if finished:
+                if cursor:
+                    try: cursor.close()
+                    except: pass
+                try: conn.close()
+                except: pass
+            else:
+                conn.discard()
+    
+    def get_detection_history_page(self, limit: int = 50, page_cursor: Tuple[datetime, int] = None,
+                                   source_type: str = None) -> Tuple[List[Dict], Optional[Tuple[datetime, int]]]:
+        """按游标翻页获取检测历史（按时间倒序）
+        
+        page_cursor 为上一页最后一条记录的 (detection_time, id)，首页传None。
+        查询走 (detection_time, id) / (source_type, detection_time, id) 索引直接定位，
+        不会像 OFFSET 那样扫描并丢弃前面所有页的记录。
+        返回 (记录列表, 下一页游标)，没有更多记录时下一页游标为None。
+        """
         conn = None
         cursor = None
         try:
             conn = self._get_connection()
             if not conn:
-                return []
+                return [], None
             cursor = conn.cursor()
             
-            # 构建查询SQL
-            sql = """
-            SELECT id, image_path, detection_results, detection_time, 
-                   confidence_scores, processing_time, source_type
-            FROM detection_history
-            """
+            conditions = []
             params = []
-            
             if source_type:
-                sql += " WHERE source_type = %s"
+                conditions.append("source_type = %s")
                 params.append(source_type)
-            
-            sql += " ORDER BY detection_time DESC LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
+            if page_cursor:
+                detection_time, record_id = page_cursor
+                # detection_time <= t 给出索引范围上界（OR 写法在部分优化器下只能全索引扫描），
+                # 再排除同一时间点上已返回过的记录
+                conditions.append("detection_time <= %s AND (detection_time < %s OR id < %s)")
+                params.extend([detection_time, detection_time, record_id])
+            
+            sql = f"SELECT {self.HISTORY_COLUMNS} FROM detection_history"
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+            # 多取一条判断是否还有下一页
+            sql += " ORDER BY detection_time DESC, id DESC LIMIT %s"
+            params.append(limit + 1)
             
             cursor.execute(sql, params)
             results = cursor.fetchall()
-            
-            # 转换为字典列表
-            history = []
-            for row in results:
-                record = {
-                    'id': row[0],
-                    'image_path': row[1],
-                    'detection_results': json.loads(row[2]) if row[2] else [],
-                    'detection_time': row[3],
-                    'confidence_scores': json.loads(row[4]) if row[4] else [],
-                    'processing_time': row[5],
-                    'source_type': row[6]
-                }
-                history.append(record)
-            
-            return history
+            history = [self._row_to_record(row) for row in results[:limit]]
+            next_cursor = None
+            if len(results) > limit and history:
+                next_cursor = (history[-1]['detection_time'], history[-1]['id'])
+            return history, next_cursor
             
         except Error as e:
             print(f"获取检测历史失败: {e}")
-            return []
+            return [], None
         finally:
             if cursor:
                 try: cursor.close()
@@ -250,30 +735,39 @@ class DatabaseManager:
                 try: conn.close()
                 except: pass
     
-    def get_detection_count(self, source_type: str = None) -> int:
-        """获取检测记录总数"""
+    def get_detection_history(self, limit: int = 50, offset: int = 0, 
+                            source_type: str = None) -> List[Dict]:
+        """获取检测历史记录（OFFSET分页，深页请使用 get_detection_history_page）"""
         conn = None
         cursor = None
         try:
             conn = self._get_connection()
             if not conn:
-                return 0
+                return []
             cursor = conn.cursor()
             
-            sql = "SELECT COUNT(*) FROM detection_history"
+            # 构建查询SQL
+            sql = f"""
+            SELECT {self.HISTORY_COLUMNS}
+            FROM detection_history
+            """
             params = []
             
             if source_type:
                 sql += " WHERE source_type = %s"
                 params.append(source_type)
             
+            sql += " ORDER BY detection_time DESC, id DESC LIMIT %s OFFSET %s"
+            params.extend([limit, offset])
+            
             cursor.execute(sql, params)
-            result = cursor.fetchone()
-            return result[0] if result else 0
+            results = cursor.fetchall()
+            
+            return [self._row_to_record(row) for row in results]
             
         except Error as e:
-            print(f"获取检测记录总数失败: {e}")
-            return 0
+            print(f"获取检测历史失败: {e}")
+            return []
         finally:
             if cursor:
                 try: cursor.close()
@@ -282,6 +776,10 @@ class DatabaseManager:
                 try: conn.close()
                 except: pass
     
+    def get_detection_count(self, source_type: str = None) -> int:
+        """获取检测记录总数（读取计数表）"""
+        return self._get_counter(self._detection_counter(source_type))
+    
     def get_latest_detection_time(self, source_type: str = None) -> Optional[datetime]:
         """获取最新检测记录的时间"""
         conn = None
@@ -314,6 +812,24 @@ class DatabaseManager:
                 try: conn.close()
                 except: pass
     
+    def get_latest_record_id(self) -> int:
+        """最新一条检测记录的ID（主键索引末端，常数时间），用于轮询是否有新记录"""
+        rows = self._query("SELECT MAX(id) FROM detection_history")
+        return int(rows[0][0]) if rows and rows[0][0] is not None else 0
+    
+    def get_detection_history_after_id(self, after_id: int, source_type: str = None,
+                                       limit: int = 200, **filters) -> List[Dict]:
+        """获取ID大于 after_id 且符合检索条件的检测记录（按ID升序），走主键范围扫描
+        
+        以ID而不是检测时间为水位：检测时间在入队时确定，后写队列提交较晚的记录
+        时间可能早于已看到的最新记录，按时间比较会漏掉。filters 见 SEARCH_FILTERS。
+        """
+        conditions, params = self._record_filter_sql(source_type, **filters)
+        sql = f"SELECT {self.HISTORY_COLUMNS} FROM detection_history h WHERE " + " AND ".join(
+            ["h.id > %s"] + conditions)
+        sql += " ORDER BY h.id LIMIT %s"
+        return [self._row_to_record(row) for row in self._query(sql, [after_id] + params + [limit])]
+    
     def get_detection_history_after(self, after_time: datetime, source_type: str = None, limit: int = 50) -> List[Dict]:
         """获取指定时间之后的检测记录"""
         conn = None
@@ -325,9 +841,8 @@ class DatabaseManager:
             cursor = conn.cursor()
             
             # 构建查询SQL
-            sql = """
-            SELECT id, image_path, detection_results, detection_time, 
-                   confidence_scores, processing_time, source_type
+            sql = f"""
+            SELECT {self.HISTORY_COLUMNS}
             FROM detection_history
             WHERE detection_time > %s
             """
@@ -343,21 +858,7 @@ class DatabaseManager:
             cursor.execute(sql, params)
             results = cursor.fetchall()
             
-            # 转换为字典列表
-            history = []
-            for row in results:
-                record = {
-                    'id': row[0],
-                    'image_path': row[1],
-                    'detection_results': json.loads(row[2]) if row[2] else [],
-                    'detection_time': row[3],
-                    'confidence_scores': json.loads(row[4]) if row[4] else [],
-                    'processing_time': row[5],
-                    'source_type': row[6]
-                }
-                history.append(record)
-            
-            return history
+            return [self._row_to_record(row) for row in results]
             
         except Error as e:
             print(f"获取增量检测历史失败: {e}")
@@ -370,6 +871,248 @@ class DatabaseManager:
                 try: conn.close()
                 except: pass
     
+    def _delete_records(self, cursor, where_sql: str, params) -> tuple:
+        """在当前事务中删除满足条件的检测记录并释放其图片引用
+
+        返回 (删除条数, 无引用的图片哈希)，事务提交后应调用 image_store.remove_files 清理文件。
+        """
+        cursor.execute(f"""
+            SELECT id, source_type, image_hash, result_image_hash, thumbnail_hash FROM detection_history
+            WHERE {where_sql}{self.backend.for_update}
+        """, params)
+        rows = cursor.fetchall()
+        if not rows:
+            return 0, []
+        ids = [row[0] for row in rows]
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"DELETE FROM detection_history WHERE id IN ({placeholders})", ids)
+        self._bump_counters(cursor, self._detection_deltas((row[1] for row in rows), sign=-1))
+        hashes = [h for row in rows for h in row[2:]]
+        return len(ids), self.image_store.release(cursor, hashes)
+    
+    # ========== 检测目标 ==========
+    
+    OBJECT_COLUMNS = ('record_id', 'class_name', 'category', 'confidence',
+                      'bbox_x', 'bbox_y', 'bbox_w', 'bbox_h', 'detection_time')
+    
+    def _insert_objects(self, cursor, objects: List[tuple]):
+        if objects:
+            cursor.executemany(f"""
+                INSERT INTO detection_objects ({', '.join(self.OBJECT_COLUMNS)})
+                VALUES ({', '.join(['%s'] * len(self.OBJECT_COLUMNS))})
+            """, objects)
+    
+    def backfill_detection_objects(self, batch_size: int = 500) -> Optional[int]:
+        """为还没有检测目标行的旧记录拆分写入 detection_objects，按ID分批，返回处理的记录数，出错时返回None
+        
+        启动后由 start_legacy_data_migration() 在后台调用一次。
+        """
+        processed = 0
+        last_id = 0
+        while True:
+            conn = None
+            cursor = None
+            try:
+                conn = self._get_connection()
+                if not conn:
+                    return processed
+                cursor = conn.cursor()
+                conn.start_transaction()
+                cursor.execute("""
+                    SELECT h.id, h.detection_results, h.confidence_scores, h.detection_time
+                    FROM detection_history h
+                    WHERE h.id > %s
+                      AND NOT EXISTS (SELECT 1 FROM detection_objects o WHERE o.record_id = h.id)
+                    ORDER BY h.id LIMIT %s
+                """, (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    conn.commit()
+                    return processed
+                objects = []
+                for record_id, results, scores, detection_time in rows:
+                    objects.extend(extract_objects(record_id, detection_time,
+                                                   json.loads(results) if results else [],
+                                                   json.loads(scores) if scores else []))
+                self._insert_objects(cursor, objects)
+                conn.commit()
+                processed += len(rows)
+                last_id = rows[-1][0]
+            except Exception as e:
+                print(f"回填检测目标失败（已回填 {processed} 条）: {e}")
+                try: conn.rollback()
+                except: pass
+                return None
+            finally:
+                if cursor:
+                    try: cursor.close()
+                    except: pass
+                if conn:
+                    try: conn.close()
+                    except: pass
+    
+    def _query(self, sql: str, params=()) -> list:
+        """执行只读查询并返回全部行，失败返回空列表"""
+        conn = None
+        cursor = None
+        try:
+            conn = self._get_connection()
+            if not conn:
+                return []
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        except Error as e:
+            print(f"查询失败: {e}")
+            return []
+        finally:
+            if cursor:
+                try: cursor.close()
+                except: pass
+            if conn:
+                try: conn.close()
+                except: pass
+    
+    @staticmethod
+    def _object_filters(class_name: str = None, category: str = None,
+                        start_time: datetime = None, end_time: datetime = None):
+        conditions, params = [], []
+        if class_name:
+            conditions.append("class_name = %s")
+            params.append(class_name)
+        if category:
+            conditions.append("category = %s")
+            params.append(category)
+        if start_time:
+            conditions.append("detection_time >= %s")
+            params.append(start_time)
+        if end_time:
+            conditions.append("detection_time < %s")
+            params.append(end_time)
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        return where, params
+    
+    def count_objects(self, class_name: str = None, category: str = None,
+                      start_time: datetime = None, end_time: datetime = None) -> int:
+        """统计检测目标个数，如 count_objects('Battery', start_time=一周前)"""
+        where, params = self._object_filters(class_name, category, start_time, end_time)
+        rows = self._query(f"SELECT COUNT(*) FROM detection_objects{where}", params)
+        return int(rows[0][0]) if rows else 0
+    
+    def get_object_stats(self, group_by: str = 'class_name', category: str = None,
+                         start_time: datetime = None, end_time: datetime = None) -> List[Dict]:
+        """按类别（class_name）或分类（category）汇总目标数、涉及记录数与平均置信度"""
+        if group_by not in ('class_name', 'category'):
+            raise ValueError(f"不支持的分组字段: {group_by}")
+        where, params = self._object_filters(None, category, start_time, end_time)
+        rows = self._query(f"""
+            SELECT {group_by}, COUNT(*), COUNT(DISTINCT record_id), AVG(confidence)
+            FROM detection_objects{where}
+            GROUP BY {group_by}
+            ORDER BY COUNT(*) DESC
+        """, params)
+        return [{
+            group_by: row[0],
+            'count': int(row[1]),
+            'records': int(row[2]),
+            'avg_confidence': round(float(row[3]), 4) if row[3] is not None else None
+        } for row in rows]
+    
+    def get_objects(self, class_name: str = None, category: str = None,
+                    start_time: datetime = None, end_time: datetime = None, limit: int = 100) -> List[Dict]:
+        """按条件获取检测目标明细（按时间倒序）"""
+        where, params = self._object_filters(class_name, category, start_time, end_time)
+        rows = self._query(f"""
+            SELECT {', '.join(self.OBJECT_COLUMNS)} FROM detection_objects{where}
+            ORDER BY detection_time DESC LIMIT %s
+        """, params + [limit])
+        return [dict(zip(self.OBJECT_COLUMNS, row)) for row in rows]
+    
+    # 检索条件：目标类别、垃圾分类、置信度区间作用于同一个检测目标，时间段与来源作用于记录
+    SEARCH_FILTERS = ('class_name', 'category', 'min_confidence', 'max_confidence', 'start_time', 'end_time')
+    
+    @staticmethod
+    def _search_sql(source_type: str = None, class_name: str = None, category: str = None,
+                    min_confidence: float = None, max_confidence: float = None,
+                    start_time: datetime = None, end_time: datetime = None):
+        """返回 (FROM 子句, 条件列表, 参数, 时间列, 记录ID列)
+        
+        有目标条件时从 detection_objects 的覆盖索引 (类别/分类, 检测时间, 记录ID, 置信度) 按时间倒序取，
+        目标行的检测时间与所属记录相同，游标与 get_detection_history_page 通用；
+        否则直接走 detection_history 的 (来源, 检测时间, ID) 索引。
+        """
+        by_objects = class_name or category or min_confidence is not None or max_confidence is not None
+        if by_objects:
+            table, time_column, id_column = "detection_objects o", "o.detection_time", "o.record_id"
+            if source_type:
+                table += " JOIN detection_history h ON h.id = o.record_id"
+        else:
+            table, time_column, id_column = "detection_history h", "h.detection_time", "h.id"
+        conditions, params = [], []
+        for condition, value in (("o.class_name = %s", class_name),
+                                 ("o.category = %s", category),
+                                 ("o.confidence >= %s", min_confidence),
+                                 ("o.confidence <= %s", max_confidence),
+                                 ("h.source_type = %s", source_type),
+                                 (f"{time_column} >= %s", start_time),
+                                 (f"{time_column} < %s", end_time)):
+            if value is not None and value != '':
+                conditions.append(condition)
+                params.append(value)
+        return table, conditions, params, time_column, id_column
+    
+    def search_detection_history(self, limit: int = 50, page_cursor: Tuple[datetime, int] = None,
+                                 source_type: str = None, **filters) -> Tuple[List[Dict], Optional[Tuple]]:
+        """按条件检索检测记录（游标翻页，新的在前），返回 (记录列表, 下一页游标)
+        
+        filters 见 SEARCH_FILTERS，例如
+        search_detection_history(class_name='Battery', min_confidence=0.8, start_time=一周前)
+        """
+        table, conditions, params, time_column, id_column = self._search_sql(source_type, **filters)
+        if page_cursor:
+            detection_time, record_id = page_cursor
+            conditions.append(f"{time_column} <= %s AND ({time_column} < %s OR {id_column} < %s)")
+            params.extend([detection_time, detection_time, record_id])
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        
+        if table.startswith("detection_history"):
+            fetched = self._query(f"""
+                SELECT {self.HISTORY_COLUMNS} FROM {table}{where}
+                ORDER BY {time_column} DESC, {id_column} DESC LIMIT %s
+            """, params + [limit + 1])
+            history = [self._row_to_record(row) for row in fetched[:limit]]
+        else:
+            # 先在目标索引上取一页记录ID（同一记录的多个目标合并），再按主键读取记录
+            fetched = self._query(f"""
+                SELECT {time_column}, {id_column} FROM {table}{where}
+                GROUP BY {time_column}, {id_column}
+                ORDER BY {time_column} DESC, {id_column} DESC LIMIT %s
+            """, params + [limit + 1])
+            ids = [key[1] for key in fetched[:limit]]
+            history = []
+            if ids:
+                records = self._query(f"""
+                    SELECT {self.HISTORY_COLUMNS} FROM detection_history
+                    WHERE id IN ({', '.join(['%s'] * len(ids))})
+                """, ids)
+                by_id = {record['id']: record for record in map(self._row_to_record, records)}
+                history = [by_id[record_id] for record_id in ids if record_id in by_id]
+        
+        next_cursor = None
+        if len(fetched) > limit and history:
+            next_cursor = (history[-1]['detection_time'], history[-1]['id'])
+        return history, next_cursor
+    
+    def count_detection_history(self, source_type: str = None, **filters) -> int:
+        """统计符合检索条件的记录数；没有检索条件时读取计数表"""
+        if not any(value is not None and value != '' for value in filters.values()):
+            return self.get_detection_count(source_type)
+        table, conditions, params, _, id_column = self._search_sql(source_type, **filters)
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        count = f"COUNT(DISTINCT {id_column})" if table.startswith("detection_objects") else "COUNT(*)"
+        rows = self._query(f"SELECT {count} FROM {table}{where}", params)
+        return int(rows[0][0]) if rows else 0
+    
     def delete_detection_record(self, record_id: int) -> bool:
         """删除检测记录"""
         conn = None
@@ -380,9 +1123,10 @@ class DatabaseManager:
                 return False
             cursor = conn.cursor()
             
-            sql = "DELETE FROM detection_history WHERE id = %s"
-            cursor.execute(sql, (record_id,))
+            conn.start_transaction()
+            _, orphans = self._delete_records(cursor, "id = %s", (record_id,))
             conn.commit()
+            self.image_store.remove_files(conn, orphans)
             
             print(f"检测记录已删除: ID {record_id}")
             return True
@@ -398,8 +1142,8 @@ class DatabaseManager:
                 try: conn.close()
                 except: pass
     
-    def get_image_data(self, record_id: int) -> Optional[bytes]:
-        """获取图片数据"""
+    def _get_stored_image(self, record_id: int, hash_column: str) -> Optional[bytes]:
+        """按记录的图片哈希从图片存储读取图片"""
         conn = None
         cursor = None
         try:
@@ -408,11 +1152,11 @@ class DatabaseManager:
                 return None
             cursor = conn.cursor()
             
-            sql = "SELECT image_data FROM detection_history WHERE id = %s"
-            cursor.execute(sql, (record_id,))
+            cursor.execute(f"SELECT {hash_column} FROM detection_history WHERE id = %s", (record_id,))
             result = cursor.fetchone()
-            
-            return result[0] if result and result[0] else None
+            if not result:
+                return None
+            return self.image_store.get(cursor, result[0])
             
         except Error as e:
             print(f"获取图片数据失败: {e}")
@@ -425,8 +1169,16 @@ class DatabaseManager:
                 try: conn.close()
                 except: pass
     
+    def get_image_data(self, record_id: int) -> Optional[bytes]:
+        """获取图片数据"""
+        return self._get_stored_image(record_id, 'image_hash')
+    
     def get_result_image_data(self, record_id: int) -> Optional[bytes]:
         """获取结果图片数据"""
+        return self._get_stored_image(record_id, 'result_image_hash')
+    
+    def get_full_image_data(self, record_id: int) -> Optional[bytes]:
+        """获取原尺寸图片：优先检测结果图，没有则取原图（一次查询）"""
         conn = None
         cursor = None
         try:
@@ -435,14 +1187,24 @@ class DatabaseManager:
                 return None
             cursor = conn.cursor()
             
-            sql = "SELECT result_image_data FROM detection_history WHERE id = %s"
-            cursor.execute(sql, (record_id,))
+            cursor.execute("""
+                SELECT h.result_image_hash, h.image_hash,
+                       COALESCE(rb.data, ib.data)
+                FROM detection_history h
+                LEFT JOIN image_blobs rb ON rb.hash = h.result_image_hash
+                LEFT JOIN image_blobs ib ON ib.hash = h.image_hash
+                WHERE h.id = %s
+            """, (record_id,))
             result = cursor.fetchone()
-            
-            return result[0] if result and result[0] else None
+            if not result:
+                return None
+            if result[2]:
+                return result[2]
+            # 磁盘存储后端的图片不在表内
+            return self.image_store.get(cursor, result[0]) or self.image_store.get(cursor, result[1])
             
         except Error as e:
-            print(f"获取结果图片数据失败: {e}")
+            print(f"获取图片数据失败: {e}")
             return None
         finally:
             if cursor:
@@ -452,26 +1214,102 @@ class DatabaseManager:
                 try: conn.close()
                 except: pass
     
+    def get_thumbnail_data(self, record_id: int) -> Optional[bytes]:
+        """获取缩略图数据，旧记录没有缩略图时返回None"""
+        return self._get_stored_image(record_id, 'thumbnail_hash')
+    
     def clear_old_records(self, days: int = 30) -> bool:
         """清理旧记录"""
+        return self.purge_old_records(days)['success']
+    
+    ARCHIVE_COLUMNS = ('id', 'image_path', 'image_hash', 'result_image_path', 'result_image_hash',
+                       'detection_results', 'detection_time', 'confidence_scores', 'processing_time',
+                       'source_type')
+    
+    def purge_old_records(self, days: int = None, archive: bool = None, batch_size: int = None,
+                          pause: float = None, progress=None, should_stop=None) -> Dict:
+        """按主键范围分批清理 days 天前的检测记录
+        
+        每批一个短事务，批间暂停 pause 秒；archive=True 时每批删除前先把记录和图片写入归档文件。
+        progress(已删除, 待删除总数) 在每批提交后回调；should_stop() 返回True时在批间停止。
+        未指定的参数取 retention_config。返回 {'success', 'deleted', 'total', 'archive', 'stopped'}。
+        """
+        cfg = self.config.retention_config
+        days = cfg['days'] if days is None else days
+        archive = cfg['archive'] if archive is None else archive
+        batch_size = cfg['batch_size'] if batch_size is None else batch_size
+        pause = cfg['pause'] if pause is None else pause
+        cutoff = datetime.now() - timedelta(days=days)
+        result = {'success': False, 'deleted': 0, 'total': 0, 'archive': None, 'stopped': False}
+        
+        # 只清理开始时已存在的记录：先确定主键上界与待删除数
+        rows = self._query("SELECT MAX(id), COUNT(*) FROM detection_history WHERE detection_time < %s", (cutoff,))
+        if not rows:
+            return result
+        max_id, total = rows[0][0], int(rows[0][1] or 0)
+        result['total'] = total
+        if not total:
+            result['success'] = True
+            return result
+        
+        archiver = RetentionArchive(cfg['archive_dir']) if archive else None
+        last_id = 0
+        try:
+            while True:
+                if should_stop and should_stop():
+                    result['stopped'] = True
+                    break
+                # 下一批的主键范围 (last_id, upper]
+                ids = self._query("""
+                    SELECT id FROM detection_history
+                    WHERE id > %s AND id <= %s AND detection_time < %s
+                    ORDER BY id LIMIT %s
+                """, (last_id, max_id, cutoff, batch_size))
+                if not ids:
+                    break
+                upper = ids[-1][0]
+                deleted = self._purge_range(last_id, upper, cutoff, archiver)
+                if deleted is None:
+                    return result
+                result['deleted'] += deleted
+                last_id = upper
+                if progress:
+                    progress(result['deleted'], total)
+                if pause:
+                    time.sleep(pause)
+        finally:
+            if archiver:
+                archiver.close()
+                result['archive'] = archiver.path
+        
+        result['success'] = True
+        print(f"已清理{days}天前的检测记录 {result['deleted']} 条")
+        return result
+    
+    def _purge_range(self, lower: int, upper: int, cutoff: datetime,
+                     archiver: Optional[RetentionArchive]) -> Optional[int]:
+        """在一个事务中（先归档再）删除 (lower, upper] 主键范围内的过期记录，失败返回None"""
         conn = None
         cursor = None
+        params = (lower, upper, cutoff)
+        where_sql = "id > %s AND id <= %s AND detection_time < %s"
         try:
             conn = self._get_connection()
             if not conn:
-                return False
+                return None
             cursor = conn.cursor()
-            
-            sql = "DELETE FROM detection_history WHERE detection_time < DATE_SUB(NOW(), INTERVAL %s DAY)"
-            cursor.execute(sql, (days,))
+            conn.start_transaction()
+            if archiver:
+                self._archive_records(cursor, archiver, where_sql, params)
+            count, orphans = self._delete_records(cursor, where_sql, params)
             conn.commit()
-            
-            print(f"已清理{days}天前的检测记录")
-            return True
-            
+            self.image_store.remove_files(conn, orphans)
+            return count
         except Error as e:
             print(f"清理旧记录失败: {e}")
-            return False
+            try: conn.rollback()
+            except: pass
+            return None
         finally:
             if cursor:
                 try: cursor.close()
@@ -479,14 +1317,174 @@ class DatabaseManager:
             if conn:
                 try: conn.close()
                 except: pass
+    
+    def _archive_records(self, cursor, archiver: RetentionArchive, where_sql: str, params):
+        """把待删除的记录及其图片写入归档（图片从图片存储按哈希读取，同一归档内只写一次）"""
+        cursor.execute(f"SELECT {', '.join(self.ARCHIVE_COLUMNS)} FROM detection_history WHERE {where_sql}",
+                       params)
+        records = []
+        for row in cursor.fetchall():
+            record = dict(zip(self.ARCHIVE_COLUMNS, row))
+            for hash_key in ('image_hash', 'result_image_hash'):
+                if not archiver.has_image(record[hash_key]):
+                    archiver.add_image(record[hash_key], self.image_store.get(cursor, record[hash_key]))
+            records.append(record)
+        archiver.add_records(records)
+    
+    def start_retention_schedule(self, interval_hours: float = None) -> bool:
+        """按 retention_config 启动后台定时清理，间隔为0时不启动"""
+        interval_hours = self.config.retention_config['interval_hours'] if interval_hours is None else interval_hours
+        if interval_hours <= 0 or self.retention_scheduler is not None:
+            return False
+        self.retention_scheduler = RetentionScheduler(
+            lambda: self.purge_old_records(should_stop=lambda: self.retention_scheduler.stopped),
+            interval_hours, name='detection-retention')
+        self.retention_scheduler.start()
+        atexit.register(self.retention_scheduler.stop)
+        return True
+    
+    def migrate_legacy_images(self, batch_size: int = 100) -> Optional[int]:
+        """把旧记录表内的图片BLOB迁移到图片存储，返回迁移的记录数，出错时返回None
+        
+        启动后由 start_legacy_data_migration() 在后台调用一次；表内图片列已删除时直接返回0。
+        """
+        migrated = 0
+        while True:
+            conn = None
+            cursor = None
+            written = []  # 本批写入的图片文件，回滚时清理
+            try:
+                conn = self._get_connection()
+                if not conn:
+                    return migrated
+                cursor = conn.cursor()
+                if not set(LEGACY_IMAGE_COLUMNS) <= self.backend.table_columns(cursor, 'detection_history'):
+                    return migrated
+                conn.start_transaction()
+                cursor.execute(f"""
+                    SELECT id, image_data, result_image_data FROM detection_history
+                    WHERE image_data IS NOT NULL OR result_image_data IS NOT NULL
+                    LIMIT %s{self.backend.for_update}
+                """, (batch_size,))
+                rows = cursor.fetchall()
+                if not rows:
+                    conn.commit()
+                    return migrated
+                for record_id, image_data, result_image_data in rows:
+                    thumbnail = make_thumbnail(result_image_data or image_data, self.config.thumbnail_size)
+                    cursor.execute("""
+                        UPDATE detection_history
+                        SET image_hash = %s, image_data = NULL,
+                            result_image_hash = %s, result_image_data = NULL,
+                            thumbnail_hash = %s
+                        WHERE id = %s
+                    """, (self.image_store.put(cursor, image_data, written),
+                          self.image_store.put(cursor, result_image_data, written),
+                          self.image_store.put(cursor, thumbnail, written), record_id))
+                conn.commit()
+                migrated += len(rows)
+            except Exception as e:
+                # 图片文件写入失败等非数据库异常同样回滚，连接不带着未结束的事务回到连接池
+                print(f"迁移图片数据失败（已迁移 {migrated} 条）: {e}")
+                try: conn.rollback()
+                except: pass
+                self.image_store.remove_files(conn, written)
+                return None
+            finally:
+                if cursor:
+                    try: cursor.close()
+                    except: pass
+                if conn:
+                    try: conn.close()
+                    except: pass
 
+    # 旧数据迁移全部完成后置1，之后启动不再扫描全表
+    LEGACY_DATA_COUNTER = 'maintenance:legacy_data'
+    
+    def run_legacy_data_migration(self) -> bool:
+        """迁移旧记录的行内图片并回填检测目标，全部成功后记录完成标记；已完成时直接返回True
+        
+        桌面端与Web后端可能同时启动，用迁移锁保证只有一个进程在执行。
+        完成后再执行一次结构迁移，删除表内图片列的迁移不必等到下次启动。
+        """
+        if self._get_counter(self.LEGACY_DATA_COUNTER):
+            return True
+        conn = None
+        cursor = None
+        try:
+            conn = self._get_connection()
+            if not conn:
+                return False
+            cursor = conn.cursor()
+            with self.backend.migration_lock(cursor):
+                cursor.execute("SELECT value FROM table_counters WHERE name = %s", (self.LEGACY_DATA_COUNTER,))
+                row = cursor.fetchone()
+                if row and row[0]:
+                    return True
+                images = self.migrate_legacy_images()
+                objects = self.backfill_detection_objects()
+                if images is None or objects is None:
+                    return False
+                cursor.execute(self.backend.upsert_sql('table_counters', ('name', 'value'), ('name',),
+                                                       replace_columns=('value',)),
+                               (self.LEGACY_DATA_COUNTER, 1))
+                conn.commit()
+            print(f"旧数据迁移完成: 图片 {images} 条，检测目标回填 {objects} 条")
+            run_migrations(self, conn)
+            return True
+        except Error as e:
+            print(f"记录旧数据迁移状态失败: {e}")
+            return False
+        finally:
+            if cursor:
+                try: cursor.close()
+                except: pass
+            if conn:
+                try: conn.close()
+                except: pass
+    
+    def start_legacy_data_migration(self):
+        """在后台线程执行 run_legacy_data_migration()（bootstrap 之后调用；未完成的部分下次启动继续）"""
+        threading.Thread(target=self.run_legacy_data_migration, name='legacy-data-migration',
+                         daemon=True).start()
+    
     # ========== 反馈相关方法 ==========
     
+    def _bump_feedback_rollups(self, cursor, feedback_time: datetime, predicted_category: str,
+                               satisfaction: Optional[int], is_correct: bool, sign: int = 1):
+        """在当前事务中增减一条反馈对应的汇总计数"""
+        correct = sign if is_correct else 0
+        counts = ('total', 'correct_count')
+        cursor.execute(self.backend.upsert_sql('feedback_category_rollup',
+                                               ('predicted_category', 'satisfaction') + counts,
+                                               ('predicted_category', 'satisfaction'), add_columns=counts),
+                       (predicted_category, satisfaction or 0, sign, correct))
+        cursor.execute(self.backend.upsert_sql('feedback_daily_rollup', ('feedback_date',) + counts,
+                                               ('feedback_date',), add_columns=counts),
+                       (feedback_time.date(), sign, correct))
+    
+    def _rebuild_feedback_rollups(self, cursor):
+        """按 detection_feedback 全表重建反馈汇总"""
+        cursor.execute("DELETE FROM feedback_category_rollup")
+        cursor.execute("""
+            INSERT INTO feedback_category_rollup (predicted_category, satisfaction, total, correct_count)
+            SELECT predicted_category, COALESCE(satisfaction, 0), COUNT(*), SUM(is_correct)
+            FROM detection_feedback
+            GROUP BY predicted_category, COALESCE(satisfaction, 0)
+        """)
+        cursor.execute("DELETE FROM feedback_daily_rollup")
+        cursor.execute("""
+            INSERT INTO feedback_daily_rollup (feedback_date, total, correct_count)
+            SELECT DATE(feedback_time), COUNT(*), SUM(is_correct)
+            FROM detection_feedback
+            GROUP BY DATE(feedback_time)
+        """)
+    
     def save_feedback(self, garbage_name: str, predicted_category: str, 
                      is_correct: bool, correct_category: str = None,
                      satisfaction: int = None, feedback_comment: str = None,
                      detection_id: int = None) -> bool:
-        """保存用户反馈"""
+        """保存用户反馈（同一事务内更新反馈汇总）"""
         conn = None
         cursor = None
         try:
@@ -502,6 +1500,7 @@ class DatabaseManager:
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             """
             
+            feedback_time = datetime.now()
             values = (
                 detection_id,
                 garbage_name,
@@ -510,15 +1509,19 @@ class DatabaseManager:
                 correct_category,
                 satisfaction,
                 feedback_comment,
-                datetime.now()
+                feedback_time
             )
             
+            conn.start_transaction()
             cursor.execute(sql, values)
+            self._bump_feedback_rollups(cursor, feedback_time, predicted_category, satisfaction, is_correct)
             conn.commit()
             return True
             
         except Error as e:
             print(f"保存反馈失败: {e}")
+            try: conn.rollback()
+            except: pass
             return False
         finally:
             if cursor:
@@ -529,7 +1532,7 @@ class DatabaseManager:
                 except: pass
     
     def get_feedback_stats(self) -> Dict:
-        """获取反馈统计数据"""
+        """获取反馈统计数据（一次查询读取汇总表，耗时与反馈总数无关）"""
         conn = None
         cursor = None
         try:
@@ -538,77 +1541,59 @@ class DatabaseManager:
                 return {}
             cursor = conn.cursor()
             
-            stats = {}
-            
-            # 总反馈数
-            cursor.execute("SELECT COUNT(*) FROM detection_feedback")
-            stats['total_feedback'] = cursor.fetchone()[0]
-            
-            # 正确率
-            cursor.execute("SELECT COUNT(*) FROM detection_feedback WHERE is_correct = 1")
-            correct_count = cursor.fetchone()[0]
-            stats['correct_count'] = correct_count
-            stats['incorrect_count'] = stats['total_feedback'] - correct_count
-            stats['accuracy_rate'] = round(correct_count / stats['total_feedback'] * 100, 2) if stats['total_feedback'] > 0 else 0
-            
-            # 平均满意度
-            cursor.execute("SELECT AVG(satisfaction) FROM detection_feedback WHERE satisfaction IS NOT NULL")
-            avg_satisfaction = cursor.fetchone()[0]
-            stats['avg_satisfaction'] = round(float(avg_satisfaction), 2) if avg_satisfaction else 0
-            
-            # 各分类准确率
-            cursor.execute("""
-                SELECT predicted_category, 
-                       COUNT(*) as total,
-                       SUM(is_correct) as correct
-                FROM detection_feedback 
-                GROUP BY predicted_category
-            """)
-            category_stats = []
-            for row in cursor.fetchall():
-                category_stats.append({
-                    'category': row[0],
-                    'total': row[1],
-                    'correct': row[2],
-                    'accuracy': round(row[2] / row[1] * 100, 2) if row[1] > 0 else 0
-                })
-            stats['category_stats'] = category_stats
-            
-            # 满意度分布
+            since = date.today() - timedelta(days=self.config.feedback_trend_days)
             cursor.execute("""
-                SELECT satisfaction, COUNT(*) as count
-                FROM detection_feedback 
-                WHERE satisfaction IS NOT NULL
-                GROUP BY satisfaction
-                ORDER BY satisfaction
-            """)
+                SELECT 'category', predicted_category, satisfaction, total, correct_count
+                FROM feedback_category_rollup
+                UNION ALL
+                SELECT 'day', feedback_date, 0, total, correct_count
+                FROM feedback_daily_rollup
+                WHERE feedback_date >= %s
+                ORDER BY 1, 2
+            """, (since,))
+            rows = cursor.fetchall()
+            
+            categories = {}
             satisfaction_dist = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-            for row in cursor.fetchall():
-                if row[0]:
-                    satisfaction_dist[row[0]] = row[1]
-            stats['satisfaction_distribution'] = satisfaction_dist
-            
-            # 最近7天趋势
-            cursor.execute("""
-                SELECT DATE(feedback_time) as date,
-                       COUNT(*) as total,
-                       SUM(is_correct) as correct
-                FROM detection_feedback 
-                WHERE feedback_time >= DATE_SUB(NOW(), INTERVAL 7 DAY)
-                GROUP BY DATE(feedback_time)
-                ORDER BY date
-            """)
             daily_trend = []
-            for row in cursor.fetchall():
-                daily_trend.append({
-                    'date': row[0].strftime('%m-%d') if row[0] else '',
-                    'total': row[1],
-                    'correct': row[2],
-                    'accuracy': round(row[2] / row[1] * 100, 2) if row[1] > 0 else 0
-                })
-            stats['daily_trend'] = daily_trend
+            total = correct_count = rated = satisfaction_sum = 0
+            for kind, key, satisfaction, count, correct in rows:
+                count, correct = int(count), int(correct)
+                if kind == 'day':
+                    if count > 0:
+                        daily_trend.append({
+                            'date': key.strftime('%m-%d') if hasattr(key, 'strftime') else str(key)[5:10],
+                            'total': count,
+                            'correct': correct,
+                            'accuracy': round(correct / count * 100, 2)
+                        })
+                    continue
+                total += count
+                correct_count += correct
+                category = categories.setdefault(key, {'category': key, 'total': 0, 'correct': 0})
+                category['total'] += count
+                category['correct'] += correct
+                if satisfaction and count:
+                    satisfaction_dist[satisfaction] = satisfaction_dist.get(satisfaction, 0) + count
+                    rated += count
+                    satisfaction_sum += satisfaction * count
             
-            return stats
+            category_stats = []
+            for category in categories.values():
+                if category['total'] > 0:
+                    category['accuracy'] = round(category['correct'] / category['total'] * 100, 2)
+                    category_stats.append(category)
+            
+            return {
+                'total_feedback': total,
+                'correct_count': correct_count,
+                'incorrect_count': total - correct_count,
+                'accuracy_rate': round(correct_count / total * 100, 2) if total > 0 else 0,
+                'avg_satisfaction': round(satisfaction_sum / rated, 2) if rated else 0,
+                'category_stats': category_stats,
+                'satisfaction_distribution': satisfaction_dist,
+                'daily_trend': daily_trend
+            }
             
         except Error as e:
             print(f"获取反馈统计失败: {e}")
@@ -704,12 +1689,24 @@ class DatabaseManager:
                 return False
             cursor = conn.cursor()
             
+            conn.start_transaction()
+            cursor.execute(f"""
+                SELECT feedback_time, predicted_category, satisfaction, is_correct
+                FROM detection_feedback WHERE id = %s{self.backend.for_update}
+            """, (feedback_id,))
+            row = cursor.fetchone()
+            if not row:
+                conn.rollback()
+                return False
             cursor.execute("DELETE FROM detection_feedback WHERE id = %s", (feedback_id,))
+            self._bump_feedback_rollups(cursor, row[0], row[1], row[2], bool(row[3]), sign=-1)
             conn.commit()
-            return cursor.rowcount > 0
+            return True
             
         except Error as e:
             print(f"删除反馈失败: {e}")
+            try: conn.rollback()
+            except: pass
             return False
         finally:
             if cursor:
@@ -721,56 +1718,36 @@ class DatabaseManager:
 
     # ========== 题库相关方法 ==========
     
-    def _init_quiz_data(self):
-        """初始化题库数据（如果表为空则导入）"""
-        conn = None
-        cursor = None
-        try:
-            conn = self._get_connection()
-            if not conn:
-                return
-            cursor = conn.cursor()
-            
-            # 检查是否已有数据
-            cursor.execute("SELECT COUNT(*) FROM quiz_questions")
-            count = cursor.fetchone()[0]
-            if count > 0:
-                return  # 已有数据，不重复导入
-            
-            # 从question_bank.py导入题目
-            from question.question_bank import QuestionBank
-            qb = QuestionBank()
-            
-            for q in qb.questions:
-                sql = """
-                INSERT INTO quiz_questions (question, option_a, option_b, option_c, option_d, answer, explanation)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(sql, (
-                    q['question'],
-                    q['options'][0],
-                    q['options'][1],
-                    q['options'][2],
-                    q['options'][3],
-                    q['answer'],
-                    f"正确答案是{q['answer']}"
-                ))
-            
-            conn.commit()
-            print(f"已导入 {len(qb.questions)} 道题目到数据库")
-            
-        except Exception as e:
-            print(f"初始化题库失败: {e}")
-        finally:
-            if cursor:
-                try: cursor.close()
-                except: pass
-            if conn:
-                try: conn.close()
-                except: pass
+    def _init_quiz_data(self, cursor):
+        """题库为空时从 question_bank 批量导入（由迁移执行）"""
+        cursor.execute("SELECT COUNT(*) FROM quiz_questions")
+        if cursor.fetchone()[0] > 0:
+            return  # 已有数据，不重复导入
+        
+        from question.question_bank import QuestionBank
+        qb = QuestionBank()
+        rows = [
+            (q['question'], q['options'][0], q['options'][1], q['options'][2], q['options'][3],
+             q['answer'], f"正确答案是{q['answer']}")
+            for q in qb.questions
+        ]
+        cursor.executemany("""
+            INSERT INTO quiz_questions (question, option_a, option_b, option_c, option_d, answer, explanation)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+        self._bump_counters(cursor, {self.QUIZ_COUNTER: len(rows), self.QUIZ_VERSION_COUNTER: 1})
+        self.quiz_sampler.invalidate()
+        print(f"已导入 {len(rows)} 道题目到数据库")
     
     def get_quiz_questions(self, limit: int = 10) -> List[Dict]:
-        """获取随机题目"""
+        """获取随机题目（从内存题库抽取），limit 无效时抛出 ValueError"""
+        return self.quiz_sampler.sample(limit)
+    
+    def _get_quiz_version(self) -> int:
+        return self._get_counter(self.QUIZ_VERSION_COUNTER)
+    
+    def _load_quiz_questions(self) -> List[Dict]:
+        """读取全部题目，供抽题缓存加载"""
         conn = None
         cursor = None
         try:
@@ -779,9 +1756,7 @@ class DatabaseManager:
                 return []
             cursor = conn.cursor()
             
-            # 随机获取题目
-            sql = f"SELECT id, question, option_a, option_b, option_c, option_d, answer, explanation FROM quiz_questions ORDER BY RAND() LIMIT {limit}"
-            cursor.execute(sql)
+            cursor.execute("SELECT id, question, option_a, option_b, option_c, option_d, answer, explanation FROM quiz_questions")
             results = cursor.fetchall()
             
             questions = []
@@ -797,7 +1772,7 @@ class DatabaseManager:
             return questions
             
         except Error as e:
-            print(f"获取题目失败: {e}")
+            print(f"加载题库失败: {e}")
             return []
         finally:
             if cursor:
@@ -808,26 +1783,8 @@ class DatabaseManager:
                 except: pass
     
     def get_quiz_count(self) -> int:
-        """获取题库总数"""
-        conn = None
-        cursor = None
-        try:
-            conn = self._get_connection()
-            if not conn:
-                return 0
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM quiz_questions")
-            return cursor.fetchone()[0]
-        except Error as e:
-            print(f"获取题目数量失败: {e}")
-            return 0
-        finally:
-            if cursor:
-                try: cursor.close()
-                except: pass
-            if conn:
-                try: conn.close()
-                except: pass
+        """获取题库总数（读取计数表）"""
+        return self._get_counter(self.QUIZ_COUNTER)
 
 # 全局数据库管理器实例
 db_manager = DatabaseManager()
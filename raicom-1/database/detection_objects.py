@@ -0,0 +1,48 @@
+"""
+检测目标拆分 - 把 detection_results JSON 拆成 detection_objects 表的一行一目标
+"""
+from datetime import datetime
+from typing import List, Optional
+
+
+def _lookup_category(class_name: str) -> Optional[str]:
+    """旧记录和上传检测的结果里没有分类，按类名查垃圾分类表"""
+    try:
+        from detection.utils import get_garbage_info
+    except ImportError:
+        return None
+    return get_garbage_info(class_name).get('分类')
+
+
+def _bbox(result: dict):
+    """统一为 (x, y, width, height)，兼容 x/y/width/height 与 bbox=[x1, y1, x2, y2] 两种格式"""
+    if all(key in result for key in ('x', 'y', 'width', 'height')):
+        return tuple(float(result[key]) for key in ('x', 'y', 'width', 'height'))
+    bbox = result.get('bbox')
+    if isinstance(bbox, (list, tuple)) and len(bbox) == 4:
+        x1, y1, x2, y2 = (float(v) for v in bbox)
+        return x1, y1, x2 - x1, y2 - y1
+    return None, None, None, None
+
+
+def extract_objects(record_id: int, detection_time: datetime, detection_results: list,
+                    confidence_scores: list = None) -> List[tuple]:
+    """返回 detection_objects 插入行：
+    (record_id, class_name, category, confidence, bbox_x, bbox_y, bbox_w, bbox_h, detection_time)
+    """
+    confidence_scores = confidence_scores or []
+    rows = []
+    for idx, result in enumerate(detection_results or []):
+        if not isinstance(result, dict):
+            result = {'class': str(result)}
+        class_name = result.get('class') or result.get('name')
+        if not class_name:
+            continue
+        confidence = result.get('confidence')
+        if confidence is None and idx < len(confidence_scores):
+            confidence = confidence_scores[idx]
+        category = result.get('category') or _lookup_category(class_name)
+        rows.append((record_id, class_name, category,
+                     float(confidence) if confidence is not None else None)
+                    + _bbox(result) + (detection_time,))
+    return rows
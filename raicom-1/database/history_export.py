@@ -0,0 +1,139 @@
+"""
+检测历史导出 - 逐条流式生成 CSV / JSONL / ZIP，内存占用与记录总数无关
+
+iter_export() 把记录迭代器转换为字节块迭代器：桌面端写入文件，Web 端直接作为分块响应体。
+ZIP 包内含 records.csv 与 images/ 下的原图和结果图；zip 写入不可回退的流，
+元数据先写入溢出到磁盘的临时文件，最后作为 records.csv 追加到包尾。
+"""
+import io
+import csv
+import json
+import tempfile
+import zipfile
+from typing import Dict, Iterable, Iterator
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', '.csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', '.jsonl'),
+    'zip': ('application/zip', '.zip'),
+}
+
+CSV_FIELDS = ['id', 'detection_time', 'source_type', 'image_path', 'result_image_path',
+              'processing_time', 'object_count', 'detection_results', 'confidence_scores']
+
+
+class _ChunkBuffer:
+    """只追加的输出缓冲：zipfile 按不可 seek 的流写入（使用数据描述符），由 drain() 取走已写字节"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _metadata(record: Dict) -> Dict:
+    detection_time = record['detection_time']
+    return {
+        'id': record['id'],
+        'detection_time': detection_time.isoformat() if hasattr(detection_time, 'isoformat') else detection_time,
+        'source_type': record['source_type'],
+        'image_path': record['image_path'],
+        'result_image_path': record.get('result_image_path'),
+        'processing_time': record['processing_time'],
+        'object_count': len(record['detection_results']),
+        'detection_results': record['detection_results'],
+        'confidence_scores': record['confidence_scores'],
+    }
+
+
+def _csv_row(metadata: Dict) -> Dict:
+    row = dict(metadata)
+    row['detection_results'] = json.dumps(row['detection_results'], ensure_ascii=False)
+    row['confidence_scores'] = json.dumps(row['confidence_scores'])
+    return row
+
+
+def _iter_csv(records: Iterable[Dict]) -> Iterator[bytes]:
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    # BOM 便于 Excel 正确识别中文
+    yield text.getvalue().encode('utf-8-sig')
+    for record in records:
+        text.seek(0)
+        text.truncate()
+        writer.writerow(_csv_row(_metadata(record)))
+        yield text.getvalue().encode('utf-8')
+
+
+def _iter_jsonl(records: Iterable[Dict]) -> Iterator[bytes]:
+    for record in records:
+        yield (json.dumps(_metadata(record), ensure_ascii=False, default=str) + "\n").encode('utf-8')
+
+
+def _iter_zip(records: Iterable[Dict]) -> Iterator[bytes]:
+    buffer = _ChunkBuffer()
+    with tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024) as spool:
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            text = io.TextIOWrapper(spool, encoding='utf-8-sig', newline='')
+            writer = csv.DictWriter(text, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for record in records:
+                writer.writerow(_csv_row(_metadata(record)))
+                # JPEG 已压缩，图片直接存储
+                for key, suffix in (('image_data', 'original'), ('result_image_data', 'result')):
+                    if record.get(key):
+                        archive.writestr(f"images/{record['id']}_{suffix}.jpg", record[key],
+                                         compress_type=zipfile.ZIP_STORED)
+                chunk = buffer.drain()
+                if chunk:
+                    yield chunk
+            text.flush()
+            spool.seek(0)
+            with archive.open('records.csv', 'w') as member:
+                while True:
+                    block = spool.read(64 * 1024)
+                    if not block:
+                        break
+                    member.write(block)
+                    chunk = buffer.drain()
+                    if chunk:
+                        yield chunk
+            text.detach()
+        yield buffer.drain()
+
+
+def iter_export(records: Iterable[Dict], fmt: str = 'csv') -> Iterator[bytes]:
+    """按格式把记录流转换为字节块流；zip 格式需要记录带 image_data / result_image_data"""
+    if fmt == 'csv':
+        return _iter_csv(records)
+    if fmt == 'jsonl':
+        return _iter_jsonl(records)
+    if fmt == 'zip':
+        return _iter_zip(records)
+    raise ValueError(f"不支持的导出格式: {fmt}")
+
+
+def export_to_file(records: Iterable[Dict], path: str, fmt: str = 'csv') -> int:
+    """导出到文件，返回写入的字节数"""
+    written = 0
+    with open(path, 'wb') as f:
+        for chunk in iter_export(records, fmt):
+            f.write(chunk)
+            written += len(chunk)
+    return written
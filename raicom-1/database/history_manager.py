@@ -1,17 +1,26 @@
 """
 历史记录管理类
 """
-from PyQt5.QtCore import QThread, pyqtSignal, QObject
+from PyQt5.QtCore import QThread, pyqtSignal, QObject, QSize, Qt
+from PyQt5.QtGui import QImage
 from PyQt5.QtWidgets import QApplication
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database.db_manager import db_manager
-from typing import List, Dict, Optional
+from database.history_export import export_to_file
+from database.image_cache import ImageCache
+from typing import List, Dict, Optional, Tuple
 import os
+import heapq
 import tempfile
+import threading
+from collections import deque
 from datetime import datetime
 
+# 各 HistoryManager（包括工作线程里创建的）共用一个图片缓存
+image_cache = ImageCache(**db_manager.config.image_cache_config)
+
 class HistoryManager(QObject):
     """历史记录管理器"""
     
@@ -23,21 +32,21 @@ class HistoryManager(QObject):
     def __init__(self):
         super().__init__()
         self.db_manager = db_manager
+        self.image_cache = image_cache
         
     def save_detection_record(self, image_path: str, detection_results: List[Dict], 
                              confidence_scores: List[float], processing_time: float,
                              source_type: str = 'upload', result_image_path: str = None,
                              result_image_data: bytes = None) -> bool:
-        """保存检测记录"""
+        """保存检测记录（异步写入，返回是否成功入队，写入结果通过 record_saved 信号通知）"""
         try:
-            # 确保数据库连接
-            if not self.db_manager.connection or not self.db_manager.connection.is_connected():
-                if not self.db_manager.connect():
-                    self.record_saved.emit(False, "数据库连接失败")
-                    return False
+            # 确保数据库可用（结构初始化只在首次调用时执行）
+            if not self.db_manager.ensure_ready():
+                self.record_saved.emit(False, "数据库连接失败")
+                return False
             
-            # 保存记录
-            success = self.db_manager.save_detection_record(
+            # 入队保存，不等待数据库写入
+            future = self.db_manager.save_detection_record_async(
                 image_path=image_path,
                 detection_results=detection_results,
                 confidence_scores=confidence_scores,
@@ -46,19 +55,23 @@ class HistoryManager(QObject):
                 result_image_path=result_image_path,
                 result_image_data=result_image_data
             )
+            future.add_done_callback(lambda f: self._on_record_written(f, image_path))
             
-            if success:
-                self.record_saved.emit(True, f"检测记录已保存: {os.path.basename(image_path)}")
-            else:
-                self.record_saved.emit(False, "保存检测记录失败")
-            
-            return success
+            return not (future.done() and future.exception() is not None)
             
         except Exception as e:
             error_msg = f"保存记录时出错: {str(e)}"
             self.record_saved.emit(False, error_msg)
             return False
     
+    def _on_record_written(self, future, image_path: str):
+        """后写队列完成回调（在写线程中执行，信号跨线程投递）"""
+        error = future.exception()
+        if error is None:
+            self.record_saved.emit(True, f"检测记录已保存: {os.path.basename(image_path)}")
+        else:
+            self.record_saved.emit(False, f"保存检测记录失败: {error}")
+    
     def load_detection_history(self, limit: int = 50, offset: int = 0, 
                              source_type: str = None) -> List[Dict]:
         """加载检测历史记录"""
@@ -76,12 +89,37 @@ class HistoryManager(QObject):
             self.history_loaded.emit([])
             return []
     
+    def load_detection_history_page(self, limit: int = 50, page_cursor: Tuple = None,
+                                    source_type: str = None, **filters) -> Tuple[List[Dict], Optional[Tuple]]:
+        """按游标加载一页检测历史，返回 (记录列表, 下一页游标)；filters 为检索条件（见 DatabaseManager.SEARCH_FILTERS）"""
+        try:
+            if not self.db_manager.ensure_ready():
+                self.history_loaded.emit([])
+                return [], None
+            if filters:
+                history, next_cursor = self.db_manager.search_detection_history(
+                    limit=limit, page_cursor=page_cursor, source_type=source_type, **filters)
+            else:
+                history, next_cursor = self.db_manager.get_detection_history_page(
+                    limit=limit,
+                    page_cursor=page_cursor,
+                    source_type=source_type
+                )
+            self.history_loaded.emit(history)
+            return history, next_cursor
+            
+        except Exception as e:
+            print(f"加载历史记录失败: {e}")
+            self.history_loaded.emit([])
+            return [], None
+    
     def delete_detection_record(self, record_id: int) -> bool:
         """删除检测记录"""
         try:
             success = self.db_manager.delete_detection_record(record_id)
             
             if success:
+                self.image_cache.invalidate(record_id)
                 self.record_deleted.emit(True, f"记录 ID {record_id} 已删除")
             else:
                 self.record_deleted.emit(False, "删除记录失败")
@@ -93,9 +131,34 @@ class HistoryManager(QObject):
             self.record_deleted.emit(False, error_msg)
             return False
     
-    def get_detection_count(self, source_type: str = None) -> int:
-        """获取检测记录总数"""
+    def load_new_records(self, after_id: Optional[int], source_type: str = None,
+                         limit: int = 200, **filters) -> Tuple[List[Dict], int]:
+        """增量刷新：最新ID没有变化时只做一次主键查询；返回 (新记录（新的在前）, 新的水位ID)
+        
+        after_id 为None时只返回当前最新ID作为水位；filters 为检索条件，只返回符合条件的新记录。
+        """
+        try:
+            latest_id = self.db_manager.get_latest_record_id()
+            if after_id is None or latest_id <= after_id:
+                return [], latest_id if after_id is None else after_id
+            records = self.db_manager.get_detection_history_after_id(after_id, source_type, limit, **filters)
+            # 一次没取完时水位只推进到已取到的位置，下次继续
+            # 读取最新ID之后写入的记录也可能已取到，水位不低于已取到的最大ID，避免下次重复插入
+            if len(records) == limit:
+                watermark = records[-1]['id']
+            else:
+                watermark = max([latest_id] + [r['id'] for r in records[-1:]])
+            records.sort(key=lambda r: (r['detection_time'], r['id']), reverse=True)
+            return records, watermark
+        except Exception as e:
+            print(f"增量加载历史记录失败: {e}")
+            return [], after_id
+    
+    def get_detection_count(self, source_type: str = None, **filters) -> int:
+        """获取检测记录总数（有检索条件时为符合条件的记录数）"""
         try:
+            if filters:
+                return self.db_manager.count_detection_history(source_type, **filters)
             return self.db_manager.get_detection_count(source_type)
         except Exception as e:
             print(f"获取记录总数失败: {e}")
@@ -104,7 +167,8 @@ class HistoryManager(QObject):
     def get_image_data(self, record_id: int) -> Optional[bytes]:
         """获取图片数据"""
         try:
-            return self.db_manager.get_image_data(record_id)
+            return self.image_cache.get_or_load((record_id, 'image'),
+                                                lambda: self.db_manager.get_image_data(record_id))
         except Exception as e:
             print(f"获取图片数据失败: {e}")
             return None
@@ -112,59 +176,362 @@ class HistoryManager(QObject):
     def get_result_image_data(self, record_id: int) -> Optional[bytes]:
         """获取结果图片数据"""
         try:
-            return self.db_manager.get_result_image_data(record_id)
+            return self.image_cache.get_or_load((record_id, 'result'),
+                                                lambda: self.db_manager.get_result_image_data(record_id))
         except Exception as e:
             print(f"获取结果图片数据失败: {e}")
             return None
     
-    def clear_old_records(self, days: int = 30) -> bool:
-        """清理旧记录"""
+    def get_thumbnail_data(self, record_id: int) -> Optional[bytes]:
+        """获取缩略图数据"""
         try:
-            success = self.db_manager.clear_old_records(days)
-            if success:
-                self.record_deleted.emit(True, f"已清理{days}天前的记录")
+            return self.image_cache.get_or_load((record_id, 'thumbnail'),
+                                                lambda: self.db_manager.get_thumbnail_data(record_id))
+        except Exception as e:
+            print(f"获取缩略图失败: {e}")
+            return None
+    
+    def get_full_image_data(self, record_id: int) -> Optional[bytes]:
+        """获取原尺寸图片：优先检测结果图，没有则取原图"""
+        try:
+            return self.image_cache.get_or_load((record_id, 'full'),
+                                                lambda: self.db_manager.get_full_image_data(record_id))
+        except Exception as e:
+            print(f"获取原图失败: {e}")
+            return None
+    
+    def get_preview_data(self, record_id: int) -> Optional[bytes]:
+        """预览图：保存时生成的缩略图，旧记录没有缩略图时取原尺寸图片"""
+        return self.get_thumbnail_data(record_id) or self.get_full_image_data(record_id)
+    
+    def get_image_cache_stats(self) -> Dict:
+        """图片缓存指标（命中率、占用字节数等）"""
+        return self.image_cache.stats()
+    
+    def clear_old_records(self, days: int = 30, archive: bool = None,
+                          progress=None, should_stop=None) -> Tuple[bool, str]:
+        """分批清理旧记录，progress(已删除, 总数) 报告进度；返回 (是否成功, 提示信息)"""
+        try:
+            result = self.db_manager.purge_old_records(days, archive=archive, progress=progress,
+                                                       should_stop=should_stop)
+            if result['deleted']:
+                self.image_cache.clear()
+            if result['success']:
+                message = f"已清理{days}天前的记录 {result['deleted']} 条"
+                if result['archive']:
+                    message += f"，归档文件: {result['archive']}"
             else:
-                self.record_deleted.emit(False, "清理旧记录失败")
-            return success
+                message = "清理旧记录失败"
+            self.record_deleted.emit(result['success'], message)
+            return result['success'], message
         except Exception as e:
             error_msg = f"清理旧记录时出错: {str(e)}"
             self.record_deleted.emit(False, error_msg)
-            return False
+            return False, error_msg
+
+    def export_history(self, file_path: str, fmt: str = 'csv', source_type: str = None,
+                       progress=None, should_stop=None, **filters) -> Tuple[bool, str]:
+        """流式导出检测历史到文件（zip 格式包含图片），progress(已导出, 总数) 报告进度
+        
+        filters 为检索条件（与 search_detection_history 相同），只导出符合条件的记录
+        """
+        if not self.db_manager.ensure_ready():
+            return False, "数据库不可用"
+        total = self.db_manager.count_detection_history(source_type, **filters)
+        exported = 0
+        
+        def records():
+            nonlocal exported
+            for record in self.db_manager.iter_detection_export(source_type=source_type,
+                                                               include_images=(fmt == 'zip'),
+                                                               **filters):
+                if should_stop and should_stop():
+                    raise InterruptedError("导出已取消")
+                yield record
+                exported += 1
+                if progress and exported % 50 == 0:
+                    progress(exported, total)
+        
+        try:
+            export_to_file(records(), file_path, fmt)
+            if progress:
+                progress(exported, max(total, exported))
+            return True, f"已导出 {exported} 条记录到: {file_path}"
+        except Exception as e:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            return False, f"导出失败: {str(e)}"
 
-class HistoryWorker(QThread):
-    """历史记录工作线程"""
+# 任务优先级（数值小的先执行）
+PRIORITY_VIEW = 0        # 当前视图需要的数据（分页加载）
+PRIORITY_WRITE = 1       # 用户发起的修改（删除记录）
+PRIORITY_BACKGROUND = 2  # 后台轮询等可延后的任务
+
+
+class HistoryJob(QObject):
+    """一个历史记录操作任务
+    
+    信号在服务线程中发出；cancel() 后尚未执行的任务不再执行，执行中的任务不再发出结果，
+    导出、清理等长任务通过 is_cancelled 提前结束。
+    """
     
     # 信号定义
     history_loaded = pyqtSignal(list)
+    page_loaded = pyqtSignal(list, object, int)  # (记录列表, 下一页游标, 记录总数，未统计时为 -1)
+    progress_changed = pyqtSignal(int, int)      # (已处理, 总数)
+    new_records_loaded = pyqtSignal(list, object, int)  # (新记录, 水位ID, 记录总数)
     operation_completed = pyqtSignal(bool, str)
+    image_data_loaded = pyqtSignal(int, object)  # (记录ID, 原尺寸图片数据，不可用时为 None)
+    finished = pyqtSignal()  # 执行结束或被取消跳过后总会发出，调用方可在此释放任务引用
     
-    def __init__(self, operation_type: str, **kwargs):
+    def __init__(self, operation_type: str, priority: int = PRIORITY_WRITE, key=None, **kwargs):
         super().__init__()
         self.operation_type = operation_type
+        self.priority = priority
+        self.key = key
         self.kwargs = kwargs
-        self.history_manager = HistoryManager()
-        
-    def run(self):
+        self.done = False
+        self._cancelled = threading.Event()
+    
+    def cancel(self):
+        self._cancelled.set()
+    
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+    
+    def _emit(self, signal, *args):
+        if not self.is_cancelled():
+            signal.emit(*args)
+    
+    def execute(self, manager: 'HistoryManager'):
         """执行操作"""
         try:
             if self.operation_type == 'load_history':
-                history = self.history_manager.load_detection_history(**self.kwargs)
-                self.history_loaded.emit(history)
+                history = manager.load_detection_history(**self.kwargs)
+                self._emit(self.history_loaded, history)
+                
+            elif self.operation_type == 'load_page':
+                history, next_cursor = manager.load_detection_history_page(**self.kwargs)
+                if self.is_cancelled():
+                    return
+                count_kwargs = {k: v for k, v in self.kwargs.items() if k not in ('limit', 'page_cursor')}
+                # 有检索条件时计数要扫描索引，只在第一页统计，后续页为 -1
+                total = -1
+                if self.kwargs.get('page_cursor') is None or set(count_kwargs) <= {'source_type'}:
+                    total = manager.get_detection_count(**count_kwargs)
+                self._emit(self.page_loaded, history, next_cursor, total)
+                
+            elif self.operation_type == 'load_new':
+                records, watermark = manager.load_new_records(**self.kwargs)
+                # 有检索条件时计数要扫描索引，轮询时不统计（-1），由界面按新增条数累加
+                search = {k for k in self.kwargs if k not in ('after_id', 'source_type', 'limit')}
+                total = -1 if search else manager.get_detection_count(self.kwargs.get('source_type'))
+                self._emit(self.new_records_loaded, records, watermark, total)
                 
             elif self.operation_type == 'save_record':
-                success = self.history_manager.save_detection_record(**self.kwargs)
-                self.operation_completed.emit(success, "记录保存完成")
+                success = manager.save_detection_record(**self.kwargs)
+                self._emit(self.operation_completed, success, "记录保存完成")
+                
+            elif self.operation_type == 'load_full_image':
+                record_id = self.kwargs['record_id']
+                self._emit(self.image_data_loaded, record_id, manager.get_full_image_data(record_id))
                 
             elif self.operation_type == 'delete_record':
-                success = self.history_manager.delete_detection_record(**self.kwargs)
-                self.operation_completed.emit(success, "记录删除完成")
+                success = manager.delete_detection_record(**self.kwargs)
+                self._emit(self.operation_completed, success, "记录删除完成")
+                
+            elif self.operation_type == 'export':
+                success, message = manager.export_history(
+                    progress=lambda done, total: self._emit(self.progress_changed, done, total),
+                    should_stop=self.is_cancelled,
+                    **self.kwargs)
+                self._emit(self.operation_completed, success, message)
                 
             elif self.operation_type == 'clear_old':
-                success = self.history_manager.clear_old_records(**self.kwargs)
-                self.operation_completed.emit(success, "清理完成")
+                success, message = manager.clear_old_records(
+                    progress=lambda done, total: self._emit(self.progress_changed, done, total),
+                    should_stop=self.is_cancelled,
+                    **self.kwargs)
+                self._emit(self.operation_completed, success, message)
                 
         except Exception as e:
-            self.operation_completed.emit(False, f"操作失败: {str(e)}")
+            self._emit(self.operation_completed, False, f"操作失败: {str(e)}")
+        finally:
+            self.done = True
+            self.finished.emit()
+
+class HistoryService(QThread):
+    """常驻的历史记录服务线程
+    
+    任务按 (优先级, 提交顺序) 排队，由同一个线程依次执行，不再为每次操作创建线程和管理器。
+    带 key 提交的任务会取代同 key 的旧任务：排队中的旧任务直接丢弃，执行中的旧任务不再发出结果，
+    连续翻页、切换筛选时只有最新的请求访问数据库。
+    """
+    
+    def __init__(self, name: str = 'history-service', parent=None):
+        super().__init__(parent)
+        self.setObjectName(name)
+        self._cond = threading.Condition()
+        self._queue = []     # 堆：(优先级, 提交序号, 任务)
+        self._keyed = {}     # key -> 最新任务
+        self._sequence = 0
+        self._current = None
+        self._running = True
+    
+    def submit(self, job: HistoryJob) -> HistoryJob:
+        """提交任务（先连接好任务的信号再提交，否则可能错过结果）"""
+        with self._cond:
+            if job.key is not None:
+                previous = self._keyed.get(job.key)
+                if previous is not None:
+                    previous.cancel()
+                self._keyed[job.key] = job
+            self._sequence += 1
+            heapq.heappush(self._queue, (job.priority, self._sequence, job))
+            self._cond.notify()
+        self._ensure_started()
+        return job
+    
+    def cancel(self, key):
+        """取消某个 key 的排队或执行中的任务"""
+        with self._cond:
+            job = self._keyed.pop(key, None)
+        if job is not None:
+            job.cancel()
+    
+    def pending(self) -> int:
+        with self._cond:
+            return sum(1 for _, _, job in self._queue if not job.is_cancelled())
+    
+    def _ensure_started(self):
+        if not self.isRunning():
+            with self._cond:
+                self._running = True
+            self.start()
+    
+    def stop(self):
+        """取消全部任务并结束线程（等待执行中的任务结束）"""
+        with self._cond:
+            self._running = False
+            for _, _, job in self._queue:
+                job.cancel()
+                job.done = True
+            self._queue.clear()
+            self._keyed.clear()
+            if self._current is not None:
+                self._current.cancel()
+            self._cond.notify()
+        self.wait(5000)
+    
+    def run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                _, _, job = heapq.heappop(self._queue)
+                if job.is_cancelled():
+                    job.done = True
+                    job.finished.emit()
+                    continue
+                self._current = job
+            try:
+                job.execute(history_manager)
+            finally:
+                with self._cond:
+                    self._current = None
+                    if job.key is not None and self._keyed.get(job.key) is job:
+                        del self._keyed[job.key]
+
+class HistoryImageLoader(QThread):
+    """后台预览图加载线程
+    
+    request() 提交当前选中记录的加载请求，读取图片并解码缩放为 QImage 后通过 image_loaded 发出；
+    新请求会取代尚未开始的旧请求，已在读取中的旧请求完成后丢弃结果，只有最新的选择生效。
+    prefetch() 在空闲时预读相邻记录的图片到图片缓存，切换到这些记录时直接命中缓存。
+    """
+    
+    image_loaded = pyqtSignal(int, int, QImage)  # (请求序号, 记录ID, 图片)，图片不可用时为空 QImage
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.history_manager = HistoryManager()
+        self._cond = threading.Condition()
+        self._request_id = 0
+        self._current = None       # (请求序号, 记录ID, 目标尺寸)
+        self._prefetch = deque()   # 待预读的记录ID
+        self._running = True
+    
+    def request(self, record_id: int, size: QSize) -> int:
+        """加载记录预览图，返回请求序号，image_loaded 中序号不是最新的结果应忽略"""
+        with self._cond:
+            self._request_id += 1
+            self._current = (self._request_id, record_id, QSize(size))
+            self._cond.notify()
+            request_id = self._request_id
+        self._ensure_started()
+        return request_id
+    
+    def prefetch(self, record_ids: List[int]):
+        """替换待预读列表（按优先级排序）"""
+        with self._cond:
+            self._prefetch = deque(record_ids)
+            self._cond.notify()
+        self._ensure_started()
+    
+    def _ensure_started(self):
+        if not self.isRunning():
+            with self._cond:
+                self._running = True
+            self.start()
+    
+    def cancel(self):
+        """取消尚未开始的加载与预读"""
+        with self._cond:
+            self._request_id += 1
+            self._current = None
+            self._prefetch.clear()
+    
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self.wait(3000)
+    
+    def is_latest(self, request_id: int) -> bool:
+        with self._cond:
+            return request_id == self._request_id
+    
+    def run(self):
+        while True:
+            with self._cond:
+                while self._running and self._current is None and not self._prefetch:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                if self._current is not None:
+                    task, self._current = self._current, None
+                else:
+                    task = (None, self._prefetch.popleft(), None)
+            request_id, record_id, size = task
+            try:
+                data = self.history_manager.get_preview_data(record_id)
+            except Exception as e:
+                print(f"加载预览图失败: {e}")
+                data = None
+            if request_id is None or not self.is_latest(request_id):
+                continue  # 预读只写入缓存；过期请求的结果丢弃
+            image = QImage()
+            if data and image.loadFromData(data) and size.isValid():
+                image = image.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self.image_loaded.emit(request_id, record_id, image)
 
 # 全局历史记录管理器实例
 history_manager = HistoryManager()
+
+# 全局历史记录服务：查看、删除等交互操作一个线程，导出、清理等耗时操作另一个线程，互不阻塞
+history_service = HistoryService('history-service')
+history_bulk_service = HistoryService('history-bulk-service')
@@ -0,0 +1,75 @@
+"""
+图片读缓存 - 按总字节数限制容量的 LRU 缓存，避免反复点击同一条记录时重复读取图片BLOB
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class ImageCache:
+    """按字节数限容的 LRU 缓存
+
+    键为 (记录ID, 图片类型)，总字节数超过 max_bytes 时淘汰最久未使用的条目；
+    单张超过 max_item_bytes 的图片不缓存，避免一张大图挤掉整个缓存。线程安全。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_item_bytes: int = None):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes or max_bytes // 4
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self._metrics['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._metrics['hits'] += 1
+            return data
+
+    def put(self, key: Hashable, data: Optional[bytes]):
+        if not data or len(data) > self.max_item_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._metrics['evictions'] += 1
+
+    def get_or_load(self, key: Hashable, load_func) -> Optional[bytes]:
+        """读穿：未命中时调用 load_func() 读取并缓存"""
+        data = self.get(key)
+        if data is None:
+            data = load_func()
+            self.put(key, data)
+        return data
+
+    def invalidate(self, record_id: int):
+        """删除某条记录的全部缓存图片"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == record_id]:
+                self._bytes -= len(self._entries.pop(key))
+                self._metrics['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._metrics['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._metrics)
+            stats.update({'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes})
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0
+        return stats
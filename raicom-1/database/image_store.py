@@ -0,0 +1,161 @@
+"""
+内容寻址图片存储 - 按内容哈希去重保存检测图片，引用计数回收
+"""
+import os
+import hashlib
+from collections import Counter
+from typing import Iterable, List, Optional
+
+
+def make_thumbnail(data: Optional[bytes], max_side: int = 240, quality: int = 80) -> Optional[bytes]:
+    """生成JPEG缩略图（最长边不超过 max_side），解码失败返回None"""
+    if not data:
+        return None
+    try:
+        import cv2
+        import numpy as np
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        h, w = image.shape[:2]
+        scale = min(1.0, max_side / max(h, w))
+        if scale < 1.0:
+            image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes() if ok else None
+    except Exception as e:
+        print(f"生成缩略图失败: {e}")
+        return None
+
+
+class ImageStore:
+    """内容寻址图片存储
+
+    图片按 SHA-256 哈希存放，detection_history 只保存哈希。相同内容只存一份，
+    重复保存只增加引用计数；引用计数归零时删除图片。
+    backend='table' 时图片数据存放在 image_blobs 表；
+    backend='disk'  时图片写入按哈希前缀分片的目录，image_blobs 表只记录引用计数。
+    除 remove_files 外，所有方法都在调用方传入的游标（事务）中执行。
+    """
+
+    def __init__(self, backend: str = 'table', root: str = None, db_backend=None):
+        if backend not in ('table', 'disk'):
+            raise ValueError(f"不支持的图片存储后端: {backend}")
+        if backend == 'disk' and not root:
+            raise ValueError("磁盘存储后端需要指定 root 目录")
+        self.backend = backend
+        self.root = root
+        self.db_backend = db_backend  # 存储后端（MySQL/SQLite），决定冲突更新语句的写法
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def _file_path(self, image_hash: str) -> str:
+        return os.path.join(self.root, image_hash[:2], image_hash[2:4], image_hash)
+
+    def put(self, cursor, data: Optional[bytes], written: List[str] = None) -> Optional[str]:
+        """保存图片并增加一次引用，返回哈希；已存在的内容不会再次传输
+        
+        磁盘后端新建图片记录时总是（重新）写入文件，写入的哈希追加到 written；
+        事务回滚后应对 written 调用 remove_files()，清理回滚留下的文件。
+        """
+        if not data:
+            return None
+        image_hash = self.hash_bytes(data)
+        cursor.execute("UPDATE image_blobs SET ref_count = ref_count + 1 WHERE hash = %s", (image_hash,))
+        if cursor.rowcount > 0:
+            return image_hash
+        if self.db_backend is not None:
+            sql = self.db_backend.upsert_sql('image_blobs', ('hash', 'data', 'size', 'ref_count'), ('hash',),
+                                             add_columns=('ref_count',))
+        else:
+            sql = """
+            INSERT INTO image_blobs (hash, data, size, ref_count) VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE ref_count = ref_count + VALUES(ref_count)
+            """
+        cursor.execute(sql, (image_hash, data if self.backend == 'table' else None, len(data), 1))
+        if self.backend == 'disk':
+            # 先插入记录（持有行锁到提交）再写文件：并发的 remove_files 要么等本事务提交后看到记录而跳过，
+            # 要么先删完文件，本次写入再重新创建；文件可能仍在但即将被删，因此不因文件已存在而跳过
+            self._write_file(image_hash, data)
+            if written is not None:
+                written.append(image_hash)
+        return image_hash
+
+    def _write_file(self, image_hash: str, data: bytes):
+        path = self._file_path(image_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, cursor, image_hash: Optional[str]) -> Optional[bytes]:
+        """按哈希读取图片"""
+        if not image_hash:
+            return None
+        if self.backend == 'disk':
+            try:
+                with open(self._file_path(image_hash), 'rb') as f:
+                    return f.read()
+            except OSError:
+                return None
+        cursor.execute("SELECT data FROM image_blobs WHERE hash = %s", (image_hash,))
+        row = cursor.fetchone()
+        return row[0] if row and row[0] else None
+
+    def release(self, cursor, hashes: Iterable[Optional[str]]) -> List[str]:
+        """释放引用，删除引用计数归零的图片记录，返回被删除的哈希
+
+        磁盘后端应在事务提交后调用 remove_files() 删除对应文件。
+        """
+        counts = Counter(h for h in hashes if h)
+        if not counts:
+            return []
+        for image_hash, count in counts.items():
+            cursor.execute("UPDATE image_blobs SET ref_count = ref_count - %s WHERE hash = %s",
+                           (count, image_hash))
+        placeholders = ", ".join(["%s"] * len(counts))
+        cursor.execute(f"SELECT hash FROM image_blobs WHERE ref_count <= 0 AND hash IN ({placeholders})",
+                       list(counts))
+        orphans = [row[0] for row in cursor.fetchall()]
+        if orphans:
+            placeholders = ", ".join(["%s"] * len(orphans))
+            cursor.execute(f"DELETE FROM image_blobs WHERE hash IN ({placeholders})", orphans)
+        return orphans
+
+    def remove_files(self, conn, hashes: Iterable[Optional[str]]):
+        """删除已无引用的图片文件（仅磁盘后端），在调用方事务提交或回滚之后用同一连接调用
+        
+        在新事务中对这些哈希加锁读：仍有 image_blobs 记录的（期间被并发的 put 重新引用）保留文件；
+        没有记录的，锁会挡住并发 put 插入同一哈希，直到文件删除完成后提交。
+        """
+        hashes = sorted({h for h in hashes if h})
+        if self.backend != 'disk' or not hashes:
+            return
+        for_update = self.db_backend.for_update if self.db_backend is not None else ' FOR UPDATE'
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            conn.start_transaction()
+            placeholders = ", ".join(["%s"] * len(hashes))
+            cursor.execute(f"SELECT hash FROM image_blobs WHERE hash IN ({placeholders}){for_update}", hashes)
+            live = {row[0] for row in cursor.fetchall()}
+            for image_hash in hashes:
+                if image_hash in live:
+                    continue
+                try:
+                    os.remove(self._file_path(image_hash))
+                except OSError:
+                    pass
+            conn.commit()
+        except Exception as e:
+            print(f"清理图片文件失败: {e}")
+            try: conn.rollback()
+            except: pass
+        finally:
+            if cursor:
+                try: cursor.close()
+                except: pass
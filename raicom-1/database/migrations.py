@@ -0,0 +1,153 @@
+"""
+数据库结构版本迁移 - 进程启动时执行一次，已执行的版本记录在 schema_migrations 表
+
+本文件中的 MIGRATIONS 为 MySQL 迁移；SQLite 后端的迁移见 sqlite_backend.py。
+"""
+
+# 旧版本 detection_history 表内存放图片的列，图片迁移到 image_blobs 后删除
+LEGACY_IMAGE_COLUMNS = ('image_data', 'result_image_data')
+
+
+class MigrationDeferred(Exception):
+    """迁移的前置条件尚未满足：本次不执行也不记录，后续版本一并等待，下次再试"""
+
+
+CREATE_MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    description VARCHAR(200) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def _create_base_tables(manager, cursor):
+    config = manager.config
+    cursor.execute(config.create_table_sql)
+    cursor.execute(config.create_image_blobs_table_sql)
+    cursor.execute(config.create_feedback_table_sql)
+    cursor.execute(config.create_quiz_table_sql)
+
+
+def _add_history_columns(manager, cursor):
+    """旧版本 detection_history 表补齐图片哈希与缩略图列"""
+    existing = manager.backend.table_columns(cursor, 'detection_history')
+    for column, definition in manager.config.detection_history_upgrades:
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE detection_history ADD COLUMN {definition}")
+
+
+def _replace_indexes(cursor, table, upgrades, obsolete):
+    """补齐缺少的索引，再删除被取代的旧索引"""
+    cursor.execute("""
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    indexes = {row[0] for row in cursor.fetchall()}
+    for index, definition in upgrades:
+        if index not in indexes:
+            cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+    for index in obsolete:
+        if index in indexes:
+            cursor.execute(f"ALTER TABLE {table} DROP INDEX {index}")
+
+
+def _upgrade_history_indexes(manager, cursor):
+    """翻页用的复合索引替换旧的单列索引"""
+    _replace_indexes(cursor, 'detection_history', manager.config.detection_history_index_upgrades,
+                     manager.config.detection_history_obsolete_indexes)
+
+
+def _create_counters(manager, cursor):
+    cursor.execute(manager.config.create_counters_table_sql)
+    manager._rebuild_counters(cursor)
+
+
+def _seed_quiz_questions(manager, cursor):
+    manager._init_quiz_data(cursor)
+
+
+def _create_feedback_rollups(manager, cursor):
+    cursor.execute(manager.config.create_feedback_category_rollup_sql)
+    cursor.execute(manager.config.create_feedback_daily_rollup_sql)
+    manager._rebuild_feedback_rollups(cursor)
+
+
+def _create_detection_objects(manager, cursor):
+    # 旧记录的目标行由 DatabaseManager.backfill_detection_objects() 分批回填
+    cursor.execute(manager.config.create_detection_objects_table_sql)
+
+
+def _upgrade_object_indexes(manager, cursor):
+    _replace_indexes(cursor, 'detection_objects', manager.config.detection_objects_index_upgrades,
+                     manager.config.detection_objects_obsolete_indexes)
+
+
+def drop_legacy_image_columns(manager, cursor):
+    """删除表内图片列；仍有行内图片未迁移时推迟（由 DatabaseManager.migrate_legacy_images() 迁完后再执行）"""
+    columns = [c for c in LEGACY_IMAGE_COLUMNS if c in manager.backend.table_columns(cursor, 'detection_history')]
+    if not columns:
+        return
+    cursor.execute(f"""
+        SELECT 1 FROM detection_history
+        WHERE {' OR '.join(f'{c} IS NOT NULL' for c in columns)} LIMIT 1
+    """)
+    if cursor.fetchall():
+        raise MigrationDeferred("仍有记录的图片存放在表内，待旧图片迁移完成后执行")
+    for column in columns:
+        cursor.execute(f"ALTER TABLE detection_history DROP COLUMN {column}")
+
+
+# (版本号, 说明, 迁移函数)，版本号只增不改；迁移函数需可重复执行
+MIGRATIONS = [
+    (1, '创建基础表', _create_base_tables),
+    (2, '检测记录图片哈希与缩略图列', _add_history_columns),
+    (3, '检测记录翻页复合索引', _upgrade_history_indexes),
+    (4, '行数计数表', _create_counters),
+    (5, '导入初始题库', _seed_quiz_questions),
+    (6, '反馈汇总表', _create_feedback_rollups),
+    (7, '检测目标表', _create_detection_objects),
+    (8, '检测记录检索索引', _upgrade_object_indexes),
+    (9, '删除检测记录表内的图片列', drop_legacy_image_columns),
+]
+
+
+def run_migrations(manager, conn):
+    """执行当前存储后端所有未完成的迁移，返回本次执行的版本号列表"""
+    backend = manager.backend
+    cursor = conn.cursor()
+    try:
+        with backend.migration_lock(cursor):
+            cursor.execute(CREATE_MIGRATIONS_TABLE_SQL)
+            cursor.execute("SELECT version FROM schema_migrations")
+            done = {row[0] for row in cursor.fetchall()}
+            applied = []
+            try:
+                for version, description, migrate in backend.migrations():
+                    if version in done:
+                        continue
+                    conn.start_transaction()
+                    # 开始迁移前读取的版本可能已过期：SQLite 没有跨进程的迁移锁，另一进程可能刚执行过该版本；
+                    # SQLite 的写事务互斥，在事务内重新确认即可保证每个版本只执行一次
+                    cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                    if cursor.fetchall():
+                        conn.commit()
+                        continue
+                    try:
+                        migrate(manager, cursor)
+                    except MigrationDeferred as e:
+                        conn.rollback()
+                        print(f"数据库迁移 {version} 推迟: {e}")
+                        break
+                    cursor.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                                   (version, description))
+                    conn.commit()
+                    print(f"数据库迁移 {version}: {description}")
+                    applied.append(version)
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            return applied
+    finally:
+        cursor.close()
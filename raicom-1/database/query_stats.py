@@ -0,0 +1,283 @@
+"""
+数据库查询计时 - 每条语句的耗时、返回行数与字节数，按调用方法汇总延迟直方图，并记录慢查询日志
+"""
+import os
+import re
+import sys
+import json
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+# 延迟直方图桶上界（毫秒），最后一个桶收集更慢的查询
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def _value_shape(value) -> str:
+    """参数只记录类型与长度，不记录内容（避免图片数据与隐私信息写入日志）"""
+    if value is None:
+        return 'None'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f'bytes[{len(value)}]'
+    if isinstance(value, str):
+        return f'str[{len(value)}]'
+    if isinstance(value, (list, tuple)):
+        return f'{type(value).__name__}[{len(value)}]'
+    return type(value).__name__
+
+
+def params_shape(params) -> str:
+    if params is None:
+        return ''
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{k}: {_value_shape(v)}' for k, v in params.items()) + '}'
+    return '(' + ', '.join(_value_shape(v) for v in params) + ')'
+
+
+def _row_bytes(row) -> int:
+    """估算一行结果的字节数：字符串与二进制按长度，其余非空值按8字节计"""
+    return sum(len(value) if isinstance(value, (bytes, bytearray, str)) else 8
+               for value in row if value is not None)
+
+
+class _MethodStats:
+    __slots__ = ('count', 'errors', 'total_ms', 'max_ms', 'rows', 'bytes', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def percentile(self, fraction: float) -> float:
+        """按直方图估算分位数（取所在桶的上界）"""
+        target = self.count * fraction
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'histogram': dict(zip([f'<={b}ms' for b in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}ms'],
+                                  self.buckets)),
+        }
+
+
+class QueryProfiler:
+    """查询计时汇总
+
+    语句耗时包括执行与读取结果（非缓冲游标的数据在读取时才传输）。
+    调用方法取语句所在的那段连续 owner_files 帧中最外层的函数名，即调用方进入 DatabaseManager 的入口方法
+    （内部辅助方法的查询计入调用它的入口方法）。
+    耗时不低于 slow_threshold_ms 的语句写入慢查询日志（JSON Lines），并保留最近若干条供界面查看。
+    """
+
+    def __init__(self, owner_files=(), slow_threshold_ms: float = 200.0, slow_log_path: str = None,
+                 recent_slow: int = 50, enabled: bool = True):
+        self.owner_files = {os.path.normcase(os.path.abspath(f)) for f in owner_files}
+        self.slow_threshold_ms = slow_threshold_ms
+        self.slow_log_path = slow_log_path
+        self.enabled = enabled
+        self.recent_slow = deque(maxlen=recent_slow)
+        self._methods = {}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._owner_codes = {}
+
+    def _is_owner(self, code) -> bool:
+        owned = self._owner_codes.get(code)
+        if owned is None:
+            owned = self._owner_codes[code] = os.path.normcase(os.path.abspath(code.co_filename)) in self.owner_files
+        return owned
+
+    # 执行语句的帧与 DatabaseManager 帧之间最多相隔的层数（ImageStore、迁移函数等辅助代码）
+    MAX_HELPER_DEPTH = 8
+
+    def caller(self) -> str:
+        """向上找到第一个 owner 帧，再沿连续的 owner 帧取最外层
+
+        只遍历 DatabaseManager 附近的几层，耗时与整个调用栈（Qt、Flask）的深度无关。
+        """
+        frame = sys._getframe(2)
+        for _ in range(self.MAX_HELPER_DEPTH):
+            if frame is None or self._is_owner(frame.f_code):
+                break
+            frame = frame.f_back
+        if frame is None or not self._is_owner(frame.f_code):
+            return 'other'
+        while frame.f_back is not None and self._is_owner(frame.f_back.f_code):
+            frame = frame.f_back
+        return frame.f_code.co_name
+
+    def record(self, method: str, sql: str, params, elapsed_ms: float, rows: int, nbytes: int,
+               error: Optional[str] = None):
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = _MethodStats()
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.rows += rows
+            stats.bytes += nbytes
+            if error:
+                stats.errors += 1
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    stats.buckets[i] += 1
+                    break
+            else:
+                stats.buckets[-1] += 1
+        if elapsed_ms >= self.slow_threshold_ms:
+            self._log_slow({
+                'time': datetime.now().isoformat(timespec='milliseconds'),
+                'method': method,
+                'elapsed_ms': round(elapsed_ms, 3),
+                'rows': rows,
+                'bytes': nbytes,
+                'sql': re.sub(r'\s+', ' ', sql).strip(),
+                'params': params,
+                'error': error,
+            })
+
+    def _log_slow(self, entry: Dict):
+        self.recent_slow.append(entry)
+        if not self.slow_log_path:
+            return
+        try:
+            with self._file_lock:
+                os.makedirs(os.path.dirname(self.slow_log_path), exist_ok=True)
+                with open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"写入慢查询日志失败: {e}")
+
+    def snapshot(self) -> Dict:
+        """{'methods': {方法: 统计}, 'slow_queries': [...], 'slow_threshold_ms': float}"""
+        with self._lock:
+            methods = {name: stats.to_dict() for name, stats in self._methods.items()}
+        return {
+            'methods': dict(sorted(methods.items(), key=lambda item: -item[1]['avg_ms'] * item[1]['count'])),
+            'slow_queries': list(self.recent_slow),
+            'slow_threshold_ms': self.slow_threshold_ms,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+        self.recent_slow.clear()
+
+    @staticmethod
+    def format_details(snapshot: Dict) -> str:
+        """诊断界面文本：按总耗时排序的方法统计与最近的慢查询"""
+        lines = [f"{'方法':<32}{'次数':>8}{'失败':>6}{'平均ms':>10}{'p95ms':>10}{'最大ms':>10}{'行数':>10}{'字节':>12}"]
+        for name, s in snapshot['methods'].items():
+            lines.append(f"{name:<32}{s['count']:>8}{s['errors']:>6}{s['avg_ms']:>10.2f}{s['p95_ms']:>10.0f}"
+                         f"{s['max_ms']:>10.2f}{s['rows']:>10}{s['bytes']:>12}")
+        lines.append("")
+        lines.append(f"慢查询（>= {snapshot['slow_threshold_ms']:.0f}ms，最近 {len(snapshot['slow_queries'])} 条）:")
+        for q in reversed(snapshot['slow_queries']):
+            lines.append(f"[{q['time']}] {q['method']} {q['elapsed_ms']:.1f}ms rows={q['rows']} {q['params']}")
+            lines.append(f"    {q['sql'][:300]}")
+        return "\n".join(lines)
+
+
+class ProfiledCursor:
+    """计时游标：执行到下一次执行（或关闭）之间读取的行都计入同一条语句"""
+
+    def __init__(self, cursor, profiler: QueryProfiler):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._pending = None  # [方法, sql, 参数形状, 耗时ms, 行数, 字节数]
+
+    def _finish(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._profiler.record(*pending)
+
+    def _run(self, func, sql, params, shape):
+        self._finish()
+        method = self._profiler.caller()
+        start = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            self._profiler.record(method, sql, shape, (time.perf_counter() - start) * 1000, 0, 0, str(e))
+            raise
+        self._pending = [method, sql, shape, (time.perf_counter() - start) * 1000, 0, 0]
+        return result
+
+    def execute(self, sql, params=None, *args, **kwargs):
+        if params is None:
+            return self._run(lambda: self._cursor.execute(sql, *args, **kwargs), sql, None, '')
+        return self._run(lambda: self._cursor.execute(sql, params, *args, **kwargs), sql, params,
+                         params_shape(params))
+
+    def executemany(self, sql, seq_of_params, *args, **kwargs):
+        seq_of_params = list(seq_of_params)
+        shape = f"{len(seq_of_params)} x {params_shape(seq_of_params[0])}" if seq_of_params else '0'
+        return self._run(lambda: self._cursor.executemany(sql, seq_of_params, *args, **kwargs),
+                         sql, seq_of_params, shape)
+
+    def _timed_fetch(self, func, rows_of):
+        start = time.perf_counter()
+        result = func()
+        if self._pending is not None:
+            rows = rows_of(result)
+            self._pending[3] += (time.perf_counter() - start) * 1000
+            self._pending[4] += len(rows)
+            self._pending[5] += sum(_row_bytes(row) for row in rows)
+        return result
+
+    def fetchone(self):
+        return self._timed_fetch(self._cursor.fetchone, lambda row: [row] if row is not None else [])
+
+    def fetchall(self):
+        return self._timed_fetch(self._cursor.fetchall, lambda rows: rows)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed_fetch(lambda: self._cursor.fetchmany(*args, **kwargs), lambda rows: rows)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ProfiledConnection:
+    """计时连接：cursor() 返回 ProfiledCursor，其余属性透传"""
+
+    def __init__(self, conn, profiler: QueryProfiler):
+        self._conn = conn
+        self._profiler = profiler
+
+    def cursor(self, *args, **kwargs):
+        return ProfiledCursor(self._conn.cursor(*args, **kwargs), self._profiler)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
@@ -0,0 +1,52 @@
+"""
+题库随机抽题 - 题目缓存在内存中，按版本号刷新，抽题不再访问数据库
+"""
+import time
+import random
+import threading
+
+
+class QuizSampler:
+    """带版本号的题库内存缓存
+
+    load_func() 返回全部题目列表，version_func() 返回题库当前版本号（题库写入时递增）。
+    每隔 check_interval 秒最多检查一次版本号，版本变化时重新加载整个题库；
+    抽题使用 random.sample，耗时只与抽取数量有关。
+    """
+
+    def __init__(self, load_func, version_func, check_interval=5.0, max_limit=100):
+        self.load_func = load_func
+        self.version_func = version_func
+        self.check_interval = check_interval
+        self.max_limit = max_limit
+        self.questions = []
+        self.version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """版本号变化时重新加载题库（加锁，避免并发请求重复加载）"""
+        now = time.time()
+        if self.version is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self.version is not None and now - self._checked_at < self.check_interval:
+                return
+            version = self.version_func()
+            if version != self.version or not self.questions:
+                self.questions = list(self.load_func())
+                self.version = version
+            self._checked_at = time.time()
+
+    def invalidate(self):
+        """当前进程修改题库后调用，下次抽题时立即检查版本"""
+        self._checked_at = 0.0
+
+    def sample(self, limit):
+        """随机抽取 limit 道不重复的题目，题库不足时返回全部（乱序）"""
+        if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= self.max_limit:
+            raise ValueError(f"题目数量需为 1-{self.max_limit} 之间的整数")
+        self._refresh()
+        questions = self.questions
+        picked = random.sample(questions, min(limit, len(questions)))
+        return [dict(q, options=list(q['options'])) for q in picked]
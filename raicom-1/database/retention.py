@@ -0,0 +1,78 @@
+"""
+历史记录保留策略 - 清理前归档与定时自动清理
+"""
+import os
+import json
+import zipfile
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class RetentionArchive:
+    """清理归档文件（zip）
+
+    每批记录写成一个 records/NNNNNN.jsonl 成员（deflate 压缩），图片按哈希写成
+    images/<hash> 成员，同一次归档内相同图片只写一份；JPEG 本身已压缩，直接存储。
+    """
+
+    def __init__(self, archive_dir: str):
+        os.makedirs(archive_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.path = os.path.join(archive_dir, f"detection_history_{stamp}.zip")
+        self._zip = zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._images = set()
+        self._batches = 0
+        self.records = 0
+
+    def has_image(self, image_hash: Optional[str]) -> bool:
+        return not image_hash or image_hash in self._images
+
+    def add_image(self, image_hash: str, data: Optional[bytes]):
+        if not data or image_hash in self._images:
+            return
+        self._zip.writestr(f"images/{image_hash}", data, compress_type=zipfile.ZIP_STORED)
+        self._images.add(image_hash)
+
+    def add_records(self, records: list):
+        if not records:
+            return
+        self._batches += 1
+        lines = "\n".join(json.dumps(record, ensure_ascii=False, default=str) for record in records)
+        self._zip.writestr(f"records/{self._batches:06d}.jsonl", lines + "\n")
+        self.records += len(records)
+
+    def close(self):
+        self._zip.close()
+
+
+class RetentionScheduler:
+    """按固定间隔在后台线程执行清理任务"""
+
+    def __init__(self, purge_func, interval_hours: float, name: str = 'retention'):
+        self.purge_func = purge_func  # purge_func() -> 清理结果
+        self.interval = interval_hours * 3600
+        self.name = name
+        self.last_result: Optional[Dict] = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = self.purge_func()
+            except Exception as e:
+                print(f"[{self.name}] 自动清理失败: {e}")
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def stop(self):
+        self._stop.set()
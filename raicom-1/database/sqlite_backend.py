@@ -0,0 +1,325 @@
+"""
+嵌入式 SQLite 存储后端 - 单机部署无需 MySQL 服务
+
+- WAL 日志模式：读写互不阻塞，多个读连接可与写连接并发
+- 连接级语句缓存：相同SQL只编译一次（预编译语句复用）
+- 连接与游标包装成与 mysql-connector 相同的接口（%s 占位符、start_transaction、ping），
+  SQLite 异常转换为 mysql.connector.Error，DatabaseManager 的查询与异常处理无需区分后端
+"""
+import os
+import re
+import sqlite3
+from datetime import datetime, date
+from functools import lru_cache
+
+from mysql.connector import Error
+
+from .backends import StorageBackend
+from .migrations import drop_legacy_image_columns
+
+
+def _adapt_datetime(value: datetime) -> str:
+    # 固定带微秒，保证按字符串比较与按时间比较一致
+    return value.isoformat(sep=' ', timespec='microseconds')
+
+
+def _convert_datetime(value: bytes) -> datetime:
+    return datetime.fromisoformat(value.decode())
+
+
+def _convert_date(value: bytes) -> date:
+    return date.fromisoformat(value.decode()[:10])
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_datetime)
+sqlite3.register_converter('DATE', _convert_date)
+
+
+@lru_cache(maxsize=512)
+def _translate(sql: str) -> str:
+    """%s 占位符转换为 ?，%% 还原为 %（与 mysql-connector 带参数执行时的规则一致）"""
+    return re.sub(r'%([s%])', lambda m: '?' if m.group(1) == 's' else '%', sql)
+
+
+class SQLiteCursor:
+    """游标包装：转换占位符与异常"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=None):
+        try:
+            if params is None:
+                self._cursor.execute(sql)
+            else:
+                self._cursor.execute(_translate(sql), tuple(params))
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        try:
+            self._cursor.executemany(_translate(sql), [tuple(p) for p in seq_of_params])
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """连接包装：自动提交模式，start_transaction() 开启写事务"""
+
+    def __init__(self, path, timeout=5.0, cached_statements=256):
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None,
+                                     check_same_thread=False, cached_statements=cached_statements,
+                                     detect_types=sqlite3.PARSE_DECLTYPES)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+
+    def cursor(self):
+        return SQLiteCursor(self._conn.cursor())
+
+    def start_transaction(self):
+        # IMMEDIATE：开始时即取得写锁，事务内先读后写不会因锁升级失败
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._conn.close()
+
+
+# 与 DatabaseConfig 中 MySQL 建表语句语义一致的 SQLite 建表语句
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS detection_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        image_path VARCHAR(500) NOT NULL,
+        image_hash CHAR(64),
+        result_image_path VARCHAR(500),
+        result_image_hash CHAR(64),
+        thumbnail_hash CHAR(64),
+        detection_results JSON NOT NULL,
+        detection_time DATETIME NOT NULL,
+        confidence_scores JSON,
+        processing_time FLOAT,
+        source_type VARCHAR(20) NOT NULL CHECK (source_type IN ('upload', 'camera', 'manual_save')),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_time_id ON detection_history (detection_time, id)",
+    "CREATE INDEX IF NOT EXISTS idx_source_time_id ON detection_history (source_type, detection_time, id)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_detection_history_updated_at
+    AFTER UPDATE ON detection_history FOR EACH ROW
+    BEGIN
+        UPDATE detection_history SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS image_blobs (
+        hash CHAR(64) PRIMARY KEY,
+        data BLOB,
+        size INTEGER NOT NULL,
+        ref_count INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS detection_feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        detection_id INTEGER REFERENCES detection_history(id) ON DELETE SET NULL,
+        garbage_name VARCHAR(100) NOT NULL,
+        predicted_category VARCHAR(50) NOT NULL,
+        is_correct TINYINT NOT NULL,
+        correct_category VARCHAR(50),
+        satisfaction INTEGER,
+        feedback_comment TEXT,
+        feedback_time DATETIME NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_feedback_time ON detection_feedback (feedback_time)",
+    "CREATE INDEX IF NOT EXISTS idx_predicted_category ON detection_feedback (predicted_category)",
+    "CREATE INDEX IF NOT EXISTS idx_is_correct ON detection_feedback (is_correct)",
+    """
+    CREATE TABLE IF NOT EXISTS quiz_questions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question VARCHAR(500) NOT NULL,
+        option_a VARCHAR(100) NOT NULL,
+        option_b VARCHAR(100) NOT NULL,
+        option_c VARCHAR(100) NOT NULL,
+        option_d VARCHAR(100) NOT NULL,
+        answer VARCHAR(100) NOT NULL,
+        explanation TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS table_counters (
+        name VARCHAR(64) PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS feedback_category_rollup (
+        predicted_category VARCHAR(50) NOT NULL,
+        satisfaction TINYINT NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        correct_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (predicted_category, satisfaction)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS feedback_daily_rollup (
+        feedback_date DATE PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0,
+        correct_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+
+DETECTION_OBJECTS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS detection_objects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        record_id INTEGER NOT NULL REFERENCES detection_history(id) ON DELETE CASCADE,
+        class_name VARCHAR(100) NOT NULL,
+        category VARCHAR(50),
+        confidence FLOAT,
+        bbox_x FLOAT,
+        bbox_y FLOAT,
+        bbox_w FLOAT,
+        bbox_h FLOAT,
+        detection_time DATETIME NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_class_time ON detection_objects (class_name, detection_time)",
+    "CREATE INDEX IF NOT EXISTS idx_category_time ON detection_objects (category, detection_time)",
+    "CREATE INDEX IF NOT EXISTS idx_record ON detection_objects (record_id)",
+]
+
+# 检索用的覆盖索引，取代 (类别, 时间) 索引
+DETECTION_OBJECTS_SEARCH_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_class_time_record ON detection_objects "
+    "(class_name, detection_time, record_id, confidence)",
+    "CREATE INDEX IF NOT EXISTS idx_category_time_record ON detection_objects "
+    "(category, detection_time, record_id, confidence)",
+    "CREATE INDEX IF NOT EXISTS idx_time_record ON detection_objects (detection_time, record_id, confidence)",
+    "DROP INDEX IF EXISTS idx_class_time",
+    "DROP INDEX IF EXISTS idx_category_time",
+]
+
+
+def _create_schema(manager, cursor):
+    for statement in SCHEMA:
+        cursor.execute(statement)
+    manager._rebuild_counters(cursor)
+
+
+def _seed_quiz_questions(manager, cursor):
+    manager._init_quiz_data(cursor)
+
+
+def _create_detection_objects(manager, cursor):
+    for statement in DETECTION_OBJECTS_SCHEMA:
+        cursor.execute(statement)
+
+
+def _create_search_indexes(manager, cursor):
+    for statement in DETECTION_OBJECTS_SEARCH_INDEXES:
+        cursor.execute(statement)
+
+
+# (版本号, 说明, 迁移函数)，版本号只增不改
+MIGRATIONS = [
+    (1, '创建全部表', _create_schema),
+    (2, '导入初始题库', _seed_quiz_questions),
+    (3, '检测目标表', _create_detection_objects),
+    (4, '检测记录检索索引', _create_search_indexes),
+    (5, '删除检测记录表内的图片列', drop_legacy_image_columns),
+]
+
+
+class SQLiteBackend(StorageBackend):
+    """嵌入式 SQLite 后端，数据库为单个本地文件"""
+
+    name = 'sqlite'
+    random_function = 'RANDOM()'
+
+    def connect(self):
+        return SQLiteConnection(**self.config.sqlite_config)
+
+    def create_database(self):
+        directory = os.path.dirname(os.path.abspath(self.config.sqlite_config['path']))
+        os.makedirs(directory, exist_ok=True)
+
+    def migrations(self):
+        return MIGRATIONS
+
+    def is_transient_error(self, error):
+        # 其他连接持有写锁超过 busy timeout 时报 database is locked / busy
+        cause = getattr(error, '__cause__', None)
+        if isinstance(cause, sqlite3.OperationalError) and ('locked' in str(cause) or 'busy' in str(cause)):
+            return True
+        return super().is_transient_error(error)
+
+    def table_columns(self, cursor, table):
+        cursor.execute(f"PRAGMA table_info({table})")
+        return {row[1] for row in cursor.fetchall()}
+
+    def upsert_sql(self, table, columns, key_columns, add_columns=(), replace_columns=()):
+        updates = [f"{c} = {c} + excluded.{c}" for c in add_columns]
+        updates += [f"{c} = excluded.{c}" for c in replace_columns]
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {', '.join(updates)}")
@@ -0,0 +1,164 @@
+"""
+检测记录后写队列 - 调用方入队即返回，后台线程批量写入数据库
+"""
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class WriteBehindFullError(Exception):
+    """后写队列已满（背压超时）"""
+    pass
+
+
+class WriteBehindQueue:
+    """异步后写队列
+
+    调用方 submit() 一行待插入数据并立即得到 Future；后台线程按条数或时间凑批，
+    通过 flush_func 在一个事务内批量写入。只有 is_transient(错误) 为真的临时错误（断线、死锁等）
+    才指数退避重试；数据或约束错误时整批回滚后逐行重写，只有出错那一行的 Future 失败。
+    队列有界：写入跟不上时 submit() 最多阻塞 put_timeout 秒，超时则 Future 直接失败。
+    """
+
+    def __init__(self, flush_func, batch_size=50, flush_interval=0.5, queue_size=1000,
+                 put_timeout=2.0, max_retries=3, retry_backoff=0.5, max_batch_bytes=16 * 1024 * 1024,
+                 name='write-behind', is_transient=None):
+        self.flush_func = flush_func  # flush_func(rows) -> 每行对应的结果列表
+        self.is_transient = is_transient or (lambda error: True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_batch_bytes = max_batch_bytes
+        self.name = name
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            'submitted': 0,
+            'written': 0,
+            'failed': 0,
+            'rejected': 0,
+            'batches': 0,
+            'retries': 0,
+            'split_batches': 0,
+            'flush_time_total': 0.0,
+        }
+
+    def submit(self, row) -> Future:
+        """提交一行数据，返回Future，结果为 flush_func 对该行的返回值"""
+        future = Future()
+        if self.closed:
+            future.set_exception(RuntimeError("后写队列已关闭"))
+            return future
+        self._ensure_started()
+        try:
+            self.queue.put((row, future), timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self._metrics['rejected'] += 1
+            future.set_exception(WriteBehindFullError(f"写入队列已满（{self.queue.maxsize}），请稍后重试"))
+            return future
+        with self._lock:
+            self._metrics['submitted'] += 1
+        return future
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        """后台写线程：按条数、字节数或时间凑批"""
+        stopping = False
+        while not stopping:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            batch = [item]
+            batch_bytes = self._row_bytes(item[0])
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size and batch_bytes < self.max_batch_bytes:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                batch_bytes += self._row_bytes(item[0])
+            self._flush(batch)
+
+    @staticmethod
+    def _row_bytes(row):
+        return sum(len(value) for value in row if isinstance(value, (bytes, str)))
+
+    def _write(self, rows):
+        """写入一批，临时错误退避重试，其他错误或重试用尽时抛出"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.flush_func(rows)
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_transient(e):
+                    raise
+                with self._lock:
+                    self._metrics['retries'] += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+    def _flush(self, batch):
+        start = time.time()
+        try:
+            results = self._write([row for row, _ in batch])
+        except Exception as e:
+            if len(batch) > 1 and not self.is_transient(e):
+                # 数据错误：逐行重写，找出并只让出错的行失败
+                with self._lock:
+                    self._metrics['split_batches'] += 1
+                for item in batch:
+                    self._flush([item])
+                return
+            print(f"[{self.name}] 写入失败，放弃 {len(batch)} 条: {e}")
+            with self._lock:
+                self._metrics['failed'] += len(batch)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+        with self._lock:
+            self._metrics['written'] += len(batch)
+            self._metrics['batches'] += 1
+            self._metrics['flush_time_total'] += time.time() - start
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+        stats['pending'] = self.queue.qsize()
+        stats['avg_flush_ms'] = round(stats['flush_time_total'] / stats['batches'] * 1000, 2) if stats['batches'] else 0
+        stats['flush_time_total'] = round(stats['flush_time_total'], 4)
+        return stats
+
+    def close(self, timeout=10.0):
+        """停止接收新数据，并在超时内写完队列中已有的数据"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
@@ -0,0 +1,124 @@
+"""
+摄像头检测记录保存 - 基于事件去重的异步保存
+"""
+import cv2
+import time
+import queue
+import threading
+from datetime import datetime
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.db_manager import db_manager
+from detection.utils import get_garbage_info, boxes_to_detections
+
+
+class CameraEventSaver:
+    """摄像头检测事件保存器
+
+    只有当某个类别连续稳定出现（新目标）时才保存一条记录，同一类别在去重窗口内不再重复保存。
+    推理线程只做轻量判断和入队，快照编码在后台线程完成，数据库写入交给批量后写队列；
+    队列满时直接丢弃事件，保证保存永远不会拖慢帧循环。
+    """
+
+    def __init__(self, class_names, target_size=(640, 640), dedup_window=10.0,
+                 min_hits=3, max_gap=1.0, queue_size=8, jpeg_quality=85):
+        self.class_names = class_names
+        self.target_size = target_size
+        self.dedup_window = dedup_window  # 同类别去重时间窗口（秒）
+        self.min_hits = min_hits          # 连续出现多少帧才视为稳定目标
+        self.max_gap = max_gap            # 超过该间隔未出现则视为目标离开
+        self.jpeg_quality = jpeg_quality
+        self.events = queue.Queue(maxsize=queue_size)
+        self.tracks = {}  # 类别 -> {'hits', 'last_seen', 'last_saved'}
+        self.saved_events = 0
+        self.dropped_events = 0
+        self.running = True
+        self._thread = threading.Thread(target=self._save_loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, result, annotated=None, processing_time=0.0):
+        """提交一帧过滤后的检测结果，出现新的稳定目标时入队保存，返回是否入队"""
+        if not self.running or result is None or len(result.boxes) == 0:
+            return False
+
+        now = time.time()
+        data = result.boxes.data.cpu().numpy()
+        detections = boxes_to_detections(data, self.class_names, frame.shape, self.target_size)
+        new_classes = []
+        for class_name in {det['class'] for det in detections}:
+            track = self.tracks.setdefault(class_name, {'hits': 0, 'last_seen': 0.0, 'last_saved': 0.0})
+            if now - track['last_seen'] > self.max_gap:
+                track['hits'] = 0
+            track['hits'] += 1
+            track['last_seen'] = now
+            if track['hits'] >= self.min_hits and now - track['last_saved'] >= self.dedup_window:
+                track['last_saved'] = now
+                new_classes.append(class_name)
+
+        if not new_classes:
+            return False
+
+        try:
+            # 帧数组在推理线程中不会再被修改，直接传引用，编码留给后台线程
+            self.events.put_nowait((frame, annotated, detections, processing_time, datetime.now()))
+            return True
+        except queue.Full:
+            self.dropped_events += 1
+            return False
+
+    def _encode(self, frame):
+        if frame is None:
+            return None
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return buffer.tobytes() if ok else None
+
+    def _save_loop(self):
+        """后台保存线程"""
+        while self.running or not self.events.empty():
+            try:
+                event = self.events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if event is None:
+                break
+            try:
+                self._save_event(*event)
+            except Exception as e:
+                print(f"[摄像头记录保存失败] {e}")
+
+    def _save_event(self, frame, annotated, detections, processing_time, detection_time):
+        detection_results = []
+        for det in detections:
+            garbage_info = get_garbage_info(det['class'])
+            detection_results.append({
+                **det,
+                'name': garbage_info.get('名称', det['class']),
+                'category': garbage_info.get('分类', '未知分类'),
+                'tips': garbage_info.get('处理建议', '')
+            })
+        future = db_manager.save_detection_record_async(
+            image_path=f"camera_{detection_time.strftime('%Y%m%d_%H%M%S_%f')}.jpg",
+            detection_results=detection_results,
+            confidence_scores=[det['confidence'] for det in detections],
+            processing_time=processing_time,
+            source_type='camera',
+            image_data=self._encode(frame),
+            result_image_data=self._encode(annotated)
+        )
+        future.add_done_callback(self._on_saved)
+
+    def _on_saved(self, future):
+        if future.exception() is None:
+            self.saved_events += 1
+        else:
+            print(f"[摄像头记录保存失败] {future.exception()}")
+
+    def stop(self, timeout=3.0):
+        """停止接收新事件，并在超时内尽量写完队列中的事件"""
+        self.running = False
+        try:
+            self.events.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
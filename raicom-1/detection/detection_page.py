@@ -5,14 +5,19 @@ import os
 import cv2
 from datetime import datetime
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtWidgets import (QWidget, QLabel, QVBoxLayout, QHBoxLayout, 
+from PyQt5.QtWidgets import (QWidget, QLabel, QVBoxLayout, QHBoxLayout, QGridLayout,
                              QPushButton, QFileDialog, QMessageBox, QTextEdit, 
                              QComboBox, QSlider, QProgressBar, QFrame,
-                             QSizePolicy, QCheckBox, QGraphicsDropShadowEffect)
+                             QSizePolicy, QCheckBox, QGraphicsDropShadowEffect,
+                             QInputDialog)
 from PyQt5.QtGui import QImage, QPixmap, QColor
 from ultralytics import YOLO
 from detection.webcam_worker import WebcamWorker
 from detection.detection_worker import DetectionWorker
+from detection.camera_saver import CameraEventSaver
+from detection.multi_camera_worker import MultiCameraWorker
+from detection.pipeline_stats import PipelineStats
+from detection.video_source import FileVideoSource, StreamVideoSource, CameraSource
 from detection.utils import get_garbage_info
 from window.styles import COLORS, GRADIENTS
 
@@ -26,6 +31,8 @@ class DetectionPage(QWidget):
         self.current_image_path = None
         self.worker = None
         self.webcam_worker = None
+        self.tile_labels = []
+        self.last_stats_snapshot = None
         self.detection_start_time = None
         self.detection_count = 0
         self.settings = {'output_directory': os.getcwd()}
@@ -87,8 +94,8 @@ class DetectionPage(QWidget):
         layout.addWidget(mode_label)
         
         self.detect_type_combo = QComboBox()
-        self.detect_type_combo.addItems(["图片检测", "摄像头检测"])
-        self.detect_type_combo.setFixedSize(110, 36)
+        self.detect_type_combo.addItems(["图片检测", "摄像头检测", "多摄像头检测", "视频检测", "网络流检测"])
+        self.detect_type_combo.setFixedSize(120, 36)
         self.detect_type_combo.currentIndexChanged.connect(self.on_detect_type_changed)
         self._style_combo(self.detect_type_combo)
         layout.addWidget(self.detect_type_combo)
@@ -149,6 +156,16 @@ class DetectionPage(QWidget):
         self.stop_cam_button.clicked.connect(self.stop_webcam)
         self._style_button(self.stop_cam_button, 'danger')
         cam_layout.addWidget(self.stop_cam_button)
+        self.record_button = QPushButton("录制")
+        self.record_button.setFixedSize(80, 36)
+        self.record_button.clicked.connect(self.toggle_recording)
+        self._style_button(self.record_button, 'primary')
+        cam_layout.addWidget(self.record_button)
+        self.perf_export_button = QPushButton("性能CSV")
+        self.perf_export_button.setFixedSize(80, 36)
+        self.perf_export_button.clicked.connect(self.export_pipeline_stats)
+        self._style_button(self.perf_export_button, 'primary')
+        cam_layout.addWidget(self.perf_export_button)
         self.cam_buttons_widget.hide()
         layout.addWidget(self.cam_buttons_widget)
         
@@ -211,6 +228,14 @@ class DetectionPage(QWidget):
         """)
         layout.addWidget(self.result_label, 1)
         
+        # 多摄像头画面网格
+        self.tile_container = QWidget()
+        self.tile_layout = QGridLayout(self.tile_container)
+        self.tile_layout.setContentsMargins(0, 0, 0, 0)
+        self.tile_layout.setSpacing(6)
+        self.tile_container.hide()
+        layout.addWidget(self.tile_container, 1)
+        
         parent_layout.addWidget(image_card, 7)
 
     def _create_info_panel(self, parent_layout):
@@ -364,6 +389,17 @@ class DetectionPage(QWidget):
         self.footer_time_label.setStyleSheet(info_style)
         layout.addWidget(self.footer_time_label)
         
+        self.footer_perf_sep = QLabel("|")
+        self.footer_perf_sep.setStyleSheet(sep_style)
+        self.footer_perf_sep.hide()
+        layout.addWidget(self.footer_perf_sep)
+        
+        # 摄像头/视频流水线性能（悬停查看分阶段明细）
+        self.footer_perf_label = QLabel("")
+        self.footer_perf_label.setStyleSheet(info_style)
+        self.footer_perf_label.hide()
+        layout.addWidget(self.footer_perf_label)
+        
         parent_layout.addWidget(footer)
 
     def _create_separator(self):
@@ -624,34 +660,186 @@ class DetectionPage(QWidget):
         if not self.model:
             QMessageBox.warning(self, "警告", "请先加载模型!")
             return
+        if "多摄像头" in self.detect_type_combo.currentText():
+            self.start_multi_camera()
+            return
+        source = self._select_video_source()
+        if source is False:
+            return
+        event_saver = None
         try:
-            self._set_status("正在启动摄像头...", "loading")
-            self.webcam_worker = WebcamWorker(self.model, self.conf_slider.value() / 100)
+            self._set_status("正在启动视频源..." if source else "正在启动摄像头...", "loading")
+            event_saver = CameraEventSaver(self.model.names) if self.auto_save_check.isChecked() else None
+            self.webcam_worker = WebcamWorker(self.model, self.conf_slider.value() / 100,
+                                              source=source, event_saver=event_saver)
             self.webcam_worker.frame_ready.connect(self.display_webcam_frame)
             self.webcam_worker.result_ready.connect(self.display_webcam_result)
             self.webcam_worker.detection_complete.connect(lambda r: self.update_detection_info(r, 0))
+            self.webcam_worker.source_finished.connect(self.on_video_finished)
+            self.webcam_worker.stats_updated.connect(self.update_pipeline_stats)
+            self.webcam_worker.start()
+            self._set_status("视频源已启动" if source else "摄像头已启动", "success")
+        except Exception as e:
+            if event_saver is not None:
+                event_saver.stop()
+            self._set_status("视频源启动失败" if source else "摄像头启动失败", "error")
+            QMessageBox.critical(self, "错误", str(e))
+
+    def start_multi_camera(self):
+        """多摄像头模式：多路采集，共享一个模型批量推理"""
+        text, ok = QInputDialog.getText(self, "多摄像头", "摄像头索引（逗号分隔）:", text="0,1")
+        if not ok:
+            return
+        try:
+            indices = [int(part) for part in text.replace("，", ",").split(",") if part.strip()]
+        except ValueError:
+            QMessageBox.warning(self, "警告", "摄像头索引必须为整数")
+            return
+        if not indices:
+            return
+        try:
+            self._set_status("正在启动多路摄像头...", "loading")
+            sources = [CameraSource(idx) for idx in indices]
+            self.webcam_worker = MultiCameraWorker(self.model, sources, self.conf_slider.value() / 100)
+            self._build_tiles(len(sources))
+            self.webcam_worker.tile_ready.connect(self.display_tile)
+            self.webcam_worker.tile_detection_complete.connect(lambda idx, r: self.update_detection_info(r, 0))
+            self.webcam_worker.stats_updated.connect(self.update_pipeline_stats)
             self.webcam_worker.start()
-            self._set_status("摄像头已启动", "success")
+            self._set_status(f"已启动 {len(sources)} 路摄像头", "success")
         except Exception as e:
+            self._clear_tiles()
             self._set_status("摄像头启动失败", "error")
             QMessageBox.critical(self, "错误", str(e))
 
+    def _build_tiles(self, count):
+        """按路数创建画面网格"""
+        self._clear_tiles()
+        columns = 1 if count == 1 else 2
+        for idx in range(count):
+            tile = QLabel(f"摄像头 {idx + 1}")
+            tile.setAlignment(Qt.AlignCenter)
+            tile.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+            tile.setStyleSheet(f"background: {COLORS['bg_light']}; border: 1px solid {COLORS['border']}; border-radius: 6px; color: {COLORS['text_light']};")
+            self.tile_layout.addWidget(tile, idx // columns, idx % columns)
+            self.tile_labels.append(tile)
+        self.result_label.hide()
+        self.tile_container.show()
+
+    def _clear_tiles(self):
+        for tile in self.tile_labels:
+            self.tile_layout.removeWidget(tile)
+            tile.deleteLater()
+        self.tile_labels = []
+        self.tile_container.hide()
+        self.result_label.show()
+
+    def display_tile(self, idx, frame):
+        if 0 <= idx < len(self.tile_labels):
+            self._show_frame(self.tile_labels[idx], frame)
+        if self.webcam_worker is not None:
+            self.webcam_worker.stats.mark_displayed()
+
+    def _select_video_source(self):
+        """根据检测模式创建视频源：摄像头模式返回None，用户取消返回False"""
+        mode = self.detect_type_combo.currentText()
+        if "视频" in mode:
+            video_path, _ = QFileDialog.getOpenFileName(self, "选择视频", "", "视频文件 (*.mp4 *.avi *.mkv *.mov)")
+            if not video_path:
+                return False
+            self.image_info_label.setText(os.path.basename(video_path))
+            return FileVideoSource(video_path)
+        if "网络流" in mode:
+            url, ok = QInputDialog.getText(self, "网络流地址", "请输入RTSP/HTTP地址:", text="rtsp://")
+            if not ok or not url.strip():
+                return False
+            self.image_info_label.setText(url.strip())
+            return StreamVideoSource(url.strip())
+        return None
+
+    def on_video_finished(self):
+        """视频文件处理完毕"""
+        if self.webcam_worker:
+            self.webcam_worker.stop()
+            self.webcam_worker.wait()
+        self.record_button.setText("录制")
+        self._reset_detection_view()
+        self._set_status("视频处理完成", "success")
+
+    def toggle_recording(self):
+        """开始/停止录制当前检测画面"""
+        worker = self.webcam_worker
+        if not worker or not worker.isRunning() or isinstance(worker, MultiCameraWorker):
+            QMessageBox.information(self, "提示", "请先启动单路摄像头或视频检测")
+            return
+        if worker.recorder is not None:
+            worker.stop_recording()
+            self.record_button.setText("录制")
+            self._set_status("录制已保存", "success")
+            return
+        default_name = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+        video_path, _ = QFileDialog.getSaveFileName(
+            self, "保存录像", os.path.join(self.settings['output_directory'], default_name), "视频文件 (*.mp4 *.avi)")
+        if not video_path:
+            return
+        try:
+            worker.start_recording(video_path)
+            self.record_button.setText("停止录制")
+            self._set_status("正在录制...", "loading")
+        except Exception as e:
+            self._set_status("录制启动失败", "error")
+            QMessageBox.critical(self, "错误", str(e))
+
     def stop_webcam(self):
+        self.record_button.setText("录制")
         if hasattr(self, 'webcam_worker') and self.webcam_worker and self.webcam_worker.isRunning():
             self.webcam_worker.stop()
             self.webcam_worker.wait()
-            self._reset_display()
-            self._set_status("摄像头已停止", "info")
+            self._reset_detection_view()
+            self._set_status("检测已停止", "info")
+
+    def _reset_detection_view(self):
+        """检测结束后清空画面、多路画格与性能信息"""
+        self._clear_tiles()
+        self._reset_display()
+        self.footer_perf_label.hide()
+        self.footer_perf_sep.hide()
 
     def display_webcam_frame(self, frame):
         pass
 
     def display_webcam_result(self, frame):
+        self._show_frame(self.result_label, frame)
+        if self.webcam_worker is not None:
+            self.webcam_worker.stats.mark_displayed()
+
+    def update_pipeline_stats(self, snapshot):
+        """在状态栏显示流水线帧率与延迟"""
+        self.last_stats_snapshot = snapshot
+        self.footer_perf_label.setText(PipelineStats.format_summary(snapshot))
+        self.footer_perf_label.setToolTip(PipelineStats.format_details(snapshot))
+        self.footer_perf_label.show()
+        self.footer_perf_sep.show()
+
+    def export_pipeline_stats(self):
+        """导出分阶段耗时统计到CSV"""
+        if not self.webcam_worker:
+            QMessageBox.information(self, "提示", "暂无性能数据，请先启动检测")
+            return
+        default_name = f"pipeline_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "导出性能统计", os.path.join(self.settings['output_directory'], default_name), "CSV文件 (*.csv)")
+        if file_path:
+            self.webcam_worker.stats.dump_csv(file_path)
+            QMessageBox.information(self, "成功", f"已保存到: {file_path}")
+
+    def _show_frame(self, label, frame):
+        """将BGR帧缩放显示到指定标签"""
         h, w, ch = frame.shape
         qImg = QImage(frame.data, w, h, 3 * w, QImage.Format_RGB888).rgbSwapped()
         pixmap = QPixmap.fromImage(qImg)
-        scaled = pixmap.scaled(self.result_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.result_label.setPixmap(scaled)
+        scaled = pixmap.scaled(label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        label.setPixmap(scaled)
 
     # ========== 辅助功能 ==========
     def go_to_history(self):
@@ -0,0 +1,105 @@
+import cv2
+import time
+from collections import deque
+from PyQt5.QtCore import pyqtSignal
+import torch
+
+from detection.webcam_worker import WebcamWorker
+
+
+class MultiCameraWorker(WebcamWorker):
+    """多路摄像头检测：每路独立采集线程，共享一个模型做批量推理"""
+
+    tile_ready = pyqtSignal(int, object)  # (画面序号, 检测结果帧)
+    tile_detection_complete = pyqtSignal(int, object)  # (画面序号, 过滤后的结果)
+
+    def __init__(self, model, sources, conf_threshold=0.4):
+        self.sources = list(sources)
+        super().__init__(model, conf_threshold)
+        # 每路画面独立的稳定性历史
+        self.histories = [deque(maxlen=5) for _ in self.sources]
+
+    def _open_source(self):
+        """启动所有视频源的采集线程，任一失败则全部释放"""
+        started = []
+        try:
+            for source in self.sources:
+                source.stats = self.stats
+                source.start()
+                started.append(source)
+        except Exception:
+            for source in started:
+                source.stop()
+            raise
+
+    def run(self):
+        last_stats_time = time.time()
+        while self.running:
+            batch = self._collect_batch()
+            if not batch:
+                if all(source.exhausted() for source in self.sources):
+                    self.source_finished.emit()
+                    break
+                time.sleep(0.001)
+                continue
+            self._process_batch(batch)
+            for _ in batch:
+                self.stats.tick_frame()
+            
+            if time.time() - last_stats_time >= self.stats_interval:
+                last_stats_time = time.time()
+                self.stats_updated.emit(self.stats.snapshot())
+
+    def _collect_batch(self):
+        """从每路取最新一帧组成批次，没有新帧的画面本轮跳过"""
+        batch = []
+        for idx, source in enumerate(self.sources):
+            item = source.read_latest() if source.is_live else source.read(timeout=0)
+            if item is not None:
+                frame, capture_ts = item
+                self.stats.record('queue', time.time() - capture_ts)
+                batch.append((idx, frame, capture_ts))
+        return batch
+
+    def _process_batch(self, batch):
+        """一次前向推理处理整个批次，再把结果分发回各路画面"""
+        display_frames = [cv2.resize(frame, self.output_size) for _, frame, _ in batch]
+        try:
+            with self.stats.measure('preprocess'):
+                tensor = torch.cat([self._yolo_preprocess(frame) for _, frame, _ in batch], dim=0)
+            with self.stats.measure('inference'), torch.no_grad():
+                results = self.model(tensor, conf=self.conf_threshold)
+        except Exception as e:
+            print(f"[批量推理错误] {str(e)}")
+            for (idx, _, capture_ts), display_frame in zip(batch, display_frames):
+                self._publish_tile(idx, display_frame, capture_ts)
+            return
+
+        for (idx, frame, capture_ts), display_frame, result in zip(batch, display_frames, results):
+            try:
+                with self.stats.measure('filter'):
+                    filtered = self._filter_results([result], self.histories[idx])
+                if not filtered:
+                    self._publish_tile(idx, display_frame, capture_ts)
+                    continue
+                with self.stats.measure('render'):
+                    annotated = self._render_results(display_frame, filtered[0], frame)
+                self._publish_tile(idx, annotated, capture_ts)
+                self.tile_detection_complete.emit(idx, filtered)
+            except Exception as e:
+                print(f"[处理错误] 画面{idx}: {str(e)}")
+                self._publish_tile(idx, display_frame, capture_ts)
+
+    def _publish_tile(self, idx, output_frame, capture_ts):
+        """发送一路画面的结果帧，与单路一样记录发出时间，界面显示后计算端到端延迟"""
+        self.stats.mark_emitted(capture_ts)
+        self.tile_ready.emit(idx, output_frame)
+
+    def stop(self):
+        self.running = False
+        # 先通知全部视频源再逐个等待，停止耗时不随路数累加
+        for source in self.sources:
+            source.request_stop()
+        for source in self.sources:
+            source.stop()
+        self.wait(500)
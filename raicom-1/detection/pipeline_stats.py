@@ -0,0 +1,130 @@
+"""
+检测流水线分阶段耗时统计
+"""
+import csv
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+# 各阶段的显示名称，按流水线顺序排列
+STAGE_LABELS = {
+    'capture': '采集',
+    'queue': '排队',
+    'preprocess': '预处理',
+    'inference': '推理',
+    'filter': '过滤',
+    'render': '绘制',
+    'signal': '信号',
+    'capture_to_display': '端到端',
+}
+
+
+class PipelineStats:
+    """流水线分阶段耗时统计：滚动窗口内的 p50/p95/p99 与帧率
+
+    各阶段耗时以毫秒记录在定长队列中，记录操作只是一次append，可以在推理线程中直接调用。
+    端到端延迟按帧的采集时间戳计算：结果帧发出时登记时间戳，界面显示后取出计算。
+    """
+
+    def __init__(self, window=300):
+        self.window = window
+        self.samples = {}
+        self.frame_times = deque(maxlen=window)
+        self.pending_display = deque(maxlen=256)  # (采集时间戳, 发出时间戳)
+        self.total_frames = 0
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        """记录某阶段耗时（秒）"""
+        with self.lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.window)
+            samples.append(seconds * 1000)
+
+    @contextmanager
+    def measure(self, stage):
+        """计时上下文"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def tick_frame(self):
+        """一帧处理完成"""
+        self.frame_times.append(time.time())
+        self.total_frames += 1
+
+    def mark_emitted(self, capture_ts):
+        """结果帧已通过信号发出"""
+        self.pending_display.append((capture_ts, time.time()))
+
+    def mark_displayed(self):
+        """界面已显示一帧，按信号顺序配对计算信号与端到端延迟"""
+        try:
+            capture_ts, emit_ts = self.pending_display.popleft()
+        except IndexError:
+            return
+        now = time.time()
+        self.record('signal', now - emit_ts)
+        self.record('capture_to_display', now - capture_ts)
+
+    def fps(self):
+        times = list(self.frame_times)
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def snapshot(self):
+        """返回当前统计：{'fps': float, 'stages': {阶段: {count, mean, p50, p95, p99}}}"""
+        with self.lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+        stages = {}
+        for stage in list(STAGE_LABELS) + [s for s in samples if s not in STAGE_LABELS]:
+            values = samples.get(stage)
+            if not values:
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            stages[stage] = {
+                'count': len(values),
+                'mean': float(np.mean(values)),
+                'p50': float(p50),
+                'p95': float(p95),
+                'p99': float(p99),
+            }
+        return {'fps': self.fps(), 'stages': stages}
+
+    def dump_csv(self, path, snapshot=None):
+        """将统计写入CSV文件"""
+        snapshot = snapshot or self.snapshot()
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(['stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'])
+            for stage, s in snapshot['stages'].items():
+                writer.writerow([stage, s['count'], f"{s['mean']:.2f}", f"{s['p50']:.2f}",
+                                 f"{s['p95']:.2f}", f"{s['p99']:.2f}"])
+            writer.writerow(['fps', self.total_frames, f"{snapshot['fps']:.2f}", '', '', ''])
+
+    @staticmethod
+    def format_summary(snapshot):
+        """状态栏简要文本"""
+        stages = snapshot['stages']
+        parts = [f"FPS: {snapshot['fps']:.1f}"]
+        if 'inference' in stages:
+            parts.append(f"推理p95: {stages['inference']['p95']:.0f}ms")
+        if 'capture_to_display' in stages:
+            parts.append(f"端到端p95: {stages['capture_to_display']['p95']:.0f}ms")
+        return " | ".join(parts)
+
+    @staticmethod
+    def format_details(snapshot):
+        """各阶段明细文本"""
+        lines = ["阶段      p50 / p95 / p99 (ms)"]
+        for stage, s in snapshot['stages'].items():
+            label = STAGE_LABELS.get(stage, stage)
+            lines.append(f"{label}: {s['p50']:.1f} / {s['p95']:.1f} / {s['p99']:.1f}")
+        lines.append(f"FPS: {snapshot['fps']:.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,132 @@
+"""
+检测会话录制 - 后台编码线程写入标注视频与逐帧检测JSONL
+"""
+import os
+import cv2
+import json
+import time
+import queue
+import threading
+
+# 队列满时的丢帧策略
+DROP_NEWEST = 'drop_newest'  # 丢弃新到的帧，已排队的帧按序写入
+DROP_OLDEST = 'drop_oldest'  # 丢弃最旧的排队帧，优先保留最新画面
+
+
+class SessionRecorder:
+    """检测会话录制器
+
+    推理线程调用 write() 只做一次非阻塞入队；视频编码和JSONL写入在独立线程中完成。
+    队列满时按策略丢帧而不是阻塞推理。
+    """
+
+    def __init__(self, video_path, fps=20.0, frame_size=(640, 640), queue_size=32,
+                 drop_policy=DROP_NEWEST, fourcc='mp4v'):
+        self.video_path = video_path
+        self.jsonl_path = os.path.splitext(video_path)[0] + '.jsonl'
+        self.fps = fps if fps and fps > 0 else 20.0
+        self.frame_size = tuple(frame_size)
+        self.drop_policy = drop_policy
+        self.fourcc = fourcc
+        self.frames = queue.Queue(maxsize=max(1, queue_size))
+        self.writer = None
+        self.jsonl_file = None
+        self.running = False
+        self.frame_index = 0     # 提交的帧序号
+        self.written_frames = 0
+        self.dropped_frames = 0
+        self._thread = None
+
+    def start(self):
+        """打开视频和JSONL文件并启动编码线程，失败时抛出RuntimeError"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.video_path)), exist_ok=True)
+        self.writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                      self.fps, self.frame_size)
+        if not self.writer.isOpened():
+            self.writer = None
+            raise RuntimeError(f"无法创建录像文件: {self.video_path}")
+        self.jsonl_file = open(self.jsonl_path, 'w', encoding='utf-8')
+        self.running = True
+        self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, frame, detections=None, timestamp=None):
+        """提交一帧标注画面及其检测结果，返回是否入队"""
+        if not self.running:
+            return False
+        item = (self.frame_index, timestamp or time.time(), frame, detections or [])
+        self.frame_index += 1
+        try:
+            self.frames.put_nowait(item)
+            return True
+        except queue.Full:
+            if self.drop_policy == DROP_OLDEST:
+                try:
+                    self.frames.get_nowait()
+                except queue.Empty:
+                    pass
+                self.dropped_frames += 1
+                try:
+                    self.frames.put_nowait(item)
+                    return True
+                except queue.Full:
+                    pass
+            self.dropped_frames += 1
+            return False
+
+    def _encode_loop(self):
+        """专用的编码线程，取到结束标记后写完已排队的帧并关闭文件"""
+        try:
+            while True:
+                try:
+                    item = self.frames.get(timeout=0.5)
+                except queue.Empty:
+                    if not self.running:
+                        break
+                    continue
+                if item is None:
+                    break
+                index, timestamp, frame, detections = item
+                try:
+                    if (frame.shape[1], frame.shape[0]) != self.frame_size:
+                        frame = cv2.resize(frame, self.frame_size)
+                    self.writer.write(frame)
+                    self.jsonl_file.write(json.dumps({
+                        'frame': self.written_frames,
+                        'source_frame': index,
+                        'timestamp': timestamp,
+                        'detections': detections
+                    }, ensure_ascii=False) + '\n')
+                    self.written_frames += 1
+                except Exception as e:
+                    print(f"[录制错误] {e}")
+        finally:
+            # 文件只由编码线程关闭，stop() 等待超时也不会写入已关闭的文件
+            if self.writer is not None:
+                self.writer.release()
+                self.writer = None
+            if self.jsonl_file is not None:
+                self.jsonl_file.close()
+                self.jsonl_file = None
+            print(f"录制完成: {self.video_path}，写入 {self.written_frames} 帧，丢弃 {self.dropped_frames} 帧")
+
+    def stop(self, timeout=5.0):
+        """停止录制：放入结束标记（队列满时替换最旧的帧，不阻塞）并等待编码线程写完"""
+        if not self.running:
+            return
+        self.running = False
+        while True:
+            try:
+                self.frames.put_nowait(None)
+                break
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped_frames += 1
+                except queue.Empty:
+                    pass
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            if not self._thread.is_alive():
+                self._thread = None
@@ -18,3 +18,31 @@ def get_garbage_info(class_name):
         class_name,
         {"名称": class_name, "分类": "未知分类", "处理建议": "请咨询当地垃圾分类标准"}
     )
+
+
+def boxes_to_detections(boxes_data, class_names, orig_shape, target_size=(640, 640)):
+    """将letterbox输入上的检测框(x1, y1, x2, y2, conf, cls)还原为原图坐标的检测结果列表"""
+    orig_h, orig_w = orig_shape[:2]
+    scale = min(target_size[0] / orig_h, target_size[1] / orig_w)
+    pad_x = (target_size[1] - orig_w * scale) / 2
+    pad_y = (target_size[0] - orig_h * scale) / 2
+    detections = []
+    for det in boxes_data:
+        class_id = int(det[5])
+        try:
+            class_name = class_names[class_id]
+        except (KeyError, IndexError, TypeError):
+            class_name = f"Class_{class_id}"
+        x1 = (float(det[0]) - pad_x) / scale
+        y1 = (float(det[1]) - pad_y) / scale
+        x2 = (float(det[2]) - pad_x) / scale
+        y2 = (float(det[3]) - pad_y) / scale
+        detections.append({
+            'class': class_name,
+            'confidence': float(det[4]),
+            'x': x1,
+            'y': y1,
+            'width': x2 - x1,
+            'height': y2 - y1
+        })
+    return detections
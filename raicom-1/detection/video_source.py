@@ -0,0 +1,240 @@
+"""
+视频源模块 - 为检测流水线提供视频文件与网络流输入
+每个视频源拥有独立的解码线程和有界帧队列，推理线程只负责取帧
+"""
+import cv2
+import time
+import queue
+import threading
+
+# 队列满时的处理策略
+DROP_OLDEST = 'drop_oldest'  # 实时源：丢弃最旧帧，始终处理最新画面
+BLOCK = 'block'              # 文件源：阻塞解码线程，保证每一帧都被处理
+
+STREAM_SCHEMES = ('rtsp://', 'rtmp://', 'http://', 'https://')
+
+
+class VideoSource:
+    """视频源基类：独立解码线程 + 有界帧队列"""
+
+    is_live = True
+
+    def __init__(self, uri, queue_size=4, drop_policy=None):
+        self.uri = uri
+        self.drop_policy = drop_policy or (DROP_OLDEST if self.is_live else BLOCK)
+        self.frames = queue.Queue(maxsize=max(1, queue_size))
+        self.cap = None
+        self.fps = 0.0
+        self.running = False
+        self.finished = False
+        self.decoded_frames = 0
+        self.dropped_frames = 0
+        self.stats = None  # 可选的PipelineStats，用于记录解码耗时
+        self._thread = None
+        self._stop_event = threading.Event()  # stop() 置位，唤醒重连等待中的解码线程
+
+    def _open(self):
+        """打开底层采集对象，子类可覆盖"""
+        return cv2.VideoCapture(self.uri)
+
+    def start(self):
+        """打开视频源并启动解码线程，失败时抛出RuntimeError
+
+        启动后 cap 只由解码线程使用和释放。
+        """
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError(f"视频源仍在停止中: {self.uri}")
+        cap = self._open()
+        if cap is None or not cap.isOpened():
+            if cap is not None:
+                cap.release()
+            raise RuntimeError(f"无法打开视频源: {self.uri}")
+        self.cap = cap
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self._on_opened()
+        self.running = True
+        self.finished = False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def _on_opened(self):
+        """打开成功、解码线程启动前调用，子类可在此读取视频属性"""
+
+    def _decode_loop(self):
+        """专用的解码线程，退出时释放采集对象"""
+        try:
+            while self.running:
+                start = time.perf_counter()
+                ret, frame = self.cap.read()
+                if not ret:
+                    if self.running and self._on_read_failed():
+                        continue
+                    break
+                if self.stats is not None:
+                    self.stats.record('capture', time.perf_counter() - start)
+                self.decoded_frames += 1
+                self._put((frame, time.time()))
+        finally:
+            self._release_cap()
+            self.finished = True
+
+    def _release_cap(self):
+        if self.cap is not None:
+            try:
+                self.cap.release()
+            except Exception:
+                pass
+            self.cap = None
+
+    def _on_read_failed(self):
+        """读取失败时的处理，返回True表示继续读取"""
+        return False
+
+    def _put(self, item):
+        """按策略将帧放入有界队列"""
+        if self.drop_policy == DROP_OLDEST:
+            while self.running:
+                try:
+                    self.frames.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self.frames.get_nowait()
+                        self.dropped_frames += 1
+                    except queue.Empty:
+                        pass
+        else:
+            while self.running:
+                try:
+                    self.frames.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+    def read(self, timeout=0.01):
+        """取出下一帧，返回 (frame, timestamp) 或 None"""
+        try:
+            return self.frames.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def read_latest(self):
+        """取出队列中最新的一帧并丢弃更旧的帧，返回 (frame, timestamp) 或 None"""
+        item = None
+        while True:
+            try:
+                newer = self.frames.get_nowait()
+            except queue.Empty:
+                return item
+            if item is not None:
+                self.dropped_frames += 1
+            item = newer
+
+    def exhausted(self):
+        """解码结束且队列已取空"""
+        return self.finished and self.frames.empty()
+
+    def request_stop(self):
+        """通知解码线程退出（不等待），多个视频源可先全部通知再逐个等待"""
+        self.running = False
+        self._stop_event.set()
+
+    def stop(self, timeout=1.0):
+        """通知解码线程退出并等待；采集对象由解码线程自己释放，超时未退出时稍后也会释放"""
+        self.request_stop()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            if not self._thread.is_alive():
+                self._thread = None
+
+
+class FileVideoSource(VideoSource):
+    """本地视频文件（mp4/avi等），默认逐帧处理，速度只受推理速度限制"""
+
+    is_live = False
+
+    def __init__(self, path, queue_size=16, drop_policy=None):
+        super().__init__(path, queue_size, drop_policy)
+        self.total_frames = 0
+
+    def _on_opened(self):
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+
+class StreamVideoSource(VideoSource):
+    """RTSP/HTTP网络流，默认丢弃旧帧，断流后自动重连"""
+
+    is_live = True
+
+    def __init__(self, url, queue_size=2, drop_policy=None, reconnect_interval=2.0):
+        super().__init__(url, queue_size, drop_policy)
+        self.reconnect_interval = reconnect_interval
+        self.reconnects = 0
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.uri, getattr(cv2, 'CAP_FFMPEG', 0))
+        try:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        except Exception:
+            pass
+        return cap
+
+    def _on_read_failed(self):
+        """断流重连；等待期间 stop() 可立即唤醒，停止后不再打开新连接"""
+        print(f"[视频流] 读取失败，{self.reconnect_interval}秒后重连: {self.uri}")
+        self._release_cap()
+        while not self._stop_event.wait(self.reconnect_interval):
+            cap = self._open()
+            if cap is not None and cap.isOpened():
+                self.cap = cap
+                self.reconnects += 1
+                return True
+            # 打开失败的句柄同样要释放，否则长时间断流时每次重试都会泄漏
+            if cap is not None:
+                try:
+                    cap.release()
+                except Exception:
+                    pass
+        return False
+
+
+class CameraSource(VideoSource):
+    """本地摄像头，按索引打开，支持多后端回退"""
+
+    is_live = True
+
+    def __init__(self, index, queue_size=1, drop_policy=None, width=1280, height=720):
+        super().__init__(index, queue_size, drop_policy)
+        self.width = width
+        self.height = height
+
+    def _open(self):
+        backends = [getattr(cv2, 'CAP_DSHOW', 700), getattr(cv2, 'CAP_MSMF', 1400), getattr(cv2, 'CAP_ANY', 0)]
+        for backend in backends:
+            try:
+                cap = cv2.VideoCapture(self.uri, backend)
+            except Exception:
+                continue
+            if cap is not None and cap.isOpened():
+                try:
+                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+                    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                except Exception:
+                    pass
+                return cap
+            if cap is not None:
+                cap.release()
+        return None
+
+    def _on_read_failed(self):
+        return not self._stop_event.wait(0.01)
+
+
+def open_video_source(uri, **kwargs):
+    """根据地址创建视频源：网络地址使用流源，其余视为本地文件"""
+    if str(uri).lower().startswith(STREAM_SCHEMES):
+        return StreamVideoSource(uri, **kwargs)
+    return FileVideoSource(uri, **kwargs)
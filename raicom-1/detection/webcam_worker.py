@@ -4,26 +4,38 @@ from PyQt5.QtCore import QThread, pyqtSignal
 from collections import deque
 import numpy as np
 import torch
+from detection.pipeline_stats import PipelineStats
+from detection.session_recorder import SessionRecorder
+from detection.utils import boxes_to_detections
 
 
 class WebcamWorker(QThread):
     frame_ready = pyqtSignal(object)  # 原始帧
     result_ready = pyqtSignal(object)  # 检测结果帧
     detection_complete = pyqtSignal(object)
+    source_finished = pyqtSignal()  # 视频文件处理完毕
+    stats_updated = pyqtSignal(object)  # 分阶段耗时统计快照，约每秒一次
 
-    def __init__(self, model, conf_threshold=0.4):
+    def __init__(self, model, conf_threshold=0.4, source=None, event_saver=None):
         super().__init__()
         self.model = model
         self.conf_threshold = conf_threshold
         self.running = True
+        self.source = source  # VideoSource，为None时使用本地摄像头
+        self.event_saver = event_saver  # CameraEventSaver，为None时不保存历史
+        self.recorder = None  # SessionRecorder，录制中时非None
+        self.stats = PipelineStats()
+        self.stats_interval = 1.0
         
         # 模型参数
         self.target_size = (640, 640)  # YOLO默认输入尺寸
         self.padding_color = (114, 114, 114)  # 标准填充色
         
-        # 摄像头初始化
-        self.cap = self._init_camera()
-        self.frame_buffer = deque(maxlen=1)
+        # 摄像头/视频源初始化
+        self.cap = None
+        self.frame_buffer = deque(maxlen=1)  # (frame, 采集时间戳)
+        self._capture_ts = 0.0
+        self._open_source()
         
         # 检测稳定性
         self.detection_history = deque(maxlen=5)
@@ -32,6 +44,14 @@ class WebcamWorker(QThread):
         # 保持固定输出尺寸
         self.output_size = (640, 640)
 
+    def _open_source(self):
+        """打开输入源：未指定视频源时打开本地摄像头"""
+        if self.source is None:
+            self.cap = self._init_camera()
+        else:
+            self.source.stats = self.stats
+            self.source.start()
+
     def _init_camera(self):
         """摄像头初始化配置，支持多索引与多后端回退"""
         preferred_backends = [getattr(cv2, 'CAP_DSHOW', 700), getattr(cv2, 'CAP_MSMF', 1400), getattr(cv2, 'CAP_ANY', 0)]
@@ -105,54 +125,113 @@ class WebcamWorker(QThread):
         return tensor.permute(2, 0, 1).unsqueeze(0)
 
     def run(self):
-        # 启动独立的采集线程
-        from threading import Thread
-        Thread(target=self._capture_thread, daemon=True).start()
+        if self.source is None:
+            # 启动独立的采集线程
+            from threading import Thread
+            Thread(target=self._capture_thread, daemon=True).start()
         
+        last_stats_time = time.time()
         while self.running:
-            if len(self.frame_buffer) == 0:
-                time.sleep(0.001)
+            item = self._next_frame()
+            if item is None:
+                if self.source is not None and self.source.exhausted():
+                    self.source_finished.emit()
+                    break
                 continue
-                
-            frame = self.frame_buffer.popleft()
-            # 先调整到固定输出尺寸，避免后续处理导致尺寸变化
-            display_frame = cv2.resize(frame.copy(), self.output_size)
+            frame, capture_ts = item
+            self.stats.record('queue', time.time() - capture_ts)
+            self._process_frame(frame, capture_ts)
+            self.stats.tick_frame()
             
-            try:
-                # 1. 预处理
+            if time.time() - last_stats_time >= self.stats_interval:
+                last_stats_time = time.time()
+                self.stats_updated.emit(self.stats.snapshot())
+
+    def _next_frame(self):
+        """取下一帧 (frame, 采集时间戳)：摄像头取缓冲区最新帧，视频源从其解码队列取帧"""
+        if self.source is not None:
+            return self.source.read(timeout=0.01)
+        if len(self.frame_buffer) == 0:
+            time.sleep(0.001)
+            return None
+        return self.frame_buffer.popleft()
+
+    def _process_frame(self, frame, capture_ts=None):
+        """单帧推理与渲染"""
+        start_time = time.time()
+        self._capture_ts = capture_ts or start_time
+        # 先调整到固定输出尺寸，避免后续处理导致尺寸变化
+        display_frame = cv2.resize(frame.copy(), self.output_size)
+        
+        try:
+            # 1. 预处理
+            with self.stats.measure('preprocess'):
                 tensor = self._yolo_preprocess(frame)
+            
+            # 2. 模型推理 - CPU版本
+            with self.stats.measure('inference'), torch.no_grad():
+                results = self.model(tensor, conf=self.conf_threshold)
+            
+            # 发送原始帧到左侧显示区域
+            self.frame_ready.emit(display_frame)
+            
+            # 修正结果处理逻辑
+            if len(results) == 0:
+                # 没有检测结果时，右侧也显示原始帧
+                self._publish(display_frame)
+                return
                 
-                # 2. 模型推理 - CPU版本
-                with torch.no_grad():
-                    results = self.model(tensor, conf=self.conf_threshold)
-                
-                # 发送原始帧到左侧显示区域
-                self.frame_ready.emit(display_frame)
-                
-                # 修正结果处理逻辑
-                if len(results) == 0:
-                    # 没有检测结果时，右侧也显示原始帧
-                    self.result_ready.emit(display_frame)
-                    continue
-                    
+            with self.stats.measure('filter'):
                 filtered = self._filter_results(results)
-                if not filtered:  # 处理空结果
-                    # 没有有效检测结果时，右侧也显示原始帧
-                    self.result_ready.emit(display_frame)
-                    continue
-                    
-                # 在固定尺寸的帧上绘制结果，发送到右侧显示区域
-                annotated = self._render_results(display_frame, filtered[0], frame)
-                self.result_ready.emit(annotated)
-                self.detection_complete.emit(filtered)
+            if not filtered:  # 处理空结果
+                # 没有有效检测结果时，右侧也显示原始帧
+                self._publish(display_frame)
+                return
                 
-            except Exception as e:
-                print(f"[处理错误] {str(e)}")
-                self.frame_ready.emit(display_frame)
-                self.result_ready.emit(display_frame)
+            # 在固定尺寸的帧上绘制结果，发送到右侧显示区域
+            with self.stats.measure('render'):
+                annotated = self._render_results(display_frame, filtered[0], frame)
+            self._publish(annotated, filtered[0], frame)
+            self.detection_complete.emit(filtered)
+            
+            # 新的稳定目标出现时异步保存到历史记录
+            if self.event_saver is not None:
+                self.event_saver.submit(frame, filtered[0], annotated, time.time() - start_time)
+            
+        except Exception as e:
+            print(f"[处理错误] {str(e)}")
+            self.frame_ready.emit(display_frame)
+            self._publish(display_frame)
+
+    def _publish(self, output_frame, result=None, original_frame=None):
+        """发送结果帧，录制中时同时交给录制线程"""
+        self.stats.mark_emitted(self._capture_ts)
+        self.result_ready.emit(output_frame)
+        recorder = self.recorder
+        if recorder is not None:
+            detections = []
+            if result is not None and len(result.boxes) > 0:
+                detections = boxes_to_detections(result.boxes.data.cpu().numpy(), self.model.names,
+                                                 original_frame.shape, self.target_size)
+            recorder.write(output_frame, detections)
+
+    def start_recording(self, video_path, fps=None):
+        """开始录制标注画面，视频源有帧率时沿用其帧率"""
+        self.stop_recording()
+        if fps is None:
+            fps = self.source.fps if self.source is not None and self.source.fps else 20.0
+        self.recorder = SessionRecorder(video_path, fps=fps, frame_size=self.output_size).start()
+        return self.recorder
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.stop()
 
-    def _filter_results(self, results):
-        """增强的稳定性过滤"""
+    def _filter_results(self, results, history=None):
+        """增强的稳定性过滤，history为该路画面的历史检测队列"""
+        if history is None:
+            history = self.detection_history
         if not results or len(results) == 0:
             return []
             
@@ -161,9 +240,9 @@ class WebcamWorker(QThread):
             return []
             
         current = result.boxes.data.cpu().numpy()
-        self.detection_history.append(current)
+        history.append(current)
 
-        if len(self.detection_history) < self.require_frames:
+        if len(history) < self.require_frames:
             return [result]
 
         # 使用更高效的矩阵运算
@@ -171,10 +250,10 @@ class WebcamWorker(QThread):
         for i, det in enumerate(current):
             scores[i] = sum(
                 np.any([self._is_same(det, hist_det) for hist_det in frame_dets])
-                for frame_dets in self.detection_history
+                for frame_dets in history
             )
 
-        mask = scores >= (len(self.detection_history) // 2)
+        mask = scores >= (len(history) // 2)
         result.boxes.data = result.boxes.data[mask]
         return [result] if len(result.boxes) > 0 else []
 
@@ -252,14 +331,21 @@ class WebcamWorker(QThread):
     def _capture_thread(self):
         """专用的采集线程"""
         while self.running:
+            start = time.perf_counter()
             ret, frame = self.cap.read()
             if ret:
-                self.frame_buffer.append(frame)
+                self.stats.record('capture', time.perf_counter() - start)
+                self.frame_buffer.append((frame, time.time()))
             else:
                 time.sleep(0.01)
 
     def stop(self):
         self.running = False
-        if hasattr(self, 'cap') and self.cap.isOpened():
+        if self.source is not None:
+            self.source.stop()
+        if self.cap is not None and self.cap.isOpened():
             self.cap.release()
-        self.wait(500)
\ No newline at end of file
+        self.wait(500)
+        self.stop_recording()
+        if self.event_saver is not None:
+            self.event_saver.stop()
@@ -1,7 +1,9 @@
 from PyQt5.QtWidgets import QApplication
 from PyQt5 import QtCore
 from window.main_window import MainWindow
+from database.db_manager import db_manager
 import sys
+import threading
 
 if __name__ == "__main__":
     try:
@@ -10,6 +12,15 @@ if __name__ == "__main__":
     except Exception:
         pass
 
+    # 数据库结构初始化放到后台执行，数据库不可用时不阻塞界面启动
+    # 初始化完成后按配置启动历史记录定时清理，并在后台迁移旧版本数据
+    def _init_database():
+        if db_manager.bootstrap():
+            db_manager.start_retention_schedule()
+            db_manager.start_legacy_data_migration()
+
+    threading.Thread(target=_init_database, name='db-bootstrap', daemon=True).start()
+
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
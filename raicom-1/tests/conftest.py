@@ -0,0 +1,28 @@
+"""
+测试公共夹具 - 在临时目录中使用 SQLite 后端初始化 DatabaseManager
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """每个用例独立的 SQLite 数据库，归档目录同样放在临时目录"""
+    # database 包导入时会加载 mysql.connector 与 PyQt5（history_manager）
+    pytest.importorskip('mysql.connector')
+    pytest.importorskip('PyQt5')
+    monkeypatch.setenv('RAICOM_DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('RAICOM_SQLITE_PATH', str(tmp_path / 'raicom_history.db'))
+    from database.db_manager import DatabaseManager
+
+    manager = DatabaseManager()
+    manager.config.retention_config['archive_dir'] = str(tmp_path / 'archive')
+    assert manager.bootstrap()
+    yield manager
+    if manager.writer is not None:
+        manager.writer.close()
+    manager.disconnect()
@@ -0,0 +1,261 @@
+"""
+SQLite 后端上的数据库层测试：保存、游标翻页与检索、删除释放图片引用、反馈汇总、清理归档
+"""
+import json
+import threading
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def _save(db, name, classes, source_type='upload', image_data=None, result_image_data=None):
+    results = [{'class': class_name, 'category': category, 'confidence': confidence}
+               for class_name, category, confidence in classes]
+    assert db.save_detection_record(name, results, [c for _, _, c in classes], 0.05,
+                                    source_type=source_type, image_data=image_data,
+                                    result_image_data=result_image_data)
+    return db.get_latest_record_id()
+
+
+def _execute(db, sql, params=()):
+    conn = db._get_connection()
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        cursor.execute(sql, params)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _ref_counts(db):
+    return dict(db._query("SELECT hash, ref_count FROM image_blobs"))
+
+
+def test_save_and_async_save(db):
+    record_id = _save(db, 'a.jpg', [('Can', '可回收物', 0.9)], source_type='camera', image_data=b'raw-a')
+    future = db.save_detection_record_async('b.jpg', [{'class': 'Battery', 'confidence': 0.7}], [0.7],
+                                            0.05, source_type='upload', image_data=b'raw-b')
+    async_id = future.result(timeout=5)
+
+    assert async_id > record_id
+    assert db.get_detection_count() == 2
+    assert db.get_detection_count('camera') == 1
+    assert db.get_image_data(record_id) == b'raw-a'
+    assert db.get_image_data(async_id) == b'raw-b'
+    assert db.get_writer_stats()['written'] == 1
+    objects = db.get_objects(class_name='Battery')
+    assert [obj['record_id'] for obj in objects] == [async_id]
+
+
+def test_keyset_paging_visits_every_record_once(db):
+    ids = [_save(db, f'{i}.jpg', [('Can', '可回收物', 0.5)]) for i in range(7)]
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = db.get_detection_history_page(limit=3, page_cursor=cursor)
+        seen.extend(record['id'] for record in page)
+        if cursor is None:
+            break
+        # 游标可经 URL 往返
+        assert db.decode_page_cursor(db.encode_page_cursor(cursor)) == cursor
+
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_search_filters_and_paging(db):
+    battery = _save(db, 'b1.jpg', [('Battery', '有害垃圾', 0.95), ('Can', '可回收物', 0.4)], source_type='camera')
+    _save(db, 'c1.jpg', [('Can', '可回收物', 0.85)], source_type='camera')
+    weak = _save(db, 'b2.jpg', [('Battery', '有害垃圾', 0.5)], source_type='upload')
+    strong = _save(db, 'b3.jpg', [('Battery', '有害垃圾', 0.9)], source_type='upload')
+
+    records, _ = db.search_detection_history(class_name='Battery')
+    assert [r['id'] for r in records] == [strong, weak, battery]
+    assert db.count_detection_history(class_name='Battery') == 3
+
+    records, _ = db.search_detection_history(class_name='Battery', min_confidence=0.8)
+    assert [r['id'] for r in records] == [strong, battery]
+
+    records, _ = db.search_detection_history(source_type='camera', category='有害垃圾')
+    assert [r['id'] for r in records] == [battery]
+    assert db.count_detection_history(source_type='camera', category='有害垃圾') == 1
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = db.search_detection_history(limit=1, page_cursor=cursor, class_name='Battery')
+        seen.extend(r['id'] for r in page)
+        if cursor is None:
+            break
+    assert seen == [strong, weak, battery]
+
+    future = datetime.now() + timedelta(days=1)
+    assert db.search_detection_history(class_name='Battery', start_time=future) == ([], None)
+
+
+def test_delete_releases_image_references(db):
+    shared, result = b'shared-image', b'result-image'
+    first = _save(db, 'a.jpg', [('Can', '可回收物', 0.9)], image_data=shared, result_image_data=result)
+    second = _save(db, 'b.jpg', [('Can', '可回收物', 0.9)], image_data=shared)
+    shared_hash = db.image_store.hash_bytes(shared)
+    result_hash = db.image_store.hash_bytes(result)
+    assert _ref_counts(db) == {shared_hash: 2, result_hash: 1}
+
+    assert db.delete_detection_record(first)
+    assert _ref_counts(db) == {shared_hash: 1}
+    assert db.get_image_data(second) == shared
+    assert db.get_detection_count() == 1
+    assert [obj['record_id'] for obj in db.get_objects()] == [second]
+
+    assert db.delete_detection_record(second)
+    assert _ref_counts(db) == {}
+    assert db.get_detection_count() == 0
+
+
+def test_feedback_rollups_match_raw_rows(db):
+    feedback = [('瓶子', '可回收物', True, 5), ('易拉罐', '可回收物', False, 4), ('电池', '有害垃圾', True, None),
+                ('果皮', '厨余垃圾', False, 2), ('纸巾', '其他垃圾', True, 5)]
+    for name, category, correct, satisfaction in feedback:
+        assert db.save_feedback(name, category, correct, satisfaction=satisfaction)
+
+    def assert_matches_raw():
+        stats = db.get_feedback_stats()
+        total, correct = db._query("SELECT COUNT(*), COALESCE(SUM(is_correct), 0) FROM detection_feedback")[0]
+        assert stats['total_feedback'] == total
+        assert stats['correct_count'] == correct
+        raw_categories = {row[0]: (row[1], row[2]) for row in db._query("""
+            SELECT predicted_category, COUNT(*), SUM(is_correct) FROM detection_feedback
+            GROUP BY predicted_category""")}
+        assert {c['category']: (c['total'], c['correct']) for c in stats['category_stats']} == raw_categories
+        raw_satisfaction = dict(db._query("""
+            SELECT satisfaction, COUNT(*) FROM detection_feedback
+            WHERE satisfaction IS NOT NULL GROUP BY satisfaction"""))
+        assert {k: v for k, v in stats['satisfaction_distribution'].items() if v} == raw_satisfaction
+        avg = db._query("SELECT AVG(satisfaction) FROM detection_feedback WHERE satisfaction IS NOT NULL")[0][0]
+        assert stats['avg_satisfaction'] == (round(avg, 2) if avg is not None else 0)
+        assert sum(day['total'] for day in stats['daily_trend']) == total
+
+    assert_matches_raw()
+    for item in db.get_feedback_list()[:2]:
+        assert db.delete_feedback(item['id'])
+    assert_matches_raw()
+
+
+def test_purge_archives_and_deletes_old_records(db):
+    old = [_save(db, f'old{i}.jpg', [('Can', '可回收物', 0.9)], image_data=b'old-%d' % (i % 2))
+           for i in range(5)]
+    kept = _save(db, 'new.jpg', [('Can', '可回收物', 0.9)], image_data=b'old-0')
+    placeholders = ', '.join(['%s'] * len(old))
+    old_time = datetime.now() - timedelta(days=40)
+    _execute(db, f"UPDATE detection_history SET detection_time = %s WHERE id IN ({placeholders})", [old_time] + old)
+    _execute(db, f"UPDATE detection_objects SET detection_time = %s WHERE record_id IN ({placeholders})",
+             [old_time] + old)
+
+    result = db.purge_old_records(days=30, archive=True, batch_size=2, pause=0)
+
+    assert result['success'] and not result['stopped']
+    assert result['total'] == result['deleted'] == len(old)
+    assert db.get_detection_count() == 1
+    assert [r['id'] for r in db.get_detection_history_page()[0]] == [kept]
+    assert [obj['record_id'] for obj in db.get_objects()] == [kept]
+    assert _ref_counts(db) == {db.image_store.hash_bytes(b'old-0'): 1}
+
+    with zipfile.ZipFile(result['archive']) as archive:
+        names = archive.namelist()
+        records = [json.loads(line)
+                   for name in names if name.startswith('records/')
+                   for line in archive.read(name).decode('utf-8').splitlines()]
+        assert sorted(record['id'] for record in records) == old
+        images = {name[len('images/'):]: archive.read(name) for name in names if name.startswith('images/')}
+    assert images == {db.image_store.hash_bytes(b'old-%d' % i): b'old-%d' % i for i in range(2)}
+    assert all(record['image_hash'] in images for record in records)
+
+    assert db.purge_old_records(days=30, archive=True)['deleted'] == 0
+
+
+def test_export_honours_search_filters(db):
+    battery = _save(db, 'b1.jpg', [('Battery', '有害垃圾', 0.95), ('Battery', '有害垃圾', 0.9)],
+                    source_type='camera', image_data=b'battery')
+    _save(db, 'c1.jpg', [('Can', '可回收物', 0.85)], source_type='camera')
+    _save(db, 'b2.jpg', [('Battery', '有害垃圾', 0.5)], source_type='upload')
+
+    exported = list(db.iter_detection_export(class_name='Battery', min_confidence=0.8, include_images=True))
+    assert [record['id'] for record in exported] == [battery]
+    assert exported[0]['image_data'] == b'battery'
+    assert len(list(db.iter_detection_export(source_type='camera'))) == 2
+    assert list(db.iter_detection_export(category='有害垃圾', source_type='camera',
+                                         start_time=datetime.now() + timedelta(days=1))) == []
+
+
+def test_legacy_image_columns_dropped_after_migration(db):
+    from database.db_manager import DatabaseManager
+
+    for column in ('image_data', 'result_image_data'):
+        _execute(db, f"ALTER TABLE detection_history ADD COLUMN {column} BLOB")
+    _execute(db, "DELETE FROM schema_migrations WHERE version = 5")
+    _execute(db, """
+        INSERT INTO detection_history (image_path, image_data, detection_results, detection_time, source_type)
+        VALUES (%s, %s, %s, %s, %s)
+    """, ('legacy.jpg', b'legacy-image', '[{"class": "Can", "confidence": 0.9}]', datetime.now(), 'upload'))
+    record_id = db.get_latest_record_id()
+
+    # 仍有行内图片时删除列的迁移推迟，启动不受影响
+    manager = DatabaseManager()
+    assert manager.bootstrap()
+    assert not db._query("SELECT 1 FROM schema_migrations WHERE version = 5")
+
+    assert manager.run_legacy_data_migration()
+    assert db._query("SELECT 1 FROM schema_migrations WHERE version = 5")
+    conn = db._get_connection()
+    cursor = conn.cursor()
+    try:
+        assert not {'image_data', 'result_image_data'} & db.backend.table_columns(cursor, 'detection_history')
+    finally:
+        cursor.close()
+        conn.close()
+    assert db.get_image_data(record_id) == b'legacy-image'
+    assert [obj['record_id'] for obj in db.get_objects()] == [record_id]
+    manager.disconnect()
+
+
+def test_concurrent_bootstrap_on_one_file(tmp_path, monkeypatch):
+    """桌面端与Web后端同时启动：每个进程都应初始化成功，每个迁移版本只执行一次"""
+    pytest.importorskip('mysql.connector')
+    pytest.importorskip('PyQt5')
+    monkeypatch.setenv('RAICOM_DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('RAICOM_SQLITE_PATH', str(tmp_path / 'shared.db'))
+    from database.db_manager import DatabaseManager
+
+    managers = [DatabaseManager() for _ in range(4)]
+    barrier = threading.Barrier(len(managers))
+    results = []
+
+    def bootstrap(manager):
+        barrier.wait()
+        results.append(manager.bootstrap())
+
+    threads = [threading.Thread(target=bootstrap, args=(manager,)) for manager in managers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [True] * len(managers)
+    versions = [row[0] for row in managers[0]._query("SELECT version FROM schema_migrations ORDER BY version")]
+    assert versions == [version for version, _, _ in managers[0].backend.migrations()]
+    assert managers[0].get_quiz_count() == managers[0]._query("SELECT COUNT(*) FROM quiz_questions")[0][0]
+    for manager in managers:
+        manager.disconnect()
+
+
+def test_new_records_after_id_honour_search_filters(db):
+    watermark = _save(db, 'old.jpg', [('Battery', '有害垃圾', 0.9)])
+    battery = _save(db, 'b.jpg', [('Battery', '有害垃圾', 0.9)], source_type='camera')
+    _save(db, 'c.jpg', [('Can', '可回收物', 0.9)], source_type='camera')
+    weak = _save(db, 'w.jpg', [('Battery', '有害垃圾', 0.3)], source_type='upload')
+
+    assert [r['id'] for r in db.get_detection_history_after_id(watermark)] == [battery, battery + 1, weak]
+    assert [r['id'] for r in db.get_detection_history_after_id(watermark, class_name='Battery')] == [battery, weak]
+    assert [r['id'] for r in db.get_detection_history_after_id(
+        watermark, source_type='camera', category='有害垃圾', min_confidence=0.5)] == [battery]
@@ -2,17 +2,20 @@
 垃圾分类科普知识平台 - Flask后端API
 提供垃圾分类查询、知识库、统计等接口
 """
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
 import json
+import math
 import os
 import sys
 import http.client
 import urllib.parse
+from datetime import datetime, timedelta
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from database.db_manager import db_manager
+from database.history_export import EXPORT_FORMATS, iter_export
 from question.question_bank import QuestionBank
 import random
 
@@ -242,6 +245,16 @@ def health_check():
     return jsonify({"status": "ok", "message": "服务运行正常"})
 
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """运行指标（数据库连接池等）"""
+    return jsonify({"success": True, "data": {
+        "db_pool": db_manager.get_pool_stats(),
+        "db_writer": db_manager.get_writer_stats(),
+        "db_queries": db_manager.get_query_stats()
+    }})
+
+
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     """获取所有垃圾分类"""
@@ -606,9 +619,11 @@ def get_stats():
 def get_quiz_questions():
     """获取随机题目"""
     try:
-        limit = request.args.get('limit', 10, type=int)
+        limit = int(request.args.get('limit', 10))
         questions = db_manager.get_quiz_questions(limit=limit)
         return jsonify({"success": True, "data": questions, "count": len(questions)})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e), "data": [], "count": 0}), 400
     except Exception as e:
         print(f"获取题目失败: {e}")
         return jsonify({"success": True, "data": [], "count": 0})
@@ -636,10 +651,9 @@ def submit_feedback():
         if not garbage_name or not predicted_category:
             return jsonify({"success": False, "message": "垃圾名称和预测分类不能为空"}), 400
         
-        # 确保数据库连接
-        if not db_manager.connection or not db_manager.connection.is_connected():
-            if not db_manager.connect():
-                return jsonify({"success": False, "message": "数据库连接失败"}), 500
+        # 确保数据库可用
+        if not db_manager.ensure_ready():
+            return jsonify({"success": False, "message": "数据库连接失败"}), 500
         
         success = db_manager.save_feedback(
             garbage_name=garbage_name,
@@ -665,18 +679,17 @@ def submit_feedback():
 def get_feedback_stats():
     """获取反馈统计数据"""
     try:
-        # 确保数据库连接
-        if not db_manager.connection or not db_manager.connection.is_connected():
-            if not db_manager.connect():
-                return jsonify({"success": True, "data": {
-                    "total_feedback": 0,
-                    "correct_count": 0,
-                    "incorrect_count": 0,
-                    "accuracy_rate": 0,
-                    "avg_satisfaction": 0,
-                    "category_stats": [],
-                    "satisfaction_distribution": {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-                }})
+        # 确保数据库可用
+        if not db_manager.ensure_ready():
+            return jsonify({"success": True, "data": {
+                "total_feedback": 0,
+                "correct_count": 0,
+                "incorrect_count": 0,
+                "accuracy_rate": 0,
+                "avg_satisfaction": 0,
+                "category_stats": [],
+                "satisfaction_distribution": {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+            }})
         stats = db_manager.get_feedback_stats()
         return jsonify({"success": True, "data": stats if stats else {}})
     except Exception as e:
@@ -691,10 +704,9 @@ def get_feedback_list():
         limit = request.args.get('limit', 50, type=int)
         offset = request.args.get('offset', 0, type=int)
         
-        # 确保数据库连接
-        if not db_manager.connection or not db_manager.connection.is_connected():
-            if not db_manager.connect():
-                return jsonify({"success": True, "data": []})
+        # 确保数据库可用
+        if not db_manager.ensure_ready():
+            return jsonify({"success": True, "data": []})
         
         feedback_list = db_manager.get_feedback_list(limit=limit, offset=offset)
         return jsonify({"success": True, "data": feedback_list if feedback_list else []})
@@ -728,23 +740,94 @@ def delete_feedback(feedback_id):
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+@app.route('/api/detection/objects/stats', methods=['GET'])
+def get_detection_object_stats():
+    """按类别或分类统计检测目标，days 为统计最近天数（0 表示全部）"""
+    group_by = request.args.get('group_by', 'class_name')
+    category = request.args.get('category') or None
+    days = request.args.get('days', 7, type=int)
+    if group_by not in ('class_name', 'category'):
+        return jsonify({"success": False, "message": "group_by 只能是 class_name 或 category"}), 400
+    if days is None or days < 0:
+        return jsonify({"success": False, "message": "days 参数无效"}), 400
+    try:
+        if not db_manager.ensure_ready():
+            return jsonify({"success": True, "data": []})
+        start_time = datetime.now() - timedelta(days=days) if days else None
+        stats = db_manager.get_object_stats(group_by=group_by, category=category, start_time=start_time)
+        return jsonify({"success": True, "data": stats})
+    except Exception as e:
+        print(f"获取检测目标统计失败: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+def _history_search_filters():
+    """检索参数：class_name、category、min_confidence、max_confidence、start、end（ISO 日期或时间，end 为日期时包含当天）
+    
+    参数格式无效时抛出 ValueError（消息可直接返回给客户端），不会静默忽略该条件
+    """
+    filters = {
+        'class_name': request.args.get('class_name') or None,
+        'category': request.args.get('category') or None,
+    }
+    for key in ('min_confidence', 'max_confidence'):
+        value = request.args.get(key)
+        if value:
+            try:
+                filters[key] = float(value)
+            except ValueError:
+                raise ValueError(f"{key} 需为数字") from None
+            if not math.isfinite(filters[key]):
+                raise ValueError(f"{key} 需为数字")
+    for name, key in (('start', 'start_time'), ('end', 'end_time')):
+        value = request.args.get(name)
+        if value:
+            try:
+                filters[key] = datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"{name} 需为 YYYY-MM-DD 或 ISO 时间") from None
+            if filters[key].tzinfo is not None:
+                # 记录时间按本地时间存储，带时区的参数先换算为本地时间
+                filters[key] = filters[key].astimezone().replace(tzinfo=None)
+            if key == 'end_time' and len(value) == 10:
+                filters[key] += timedelta(days=1)
+    return {k: v for k, v in filters.items() if v is not None}
+
+
 @app.route('/api/detection/history', methods=['GET'])
 def get_detection_history():
-    """获取检测历史记录"""
+    """获取检测历史记录，可按 class_name、category、置信度区间、时间段检索（检索时只支持游标翻页）"""
     try:
         limit = request.args.get('limit', 20, type=int)
         offset = request.args.get('offset', 0, type=int)
-        
-        # 确保数据库连接
+        source_type = request.args.get('source_type') or None
         try:
-            if not db_manager.connection or not db_manager.connection.is_connected():
-                if not db_manager.connect():
-                    return jsonify({"success": True, "data": []})
-        except Exception:
-            if not db_manager.connect():
-                return jsonify({"success": True, "data": []})
+            page_cursor = db_manager.decode_page_cursor(request.args.get('cursor'))
+        except ValueError:
+            return jsonify({"success": False, "message": "cursor 参数无效"}), 400
+        try:
+            filters = _history_search_filters()
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        if limit <= 0 or limit > 200:
+            return jsonify({"success": False, "message": "limit 需在 1-200 之间"}), 400
+        if filters and offset:
+            return jsonify({"success": False, "message": "检索时只支持 cursor 翻页，不支持 offset"}), 400
+        
+        # 确保数据库可用
+        if not db_manager.ensure_ready():
+            return jsonify({"success": True, "data": []})
         
-        history = db_manager.get_detection_history(limit=limit, offset=offset)
+        # 默认按游标翻页；仍兼容旧的 offset 参数
+        next_cursor = None
+        if filters:
+            history, next_cursor = db_manager.search_detection_history(
+                limit=limit, page_cursor=page_cursor, source_type=source_type, **filters)
+        elif offset and not page_cursor:
+            history = db_manager.get_detection_history(limit=limit, offset=offset, source_type=source_type)
+        else:
+            history, next_cursor = db_manager.get_detection_history_page(
+                limit=limit, page_cursor=page_cursor, source_type=source_type)
         
         # 格式化返回数据
         formatted_history = []
@@ -756,24 +839,93 @@ def get_detection_history():
                 'detection_time': record['detection_time'].strftime('%Y-%m-%d %H:%M:%S') if record['detection_time'] else '',
                 'confidence_scores': record['confidence_scores'],
                 'processing_time': record['processing_time'],
-                'source_type': record['source_type']
+                'source_type': record['source_type'],
+                'thumbnail_url': f"/api/detection/{record['id']}/thumbnail" if record.get('has_thumbnail') else None,
+                'image_url': f"/api/detection/{record['id']}/image"
             })
         
-        return jsonify({"success": True, "data": formatted_history})
+        return jsonify({
+            "success": True,
+            "data": formatted_history,
+            "next_cursor": db_manager.encode_page_cursor(next_cursor)
+        })
     except Exception as e:
         print(f"获取历史记录错误: {str(e)}")
         return jsonify({"success": True, "data": [], "message": f"数据库连接失败: {str(e)}"})
 
 
+def _image_response(image_data):
+    """返回JPEG图片；记录的图片保存后不再变化，允许浏览器缓存"""
+    if not image_data:
+        return jsonify({"success": False, "message": "图片不存在"}), 404
+    response = Response(image_data, mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+
+@app.route('/api/detection/export', methods=['GET'])
+def export_detection_history():
+    """分块流式下载检测历史：format=csv|jsonl|zip（zip 含图片）
+    
+    可按 source_type、days 及与 /api/detection/history 相同的检索参数筛选；同时给出 days 与 start 时取较晚者
+    """
+    fmt = request.args.get('format', 'csv')
+    source_type = request.args.get('source_type') or None
+    days = request.args.get('days', 0, type=int)
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"success": False, "message": "format 只能是 csv、jsonl 或 zip"}), 400
+    if days is None or days < 0:
+        return jsonify({"success": False, "message": "days 参数无效"}), 400
+    try:
+        filters = _history_search_filters()
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    if not db_manager.ensure_ready():
+        return jsonify({"success": False, "message": "数据库不可用"}), 503
+    
+    if days:
+        since = datetime.now() - timedelta(days=days)
+        filters['start_time'] = max(filters.get('start_time', since), since)
+    records = db_manager.iter_detection_export(source_type=source_type, include_images=(fmt == 'zip'),
+                                               **filters)
+    mimetype, suffix = EXPORT_FORMATS[fmt]
+    filename = f"detection_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}"
+    return Response(stream_with_context(iter_export(records, fmt)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+@app.route('/api/detection/<int:record_id>/thumbnail', methods=['GET'])
+def get_detection_thumbnail(record_id):
+    """获取检测记录缩略图（列表默认加载）"""
+    try:
+        return _image_response(db_manager.get_thumbnail_data(record_id))
+    except Exception as e:
+        print(f"获取缩略图错误: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route('/api/detection/<int:record_id>/image', methods=['GET'])
+def get_detection_image(record_id):
+    """获取检测记录原尺寸图片（查看大图或下载时加载），优先检测结果图"""
+    try:
+        image_data = db_manager.get_full_image_data(record_id)
+        return _image_response(image_data)
+    except Exception as e:
+        print(f"获取图片错误: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 if __name__ == '__main__':
     print("=" * 50)
     print("垃圾分类科普知识平台 - 后端API")
     print("=" * 50)
     
-    # 初始化数据库连接
+    # 初始化数据库结构（启动时执行一次）
     print("正在连接数据库...")
-    if db_manager.connect():
+    if db_manager.bootstrap():
         print("数据库连接成功!")
+        db_manager.start_retention_schedule()
+        db_manager.start_legacy_data_migration()
     else:
         print("警告: 数据库连接失败，反馈功能可能不可用")
     
@@ -0,0 +1,187 @@
+"""
+历史记录表格模型 - 按需分块加载的虚拟表格，支持无限滚动
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+from database.history_manager import history_service, HistoryJob, PRIORITY_VIEW
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """检测历史表格模型
+
+    记录按游标分块（block_size 条一块）从数据库加载：视图滚动到底部时通过
+    canFetchMore/fetchMore 由历史记录服务线程追加下一块，重新筛选时取消尚未完成的加载；内存中最多保留 max_blocks 块，
+    最久未访问的块被淘汰，再次滚动到时按该块的起始游标重新加载。
+    自动刷新取到的新记录通过 prepend_records() 插入到顶部，排在各块之前，不重置模型。
+    单元格文本在 data() 中按需格式化，只有可见行才会被格式化。
+    """
+
+    HEADERS = ["ID", "检测时间", "来源", "检测结果", "置信度"]
+    SOURCE_LABELS = {'upload': "图片上传", 'camera': "摄像头", 'manual_save': "手动保存"}
+
+    total_changed = pyqtSignal(int)     # 符合筛选条件的记录总数
+    loading_changed = pyqtSignal(bool)  # 是否正在加载
+
+    def __init__(self, block_size: int = 50, max_blocks: int = 40, parent=None):
+        super().__init__(parent)
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.source_type = None
+        self.filters = {}  # 检索条件（见 DatabaseManager.SEARCH_FILTERS）
+        self._jobs = {}  # 块序号 -> 加载任务
+        self._clear()
+
+    def _clear(self):
+        for job in self._jobs.values():
+            job.cancel()
+        self._jobs = {}
+        self._generation = getattr(self, '_generation', 0) + 1  # 筛选条件变化后丢弃旧请求的结果
+        self._head = []               # 自动刷新插入到顶部的新记录（新的在前），排在各块之前
+        self._blocks = OrderedDict()  # 块序号 -> 记录列表（按访问顺序，用于LRU淘汰）
+        self._cursors = [None]        # 第k块的起始游标
+        self._row_count = 0
+        self._appended = 0            # 已追加的块数
+        self._has_more = True
+        self._pending = set()         # 正在加载的块序号
+
+    def reset(self, source_type: str = None, block_size: int = None, filters: Dict = None):
+        """按新的筛选条件从头加载"""
+        self.beginResetModel()
+        self.source_type = source_type
+        self.filters = {k: v for k, v in (filters or {}).items() if v is not None}
+        if block_size:
+            self.block_size = block_size
+        self._clear()
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    # ========== 分块加载 ==========
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more and self._appended not in self._pending
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self._load_block(self._appended)
+
+    def _load_block(self, block: int):
+        if block in self._pending:
+            return
+        self._pending.add(block)
+        self.loading_changed.emit(True)
+        generation = self._generation
+        job = HistoryJob('load_page', PRIORITY_VIEW, key=(id(self), block),
+                         limit=self.block_size, page_cursor=self._cursors[block], source_type=self.source_type,
+                         **self.filters)
+        job.page_loaded.connect(
+            lambda records, next_cursor, total: self._on_block_loaded(generation, block, records, next_cursor, total))
+        job.finished.connect(lambda: self._on_job_finished(generation, block, job))
+        self._jobs[block] = job
+        history_service.submit(job)
+    
+    def _on_job_finished(self, generation, block, job):
+        if self._jobs.get(block) is job:
+            del self._jobs[block]
+        # 加载失败时没有结果，解除等待状态，之后滚动到这里会重试
+        if generation == self._generation and block in self._pending:
+            self._pending.discard(block)
+            self.loading_changed.emit(bool(self._pending))
+
+    def _on_block_loaded(self, generation, block, records, next_cursor, total):
+        if generation != self._generation:
+            return
+        self._pending.discard(block)
+        self.loading_changed.emit(bool(self._pending))
+        if total >= 0:
+            self.total_changed.emit(total)
+        first = len(self._head) + block * self.block_size
+        if block == self._appended:
+            # 追加新块
+            if records:
+                self.beginInsertRows(QModelIndex(), self._row_count, self._row_count + len(records) - 1)
+                self._store_block(block, records)
+                self._row_count += len(records)
+                self._appended += 1
+                self.endInsertRows()
+            if next_cursor is not None and len(records) == self.block_size:
+                self._cursors.append(next_cursor)
+            else:
+                self._has_more = False
+        else:
+            # 重新加载被淘汰的块
+            self._store_block(block, records)
+            last = min(first + self.block_size, self._row_count) - 1
+            self.dataChanged.emit(self.index(first, 0), self.index(last, self.columnCount() - 1))
+
+    def _store_block(self, block, records):
+        self._blocks[block] = records
+        self._blocks.move_to_end(block)
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+    def prepend_records(self, records):
+        """把新记录（新的在前）插入到表格顶部，不重置模型，视图的选中项随行移动"""
+        if not records:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(records) - 1)
+        self._head[:0] = records
+        self._row_count += len(records)
+        self.endInsertRows()
+    
+    def record(self, row: int) -> Optional[Dict]:
+        """第 row 行的记录；所在块已被淘汰时触发后台重新加载并返回None"""
+        if not 0 <= row < self._row_count:
+            return None
+        if row < len(self._head):
+            return self._head[row]
+        block, offset = divmod(row - len(self._head), self.block_size)
+        records = self._blocks.get(block)
+        if records is None:
+            self._load_block(block)
+            return None
+        self._blocks.move_to_end(block)
+        return records[offset] if offset < len(records) else None
+
+    def loaded_rows(self) -> int:
+        return self._row_count
+
+    # ========== 表格接口 ==========
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        record = self.record(index.row())
+        if record is None:
+            return "…"
+        return self._format(record, index.column())
+
+    def _format(self, record: Dict, column: int) -> str:
+        if column == 0:
+            return str(record['id'])
+        if column == 1:
+            return record['detection_time'].strftime('%Y-%m-%d %H:%M:%S')
+        if column == 2:
+            return self.SOURCE_LABELS.get(record['source_type'], record['source_type'])
+        if column == 3:
+            results = record['detection_results']
+            if not results:
+                return "无结果"
+            if len(results) == 1:
+                return f"{results[0].get('class', '未知')}"
+            return f"{len(results)}个目标"
+        confidences = record['confidence_scores']
+        return f"{sum(confidences) / len(confidences):.2f}" if confidences else "N/A"
@@ -3,39 +3,65 @@
 """
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, 
-    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox,
-    QFrame, QScrollArea, QComboBox, QSpinBox,
+    QTableView, QAbstractItemView, QHeaderView, QMessageBox,
+    QFrame, QScrollArea, QComboBox, QSpinBox, QDoubleSpinBox, QDateEdit,
     QProgressBar, QTextEdit, QFileDialog, QCheckBox,
-    QGraphicsDropShadowEffect
+    QGraphicsDropShadowEffect, QDialog, QApplication
 )
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, QDate
 from PyQt5.QtGui import QPixmap, QColor
-from database.history_manager import history_manager, HistoryWorker
+from database.history_manager import (history_manager, history_service, history_bulk_service,
+                                      HistoryJob, HistoryImageLoader, PRIORITY_VIEW, PRIORITY_BACKGROUND)
+from database.db_manager import db_manager
+from database.query_stats import QueryProfiler
+from window.history_model import HistoryTableModel
+from detection.utils import get_garbage_info
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from window.styles import COLORS, GRADIENTS
 
 
 class HistoryWindow(QWidget):
     """历史记录查看窗口"""
     
+    # 检索用的目标类别与垃圾分类
+    SEARCH_CLASSES = ["Plastic Bottle", "Battery", "Plastic Bag", "Glass", "Can", "Wet Garbage", "Broken Glass", "Box"]
+    SEARCH_CATEGORIES = ["可回收物", "有害垃圾", "厨余垃圾", "其他垃圾"]
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("检测历史记录")
         self.setMinimumSize(600, 400)
         
-        self.current_history = []
-        self.current_page = 0
-        self.page_size = 20
+        self.page_size = 50  # 每次滚动到底部追加加载的条数
         self.total_records = 0
         self.last_update_time = None
-        self.auto_refresh_enabled = False
+        self.auto_refresh_enabled = True
+        self.refresh_interval = 5  # 自动刷新间隔（秒）
         self.refresh_timer = QTimer()
         self.refresh_timer.timeout.connect(self.check_for_updates)
-        self.history_worker = None
+        self.history_job = None
+        self.export_job = None
+        self.clear_job = None
+        self.poll_job = None
+        self.image_job = None
+        self.poll_generation = 0
+        self.loading = False
+        self.latest_id = None  # 已显示的最新记录ID，自动刷新只取更新的记录
+        
+        # 预览图在后台线程读取与解码，只显示最新选择的结果
+        self.preview_request = None
+        self.image_loader = HistoryImageLoader(self)
+        self.image_loader.image_loaded.connect(self.on_preview_loaded)
+        if QApplication.instance() is not None:
+            QApplication.instance().aboutToQuit.connect(self.image_loader.stop)
+            QApplication.instance().aboutToQuit.connect(history_service.stop)
+            QApplication.instance().aboutToQuit.connect(history_bulk_service.stop)
         
         self.init_ui()
         self.load_history()
+        if self.auto_refresh_enabled:
+            self.refresh_timer.start(self.refresh_interval * 1000)
     
     def init_ui(self):
         """初始化界面"""
@@ -49,6 +75,9 @@ class HistoryWindow(QWidget):
         # 控制面板
         self._create_control_panel(main_layout)
         
+        # 检索条件
+        self._create_search_panel(main_layout)
+        
         # 内容区：左侧表格 + 右侧详情（固定比例）
         content_layout = QHBoxLayout()
         content_layout.setSpacing(15)
@@ -133,15 +162,29 @@ class HistoryWindow(QWidget):
         self.source_filter.currentTextChanged.connect(self.on_filter_changed)
         layout.addWidget(self.source_filter)
         
-        # 每页
-        layout.addWidget(QLabel("每页:"))
+        # 每批加载条数
+        layout.addWidget(QLabel("每批:"))
         self.page_size_spin = QSpinBox()
-        self.page_size_spin.setRange(10, 100)
-        self.page_size_spin.setValue(20)
+        self.page_size_spin.setRange(20, 500)
+        self.page_size_spin.setSingleStep(10)
+        self.page_size_spin.setValue(self.page_size)
         self.page_size_spin.setFixedWidth(70)
         self.page_size_spin.valueChanged.connect(self.on_page_size_changed)
         layout.addWidget(self.page_size_spin)
         
+        # 自动刷新
+        self.auto_refresh_check = QCheckBox("自动刷新")
+        self.auto_refresh_check.setChecked(self.auto_refresh_enabled)
+        self.auto_refresh_check.stateChanged.connect(self.toggle_auto_refresh)
+        layout.addWidget(self.auto_refresh_check)
+        self.refresh_interval_spin = QSpinBox()
+        self.refresh_interval_spin.setRange(2, 300)
+        self.refresh_interval_spin.setSuffix(" 秒")
+        self.refresh_interval_spin.setValue(self.refresh_interval)
+        self.refresh_interval_spin.setFixedWidth(80)
+        self.refresh_interval_spin.valueChanged.connect(self.update_refresh_interval)
+        layout.addWidget(self.refresh_interval_spin)
+        
         layout.addStretch()
         
         # 刷新按钮
@@ -152,6 +195,14 @@ class HistoryWindow(QWidget):
         self._style_button(self.refresh_btn, 'primary')
         layout.addWidget(self.refresh_btn)
         
+        # 导出按钮
+        self.export_all_btn = QPushButton("导出记录")
+        self.export_all_btn.setFixedSize(90, 35)
+        self.export_all_btn.clicked.connect(self.export_history)
+        self.export_all_btn.setCursor(Qt.PointingHandCursor)
+        self._style_button(self.export_all_btn, 'success')
+        layout.addWidget(self.export_all_btn)
+        
         # 清理按钮
         self.clear_btn = QPushButton("清理旧记录")
         self.clear_btn.setFixedSize(100, 35)
@@ -162,6 +213,82 @@ class HistoryWindow(QWidget):
         
         parent_layout.addWidget(panel)
     
+    def _create_search_panel(self, parent_layout):
+        """创建检索面板：目标类别、垃圾分类、置信度区间、日期范围"""
+        panel = QFrame()
+        panel.setFixedHeight(50)
+        panel.setStyleSheet(f"""
+            QFrame {{
+                background: white;
+                border: 1px solid {COLORS['border']};
+                border-radius: 10px;
+            }}
+        """)
+        
+        layout = QHBoxLayout(panel)
+        layout.setContentsMargins(15, 8, 15, 8)
+        layout.setSpacing(8)
+        
+        layout.addWidget(QLabel("类别:"))
+        self.class_filter = QComboBox()
+        self.class_filter.addItem("全部", None)
+        for class_name in self.SEARCH_CLASSES:
+            self.class_filter.addItem(get_garbage_info(class_name)['名称'], class_name)
+        self.class_filter.setFixedWidth(100)
+        layout.addWidget(self.class_filter)
+        
+        layout.addWidget(QLabel("分类:"))
+        self.category_filter = QComboBox()
+        self.category_filter.addItem("全部", None)
+        for category in self.SEARCH_CATEGORIES:
+            self.category_filter.addItem(category, category)
+        self.category_filter.setFixedWidth(100)
+        layout.addWidget(self.category_filter)
+        
+        layout.addWidget(QLabel("置信度:"))
+        self.min_confidence_spin = QDoubleSpinBox()
+        self.max_confidence_spin = QDoubleSpinBox()
+        for spin, value in ((self.min_confidence_spin, 0.0), (self.max_confidence_spin, 1.0)):
+            spin.setRange(0.0, 1.0)
+            spin.setSingleStep(0.05)
+            spin.setDecimals(2)
+            spin.setValue(value)
+            spin.setFixedWidth(70)
+        layout.addWidget(self.min_confidence_spin)
+        layout.addWidget(QLabel("-"))
+        layout.addWidget(self.max_confidence_spin)
+        
+        self.date_filter_check = QCheckBox("日期:")
+        layout.addWidget(self.date_filter_check)
+        self.start_date_edit = QDateEdit(QDate.currentDate().addDays(-7))
+        self.end_date_edit = QDateEdit(QDate.currentDate())
+        for edit in (self.start_date_edit, self.end_date_edit):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+            edit.setEnabled(False)
+            self.date_filter_check.toggled.connect(edit.setEnabled)
+        layout.addWidget(self.start_date_edit)
+        layout.addWidget(QLabel("至"))
+        layout.addWidget(self.end_date_edit)
+        
+        layout.addStretch()
+        
+        self.search_btn = QPushButton("搜索")
+        self.search_btn.setFixedSize(70, 35)
+        self.search_btn.clicked.connect(self.load_history)
+        self.search_btn.setCursor(Qt.PointingHandCursor)
+        self._style_button(self.search_btn, 'primary')
+        layout.addWidget(self.search_btn)
+        
+        self.reset_search_btn = QPushButton("重置")
+        self.reset_search_btn.setFixedSize(70, 35)
+        self.reset_search_btn.clicked.connect(self.reset_search)
+        self.reset_search_btn.setCursor(Qt.PointingHandCursor)
+        self._style_button(self.reset_search_btn, 'primary')
+        layout.addWidget(self.reset_search_btn)
+        
+        parent_layout.addWidget(panel)
+    
     def _create_table(self, parent_layout):
         """创建表格"""
         # 表格标题
@@ -174,13 +301,19 @@ class HistoryWindow(QWidget):
         """)
         parent_layout.addWidget(title)
         
-        # 表格
-        self.history_table = QTableWidget()
-        self.history_table.setColumnCount(5)
-        self.history_table.setHorizontalHeaderLabels(["ID", "检测时间", "来源", "检测结果", "置信度"])
+        # 表格：虚拟模型，滚动到底部时自动加载下一批
+        self.history_model = HistoryTableModel(block_size=self.page_size, parent=self)
+        self.history_model.total_changed.connect(self.on_total_changed)
+        self.history_model.loading_changed.connect(self.on_loading_changed)
+        self.history_model.rowsInserted.connect(self.on_rows_loaded)
+        self.history_table = QTableView()
+        self.history_table.setModel(self.history_model)
         self.history_table.setAlternatingRowColors(True)
-        self.history_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.history_table.setSelectionMode(QTableWidget.SingleSelection)
+        self.history_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.history_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        # 固定行高：视图不必逐行计算高度
+        self.history_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.history_table.verticalHeader().setDefaultSectionSize(28)
         self.history_table.horizontalHeader().setStretchLastSection(True)
         self.history_table.setColumnWidth(0, 50)
         self.history_table.setColumnWidth(1, 150)
@@ -188,9 +321,9 @@ class HistoryWindow(QWidget):
         self.history_table.setColumnWidth(3, 180)
         self.history_table.verticalHeader().setVisible(False)
         self.history_table.setShowGrid(False)
-        self.history_table.selectionModel().selectionChanged.connect(self.on_record_selected)
+        self.history_table.selectionModel().currentRowChanged.connect(self.on_record_selected)
         self.history_table.setStyleSheet(f"""
-            QTableWidget {{
+            QTableView {{
                 background: white;
                 border: 1px solid {COLORS['border']};
                 border-radius: 8px;
@@ -199,27 +332,13 @@ class HistoryWindow(QWidget):
         parent_layout.addWidget(self.history_table, 1)
     
     def _create_pagination(self, parent_layout):
-        """创建分页"""
+        """创建加载进度与操作栏"""
         layout = QHBoxLayout()
         layout.setSpacing(10)
         
-        self.prev_btn = QPushButton("上一页")
-        self.prev_btn.setFixedSize(80, 32)
-        self.prev_btn.clicked.connect(self.prev_page)
-        self._style_button(self.prev_btn, 'primary')
-        layout.addWidget(self.prev_btn)
-        
-        self.page_info_label = QLabel("第 1 页")
-        self.page_info_label.setAlignment(Qt.AlignCenter)
-        self.page_info_label.setFixedWidth(100)
+        self.page_info_label = QLabel("已加载 0 条")
         layout.addWidget(self.page_info_label)
         
-        self.next_btn = QPushButton("下一页")
-        self.next_btn.setFixedSize(80, 32)
-        self.next_btn.clicked.connect(self.next_page)
-        self._style_button(self.next_btn, 'primary')
-        layout.addWidget(self.next_btn)
-        
         layout.addStretch()
         
         self.delete_btn = QPushButton("删除选中")
@@ -288,13 +407,22 @@ class HistoryWindow(QWidget):
         """)
         card_layout.addWidget(self.detail_text)
         
-        # 导出按钮
+        # 查看原图 / 导出按钮（列表只加载缩略图，原图按需读取）
+        button_layout = QHBoxLayout()
+        self.zoom_btn = QPushButton("查看原图")
+        self.zoom_btn.setFixedHeight(36)
+        self.zoom_btn.clicked.connect(self.show_full_image)
+        self.zoom_btn.setEnabled(False)
+        self._style_button(self.zoom_btn, 'success')
+        button_layout.addWidget(self.zoom_btn)
+        
         self.export_btn = QPushButton("导出图片")
         self.export_btn.setFixedHeight(36)
         self.export_btn.clicked.connect(self.export_image)
         self.export_btn.setEnabled(False)
         self._style_button(self.export_btn, 'primary')
-        card_layout.addWidget(self.export_btn)
+        button_layout.addWidget(self.export_btn)
+        card_layout.addLayout(button_layout)
         
         parent_layout.addWidget(detail_card, 1)
     
@@ -315,6 +443,14 @@ class HistoryWindow(QWidget):
         
         layout.addStretch()
         
+        # 数据库诊断
+        self.diagnostics_btn = QPushButton("数据库诊断")
+        self.diagnostics_btn.setFixedSize(90, 26)
+        self.diagnostics_btn.setCursor(Qt.PointingHandCursor)
+        self.diagnostics_btn.clicked.connect(self.show_db_diagnostics)
+        self._style_button(self.diagnostics_btn, 'primary')
+        layout.addWidget(self.diagnostics_btn)
+        
         self.progress_bar = QProgressBar()
         self.progress_bar.setFixedSize(120, 8)
         self.progress_bar.setVisible(False)
@@ -366,22 +502,22 @@ class HistoryWindow(QWidget):
                 background: {COLORS['bg_light']};
                 font-family: 'Microsoft YaHei', 'Segoe UI', Arial;
             }}
-            QTableWidget {{
+            QTableView {{
                 background: white;
                 alternate-background-color: #f8f9fa;
                 gridline-color: {COLORS['border']};
                 border: 1px solid {COLORS['border']};
                 border-radius: 8px;
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 8px;
                 border-bottom: 1px solid #f0f0f0;
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background: rgba(102, 126, 234, 0.15);
                 color: {COLORS['primary']};
             }}
-            QTableWidget::item:hover {{
+            QTableView::item:hover {{
                 background: rgba(102, 126, 234, 0.08);
             }}
             QHeaderView::section {{
@@ -393,14 +529,14 @@ class HistoryWindow(QWidget):
                 font-size: 13px;
                 color: {COLORS['text_dark']};
             }}
-            QComboBox, QSpinBox {{
+            QComboBox, QSpinBox, QDoubleSpinBox, QDateEdit {{
                 padding: 8px 12px;
                 border: 1px solid {COLORS['border']};
                 border-radius: 6px;
                 background: white;
                 font-size: 13px;
             }}
-            QComboBox:hover, QSpinBox:hover {{
+            QComboBox:hover, QSpinBox:hover, QDoubleSpinBox:hover, QDateEdit:hover {{
                 border-color: {COLORS['primary']};
             }}
         """)
@@ -408,101 +544,85 @@ class HistoryWindow(QWidget):
     # ========== 数据操作方法 ==========
     
     def load_history(self):
-        """加载历史记录"""
-        self.show_progress()
-        source_filter = self.source_filter.currentText()
-        source_type = None
-        if source_filter == "图片上传":
-            source_type = "upload"
-        elif source_filter == "摄像头检测":
-            source_type = "camera"
-        
-        self.history_worker = HistoryWorker(
-            'load_history',
-            limit=self.page_size,
-            offset=self.current_page * self.page_size,
-            source_type=source_type
-        )
-        self.history_worker.history_loaded.connect(self.on_history_loaded)
-        self.history_worker.start()
-    
-    def on_history_loaded(self, history):
-        """历史记录加载完成"""
-        self.current_history = history
-        self.update_table()
+        """按当前筛选条件从头加载历史记录"""
+        self.image_loader.cancel()
+        self.poll_generation += 1  # 丢弃按旧筛选条件发起的增量刷新结果
+        if self.poll_job is not None:
+            self.poll_job.cancel()
+        self.latest_id = None
+        self.history_model.reset(self._current_source_type(), self.page_size, self._current_filters())
+        self.on_record_selected()
+    
+    def on_loading_changed(self, loading):
+        self.loading = loading
+        if loading:
+            self.show_progress()
+        else:
+            self.hide_progress()
+    
+    def on_total_changed(self, total):
+        self.total_records = total
         self.update_pagination()
         self.update_stats()
-        self.hide_progress()
-        if history:
-            self.last_update_time = history[0]['detection_time']
-    
-    def update_table(self):
-        """更新表格"""
-        self.history_table.setRowCount(len(self.current_history))
-        for row, record in enumerate(self.current_history):
-            self.history_table.setItem(row, 0, QTableWidgetItem(str(record['id'])))
-            time_str = record['detection_time'].strftime('%Y-%m-%d %H:%M:%S')
-            self.history_table.setItem(row, 1, QTableWidgetItem(time_str))
-            source_text = "图片上传" if record['source_type'] == 'upload' else "摄像头"
-            self.history_table.setItem(row, 2, QTableWidgetItem(source_text))
-            
-            results = record['detection_results']
-            if results:
-                if len(results) == 1:
-                    result_text = f"{results[0].get('class', '未知')}"
-                else:
-                    result_text = f"{len(results)}个目标"
-            else:
-                result_text = "无结果"
-            self.history_table.setItem(row, 3, QTableWidgetItem(result_text))
-            
-            confidences = record['confidence_scores']
-            conf_text = f"{sum(confidences)/len(confidences):.2f}" if confidences else "N/A"
-            self.history_table.setItem(row, 4, QTableWidgetItem(conf_text))
+    
+    def on_rows_loaded(self, parent, first, last):
+        """新一批记录加载完成"""
+        self.update_pagination()
+        if first == 0:
+            record = self.history_model.record(0)
+            if record:
+                self.last_update_time = record['detection_time']
+            # 自动刷新插入到顶部的新记录不重新预读，以免替换当前选中项的相邻预读列表
+            if self.latest_id is None:
+                if last >= 0:
+                    ids = [r['id'] for r in map(self.history_model.record, range(first, last + 1)) if r]
+                    self.latest_id = max(ids) if ids else None
+                ids = []
+                for row in range(min(last + 1, self.PREFETCH_RADIUS + 1)):
+                    record = self.history_model.record(row)
+                    if record:
+                        ids.append(record['id'])
+                self.image_loader.prefetch(ids)
     
     def update_pagination(self):
-        """更新分页"""
-        total_pages = max(1, (self.total_records + self.page_size - 1) // self.page_size)
-        self.page_info_label.setText(f"第 {self.current_page + 1}/{total_pages} 页")
-        self.prev_btn.setEnabled(self.current_page > 0)
-        self.next_btn.setEnabled(self.current_page + 1 < total_pages)
+        """更新加载进度"""
+        self.page_info_label.setText(f"已加载 {self.history_model.loaded_rows()} / {self.total_records} 条")
+    
+    def _selected_record(self):
+        index = self.history_table.currentIndex()
+        return self.history_model.record(index.row()) if index.isValid() else None
     
     def update_stats(self):
         """更新统计"""
-        source_filter = self.source_filter.currentText()
-        source_type = None
-        if source_filter == "图片上传":
-            source_type = "upload"
-        elif source_filter == "摄像头检测":
-            source_type = "camera"
-        self.total_records = history_manager.get_detection_count(source_type)
         self.stats_label.setText(f"总记录数: {self.total_records}")
+        cache = history_manager.get_image_cache_stats()
+        self.stats_label.setToolTip(
+            f"图片缓存: {cache['entries']} 张, {cache['bytes'] / 1024 / 1024:.1f}MB, "
+            f"命中率 {cache['hit_rate'] * 100:.1f}%")
     
-    def on_record_selected(self):
+    def on_record_selected(self, *args):
         """记录选择"""
-        row = self.history_table.currentRow()
-        if 0 <= row < len(self.current_history):
-            self.show_record_detail(self.current_history[row])
+        record = self._selected_record()
+        if record:
+            self.show_record_detail(record)
             self.delete_btn.setEnabled(True)
+            self.zoom_btn.setEnabled(True)
             self.export_btn.setEnabled(True)
         else:
             self.delete_btn.setEnabled(False)
+            self.zoom_btn.setEnabled(False)
             self.export_btn.setEnabled(False)
+            self.image_label.setText("选择左侧记录查看")
+            self.detail_text.clear()
+    
+    # 选中记录前后各预读几条记录的预览图
+    PREFETCH_RADIUS = 2
     
     def show_record_detail(self, record):
-        """显示详情"""
-        # 优先显示检测结果图片
-        image_data = history_manager.get_result_image_data(record['id'])
-        if not image_data:
-            image_data = history_manager.get_image_data(record['id'])
-        
-        if image_data:
-            pixmap = QPixmap()
-            pixmap.loadFromData(image_data)
-            scaled = pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.image_label.setPixmap(scaled)
-        else:
-            self.image_label.setText("图片不可用")
+        """显示详情（预览图在后台加载，完成后由 on_preview_loaded 显示）"""
+        self.image_label.setText("加载中...")
+        self.preview_request = self.image_loader.request(record['id'], self.image_label.size())
+        self.prefetch_neighbours(self.history_table.currentIndex().row())
         
         # 构建详细信息
         detail_lines = []
@@ -524,40 +644,49 @@ class HistoryWindow(QWidget):
         
         self.detail_text.setText("\n".join(detail_lines))
     
-    # ========== 事件处理 ==========
+    def prefetch_neighbours(self, row):
+        """按距离由近到远预读相邻记录的预览图"""
+        ids = []
+        for distance in range(1, self.PREFETCH_RADIUS + 1):
+            for neighbour in (row + distance, row - distance):
+                record = self.history_model.record(neighbour)
+                if record:
+                    ids.append(record['id'])
+        self.image_loader.prefetch(ids)
+    
+    def on_preview_loaded(self, request_id, record_id, image):
+        if request_id != self.preview_request:
+            return
+        if image.isNull():
+            self.image_label.setText("图片不可用")
+        else:
+            self.image_label.setPixmap(QPixmap.fromImage(image))
     
-    def prev_page(self):
-        if self.current_page > 0:
-            self.current_page -= 1
-            self.load_history()
+    def closeEvent(self, event):
+        self.refresh_timer.stop()
+        self.image_loader.stop()
+        super().closeEvent(event)
     
-    def next_page(self):
-        total_pages = max(1, (self.total_records + self.page_size - 1) // self.page_size)
-        if self.current_page + 1 < total_pages:
-            self.current_page += 1
-            self.load_history()
+    # ========== 事件处理 ==========
     
     def on_filter_changed(self):
-        self.current_page = 0
         self.load_history()
     
     def on_page_size_changed(self):
         self.page_size = self.page_size_spin.value()
-        self.current_page = 0
         self.load_history()
     
     def manual_refresh(self):
         self.load_history()
     
     def delete_selected_record(self):
-        row = self.history_table.currentRow()
-        if 0 <= row < len(self.current_history):
-            record = self.current_history[row]
+        record = self._selected_record()
+        if record:
             reply = QMessageBox.question(self, "确认删除", f"确定删除记录 {record['id']}？")
             if reply == QMessageBox.Yes:
-                self.history_worker = HistoryWorker('delete_record', record_id=record['id'])
-                self.history_worker.operation_completed.connect(self.on_delete_completed)
-                self.history_worker.start()
+                self.history_job = HistoryJob('delete_record', record_id=record['id'])
+                self.history_job.operation_completed.connect(self.on_delete_completed)
+                history_service.submit(self.history_job)
     
     def on_delete_completed(self, success, message):
         self.hide_progress()
@@ -567,46 +696,204 @@ class HistoryWindow(QWidget):
         else:
             QMessageBox.warning(self, "失败", message)
     
+    def _load_full_image(self, record_id, on_loaded):
+        """在历史服务线程读取原尺寸图片，读完在界面线程回调 on_loaded(记录ID, 图片数据)
+        
+        同一窗口只保留最近一次请求，连续点击时旧请求不再回调。
+        """
+        self.image_job = HistoryJob('load_full_image', PRIORITY_VIEW, key=('load_full_image', id(self)),
+                                    record_id=record_id)
+        self.image_job.image_data_loaded.connect(on_loaded)
+        history_service.submit(self.image_job)
+    
+    def show_full_image(self):
+        """弹窗查看原尺寸图片"""
+        record = self._selected_record()
+        if record:
+            self._load_full_image(record['id'], self.on_full_image_loaded)
+    
+    def on_full_image_loaded(self, record_id, image_data):
+        if not image_data:
+            QMessageBox.warning(self, "失败", "图片数据不可用")
+            return
+        
+        pixmap = QPixmap()
+        pixmap.loadFromData(image_data)
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"记录 {record_id} - 原图")
+        dialog.resize(min(pixmap.width() + 40, 1200), min(pixmap.height() + 40, 900))
+        layout = QVBoxLayout(dialog)
+        scroll = QScrollArea()
+        scroll.setAlignment(Qt.AlignCenter)
+        image_label = QLabel()
+        image_label.setPixmap(pixmap)
+        scroll.setWidget(image_label)
+        layout.addWidget(scroll)
+        dialog.exec_()
+    
     def export_image(self):
-        row = self.history_table.currentRow()
-        if 0 <= row < len(self.current_history):
-            record = self.current_history[row]
+        record = self._selected_record()
+        if record:
             filename = f"detection_{record['id']}.jpg"
             file_path, _ = QFileDialog.getSaveFileName(self, "导出图片", filename, "图片 (*.jpg *.png)")
             if file_path:
-                # 优先导出检测结果图片
-                image_data = history_manager.get_result_image_data(record['id'])
-                if not image_data:
-                    image_data = history_manager.get_image_data(record['id'])
-                
-                if image_data:
-                    with open(file_path, 'wb') as f:
-                        f.write(image_data)
-                    QMessageBox.information(self, "成功", f"已保存到: {file_path}")
-                else:
-                    QMessageBox.warning(self, "失败", "图片数据不可用")
+                # 导出原尺寸图片，优先检测结果图片
+                self._load_full_image(record['id'],
+                                      lambda record_id, image_data: self.on_export_image_loaded(file_path, image_data))
+    
+    def on_export_image_loaded(self, file_path, image_data):
+        if not image_data:
+            QMessageBox.warning(self, "失败", "图片数据不可用")
+            return
+        try:
+            with open(file_path, 'wb') as f:
+                f.write(image_data)
+        except OSError as e:
+            QMessageBox.warning(self, "失败", f"保存图片失败: {e}")
+            return
+        QMessageBox.information(self, "成功", f"已保存到: {file_path}")
+    
+    def _current_filters(self):
+        """检索面板的条件，未设置的条件不加入"""
+        filters = {
+            'class_name': self.class_filter.currentData(),
+            'category': self.category_filter.currentData(),
+        }
+        if self.min_confidence_spin.value() > 0:
+            filters['min_confidence'] = self.min_confidence_spin.value()
+        if self.max_confidence_spin.value() < 1:
+            filters['max_confidence'] = self.max_confidence_spin.value()
+        if self.date_filter_check.isChecked():
+            start = self.start_date_edit.date().toPyDate()
+            end = self.end_date_edit.date().toPyDate()
+            filters['start_time'] = datetime.combine(start, datetime.min.time())
+            filters['end_time'] = datetime.combine(end, datetime.min.time()) + timedelta(days=1)
+        return {k: v for k, v in filters.items() if v is not None}
+    
+    def reset_search(self):
+        self.class_filter.setCurrentIndex(0)
+        self.category_filter.setCurrentIndex(0)
+        self.min_confidence_spin.setValue(0.0)
+        self.max_confidence_spin.setValue(1.0)
+        self.date_filter_check.setChecked(False)
+        self.load_history()
+    
+    def _current_source_type(self):
+        return {"图片上传": "upload", "摄像头检测": "camera"}.get(self.source_filter.currentText())
+    
+    def export_history(self):
+        """按当前筛选条件导出全部记录（后台流式写入文件）"""
+        filename = f"detection_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        file_path, selected = QFileDialog.getSaveFileName(
+            self, "导出记录", filename, "CSV (*.csv);;JSONL (*.jsonl);;ZIP 含图片 (*.zip)")
+        if not file_path:
+            return
+        fmt = 'zip' if 'zip' in selected.lower() else 'jsonl' if 'jsonl' in selected.lower() else 'csv'
+        if not file_path.lower().endswith('.' + fmt):
+            file_path += '.' + fmt
+        self.export_all_btn.setEnabled(False)
+        self.show_progress()
+        self.export_job = HistoryJob('export', file_path=file_path, fmt=fmt,
+                                     source_type=self._current_source_type(), **self._current_filters())
+        self.export_job.progress_changed.connect(self.on_export_progress)
+        self.export_job.operation_completed.connect(self.on_export_completed)
+        history_bulk_service.submit(self.export_job)
+    
+    def on_export_progress(self, done, total):
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done)
+        self.stats_label.setText(f"正在导出: {done}/{total}")
+    
+    def on_export_completed(self, success, message):
+        self.hide_progress()
+        self.export_all_btn.setEnabled(True)
+        self.update_stats()
+        if success:
+            QMessageBox.information(self, "成功", message)
+        else:
+            QMessageBox.warning(self, "失败", message)
     
     def clear_old_records(self):
         reply = QMessageBox.question(self, "确认清理", "清理30天前的记录？")
         if reply == QMessageBox.Yes:
-            self.history_worker = HistoryWorker('clear_old', days=30)
-            self.history_worker.operation_completed.connect(self.on_clear_completed)
-            self.history_worker.start()
+            self.clear_btn.setEnabled(False)
+            self.show_progress()
+            self.clear_job = HistoryJob('clear_old', days=30)
+            self.clear_job.progress_changed.connect(self.on_clear_progress)
+            self.clear_job.operation_completed.connect(self.on_clear_completed)
+            history_bulk_service.submit(self.clear_job)
+    
+    def on_clear_progress(self, done, total):
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done)
+        self.stats_label.setText(f"正在清理: {done}/{total}")
     
     def on_clear_completed(self, success, message):
         self.hide_progress()
+        self.clear_btn.setEnabled(True)
         if success:
             QMessageBox.information(self, "成功", message)
             self.load_history()
+        else:
+            QMessageBox.warning(self, "失败", message)
+    
+    def show_db_diagnostics(self):
+        """显示数据库查询耗时统计与最近的慢查询"""
+        dialog = QDialog(self)
+        dialog.setWindowTitle("数据库诊断")
+        dialog.resize(900, 500)
+        layout = QVBoxLayout(dialog)
+        text = QTextEdit()
+        text.setReadOnly(True)
+        text.setLineWrapMode(QTextEdit.NoWrap)
+        text.setStyleSheet("font-family: Consolas, monospace; font-size: 12px;")
+        text.setPlainText(QueryProfiler.format_details(db_manager.get_query_stats()))
+        layout.addWidget(text)
+        dialog.exec_()
     
     def check_for_updates(self):
-        pass  # 简化版不实现自动刷新
+        """自动刷新：后台检查最新记录ID，只取符合当前检索条件的新增记录并插入到表格顶部"""
+        # 分块加载进行中时等下一次，避免水位与首块结果错开
+        if self.loading or (self.poll_job is not None and not self.poll_job.done):
+            return
+        generation = self.poll_generation
+        self.poll_job = HistoryJob('load_new', PRIORITY_BACKGROUND, key=('load_new', id(self)),
+                                   after_id=self.latest_id, source_type=self.history_model.source_type,
+                                   **self.history_model.filters)
+        self.poll_job.new_records_loaded.connect(
+            lambda records, watermark, total: self.on_new_records(generation, records, watermark, total))
+        history_service.submit(self.poll_job)
+    
+    def on_new_records(self, generation, records, watermark, total):
+        if generation != self.poll_generation:
+            return
+        self.latest_id = watermark
+        if records:
+            # 视图不在顶部时按插入的行数下移滚动条，保持当前可见的记录不动；选中项随行移动
+            bar = self.history_table.verticalScrollBar()
+            position = bar.value()
+            self.history_model.prepend_records(records)
+            if position > 0:
+                step = 1 if self.history_table.verticalScrollMode() == QAbstractItemView.ScrollPerItem \
+                    else self.history_table.verticalHeader().defaultSectionSize()
+                bar.setValue(position + len(records) * step)
+        if total < 0:
+            total = self.total_records + len(records)
+        if total != self.total_records:
+            self.on_total_changed(total)
     
     def toggle_auto_refresh(self, state):
-        pass
+        self.auto_refresh_enabled = state == Qt.Checked
+        if self.auto_refresh_enabled:
+            self.refresh_timer.start(self.refresh_interval * 1000)
+            self.check_for_updates()
+        else:
+            self.refresh_timer.stop()
     
     def update_refresh_interval(self, value):
-        pass
+        self.refresh_interval = value
+        if self.auto_refresh_enabled:
+            self.refresh_timer.start(value * 1000)
     
     def show_progress(self):
         self.progress_bar.setVisible(True)